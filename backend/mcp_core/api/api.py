@@ -1,19 +1,37 @@
 # Function Store REST API
 
-from typing import Any, Dict, List, Optional
+import json
+from typing import Any, Dict, Iterator, List, Optional
 
 from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from mcp_core.auth import verify_api_key
+from mcp_core.engine.embedding import embedding_service
 from mcp_core.engine.logic import (
     do_get_impl as _do_get_impl,
 )
+from mcp_core.engine.logic import (
+    do_list_page_impl as _do_list_page_impl,
+)
 from mcp_core.engine.logic import (
     do_save_impl as _do_save_impl,
 )
+from mcp_core.engine.logic import (
+    do_search_batch_impl as _do_search_batch_impl,
+)
 from mcp_core.engine.logic import (
     do_search_impl as _do_search_impl,
 )
+from mcp_core.engine.logic import (
+    do_search_page_impl as _do_search_page_impl,
+)
+from mcp_core.engine.logic import (
+    iter_list_impl as _iter_list_impl,
+)
+from mcp_core.engine.logic import (
+    iter_search_impl as _iter_search_impl,
+)
 from pydantic import BaseModel
 
 app = FastAPI(
@@ -59,12 +77,41 @@ class FunctionCreate(BaseModel):
     auto_generate_tests: Optional[bool] = False
 
 
-class SearchQuery(BaseModel):
+class SearchFilters(BaseModel):
+    tags: Optional[List[str]] = None
+    status_in: Optional[List[str]] = None
+    min_quality: Optional[int] = None
+    dependencies_available: Optional[bool] = None
+
+
+class SearchQuery(SearchFilters):
     query: str
     limit: Optional[int] = 5
+    mode: Optional[str] = "hybrid"
+
+
+class SearchPageQuery(SearchQuery):
+    limit: Optional[int] = 20
+    cursor: Optional[str] = None
+
+
+class SearchStreamQuery(SearchQuery):
+    limit: Optional[int] = 100
+
+
+class BatchSearchQuery(SearchFilters):
+    queries: List[str]
+    limit: Optional[int] = 5
+    mode: Optional[str] = "hybrid"
 
 
 # --- Endpoints ---
+def _ndjson(items: Iterator[Dict]) -> StreamingResponse:
+    """Streams one JSON object per line as the generator produces them."""
+    lines = (json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
 @app.get("/")
 def root():
     return {"message": "Function Store API", "version": "0.1.0", "status": "running"}
@@ -72,8 +119,11 @@ def root():
 
 @app.get("/health")
 def health_check():
-    """Health check endpoint for load balancers."""
-    return {"status": "healthy"}
+    """
+    Health check endpoint for load balancers. `embedding_model.state` is
+    loading/ready/failed; searches degrade to keyword results until ready.
+    """
+    return {"status": "healthy", "embedding_model": embedding_service.get_readiness()}
 
 
 @app.post("/functions", response_model=Dict)
@@ -99,6 +149,35 @@ async def create_function(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.get("/functions")
+async def list_functions(
+    query: Optional[str] = None,
+    tag: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user),
+):
+    """
+    One page of the catalogue. Pass `next_cursor` back as `cursor` for the next page.
+    """
+    try:
+        return _do_list_page_impl(query, tag, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/functions/stream")
+async def stream_functions(
+    query: Optional[str] = None,
+    tag: Optional[str] = None,
+    user_id: str = Depends(get_current_user),
+):
+    """
+    The whole catalogue as NDJSON, read page by page in constant memory.
+    """
+    return _ndjson(_iter_list_impl(query, tag))
+
+
 @app.get("/functions/{function_name}")
 async def get_function_by_name(
     function_name: str, user_id: str = Depends(get_current_user)
@@ -117,18 +196,90 @@ async def get_function_by_name(
 @app.post("/functions/search")
 async def search(query: SearchQuery, user_id: str = Depends(get_current_user)):
     """
-    Semantic search for functions using vector similarity.
+    Hybrid search for functions (vector similarity + BM25 keyword ranking).
     """
     try:
-        results = _do_search_impl(query.query, query.limit or 5)
+        results = _do_search_impl(
+            query.query,
+            query.limit or 5,
+            query.mode or "hybrid",
+            tags=query.tags,
+            status_in=query.status_in,
+            min_quality=query.min_quality,
+            dependencies_available=query.dependencies_available,
+        )
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/functions/search/page")
+async def search_page(query: SearchPageQuery, user_id: str = Depends(get_current_user)):
+    """
+    One page of search results plus `next_cursor` for the following page.
+    """
+    try:
+        return _do_search_page_impl(
+            query.query,
+            query.limit or 20,
+            query.mode or "hybrid",
+            query.cursor,
+            tags=query.tags,
+            status_in=query.status_in,
+            min_quality=query.min_quality,
+            dependencies_available=query.dependencies_available,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/functions/search/stream")
+async def search_stream(
+    query: SearchStreamQuery, user_id: str = Depends(get_current_user)
+):
+    """
+    Up to `limit` search results as NDJSON, fetched page by page.
+    """
+    return _ndjson(
+        _iter_search_impl(
+            query.query,
+            query.limit or 100,
+            query.mode or "hybrid",
+            tags=query.tags,
+            status_in=query.status_in,
+            min_quality=query.min_quality,
+            dependencies_available=query.dependencies_available,
+        )
+    )
+
+
+@app.post("/functions/search/batch")
+async def search_batch(
+    query: BatchSearchQuery, user_id: str = Depends(get_current_user)
+):
+    """
+    Search for many queries at once (one embedding and scoring pass).
+    """
+    try:
+        return _do_search_batch_impl(
+            query.queries,
+            query.limit or 5,
+            query.mode or "hybrid",
+            tags=query.tags,
+            status_in=query.status_in,
+            min_quality=query.min_quality,
+            dependencies_available=query.dependencies_available,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # --- Startup ---
 if __name__ == "__main__":
     import uvicorn
 
     print("Starting Function Store REST API on http://localhost:8000")
+    embedding_service.start_warmup()
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -64,11 +64,60 @@ EMBEDDING_MODEL_ID = get_setting(
 )
 
 GEMINI_API_KEY = get_setting("FS_GEMINI_API_KEY", "")
+# Alternative API endpoint, e.g. dev_tools/fake_gemini_server.py for offline runs
+GEMINI_BASE_URL = get_setting("FS_GEMINI_BASE_URL", "")
+# Client-side limits: requests per minute (token bucket), requests in flight,
+# and retries (exponential backoff with jitter) for 429/5xx/network errors
+GEMINI_REQUESTS_PER_MINUTE = float(get_setting("FS_GEMINI_REQUESTS_PER_MINUTE", "1500"))
+GEMINI_MAX_CONCURRENCY = int(get_setting("FS_GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_MAX_RETRIES = int(get_setting("FS_GEMINI_MAX_RETRIES", "5"))
+
+
+# Search Engine Config
+# FS_SEARCH_MODE: "auto" (ANN for large stores), "exact" (full scan) or "ann"
+SEARCH_MODE = get_setting("FS_SEARCH_MODE", "auto")
+# Store size from which "auto" switches to the approximate (IVF) index
+ANN_MIN_VECTORS = int(get_setting("FS_ANN_MIN_VECTORS", "20000"))
+# Number of inverted lists probed per query (higher = better recall, slower)
+ANN_NPROBE = int(get_setting("FS_ANN_NPROBE", "16"))
+# FS_VECTOR_QUANTIZATION: "none" (float32 resident vectors) or "int8"
+# (4x smaller first-pass scan, top candidates re-ranked with exact floats)
+VECTOR_QUANTIZATION = get_setting("FS_VECTOR_QUANTIZATION", "none")
+# Seconds before the dependencies_available filter re-checks importability
+DEPS_CHECK_TTL = float(get_setting("FS_DEPS_CHECK_TTL", "60"))
+# int8 mode: first-pass candidates per requested result
+QUANT_RERANK_FACTOR = int(get_setting("FS_QUANT_RERANK_FACTOR", "4"))
+# Search results cached per store generation (0 disables)
+SEARCH_RESULT_CACHE_SIZE = int(get_setting("FS_SEARCH_RESULT_CACHE_SIZE", "256"))
+# Results ranked once per query and generation for search_functions_page
+SEARCH_PAGE_DEPTH = int(get_setting("FS_SEARCH_PAGE_DEPTH", "1000"))
 
 
 # Models Cache Directory
 CACHE_DIR = DATA_DIR / "models"
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
+# Document embeddings kept on disk per model, keyed by text hash (0 disables)
+EMBEDDING_CACHE_SIZE = int(get_setting("FS_EMBEDDING_CACHE_SIZE", "20000"))
+# Concurrent single-text embedding requests are coalesced into batches of up to
+# EMBED_MAX_BATCH, waiting at most EMBED_BATCH_WINDOW_MS under load
+EMBED_MAX_BATCH = int(get_setting("FS_EMBED_MAX_BATCH", "32"))
+EMBED_BATCH_WINDOW_MS = float(get_setting("FS_EMBED_BATCH_WINDOW_MS", "5"))
+# Hot query embeddings are snapshotted to CACHE_DIR every N seconds (0 = only
+# at exit) and restored at Master startup. After a model switch the top
+# QUERY_CACHE_PREWARM snapshot queries are re-embedded instead (0 disables)
+QUERY_CACHE_SNAPSHOT_INTERVAL = float(
+    get_setting("FS_QUERY_CACHE_SNAPSHOT_INTERVAL", "300")
+)
+QUERY_CACHE_PREWARM = int(get_setting("FS_QUERY_CACHE_PREWARM", "100"))
+# Startup migrations run in the background; a tool that needs an unfinished one
+# waits up to this many seconds before returning a "not ready" error
+MIGRATION_WAIT_TIMEOUT = float(get_setting("FS_MIGRATION_WAIT_TIMEOUT", "10"))
+# get_function call counts are kept in memory and written in one batch every
+# N seconds (0 = only at exit)
+CALL_COUNT_FLUSH_INTERVAL = float(get_setting("FS_CALL_COUNT_FLUSH_INTERVAL", "30"))
+# The Master publishes a read snapshot for proxies and the dashboard at most
+# every N seconds after a write (0 disables; proxies then forward every read)
+READ_SNAPSHOT_INTERVAL = float(get_setting("FS_READ_SNAPSHOT_INTERVAL", "2"))
 
 
 # Sync Config (GitHub Serverless DB)
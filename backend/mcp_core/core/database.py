@@ -2,10 +2,15 @@ import json
 import logging
 import os  # Added import for os module
 import time
+from typing import Callable
 
 import duckdb
 from mcp_core.core import config
-from mcp_core.engine.embedding import embedding_service
+from mcp_core.engine.embedding import (
+    embedding_service,
+    function_embedding_text,
+    normalize_rows,
+)
 
 try:
     import msvcrt
@@ -14,69 +19,278 @@ try:
 except ImportError:
     _HAS_MSVCRT = False
 
+try:
+    import fcntl
+
+    _HAS_FCNTL = True
+except ImportError:
+    _HAS_FCNTL = False
+
 import threading
 
 logger = logging.getLogger(__name__)
 
 LOCK_PATH = config.DATA_DIR / "functions.duckdb.lock"
 
-# Thread lock to prevent intra-process contention before it hits the file system
-_inner_lock = threading.Lock()
+# Rows copied per transaction when migrating the vector column
+VECTOR_MIGRATION_BATCH = 2000
+
+# Functions re-embedded (and committed) per batch during embedding recovery
+EMBEDDING_RECOVERY_BATCH = 64
+
+
+_LOCK_RANK = {None: 0, "shared": 1, "exclusive": 2}
+
+
+class _ProcessDBLock:
+    """
+    Reader/writer lock state shared by every DBReadLock / DBWriteLock in this
+    process, mirrored onto one file lock for other processes.
+
+    In-process, writers are exclusive and granted in arrival order (FIFO), so
+    a stream of writers can't starve one of them. Readers never wait on
+    in-process writers: DuckDB's MVCC already gives them a consistent
+    snapshot, so a long maintenance write doesn't hold up a search.
+
+    Across processes, the lock file is held exclusively (flock LOCK_EX /
+    msvcrt) while a writer is active, shared (LOCK_SH, POSIX only) while
+    only readers are, and released when idle. A writer upgrading from SH
+    releases the file first and readers don't re-take SH while it waits, so
+    two processes that each hold SH can't block each other's writers forever.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None  # (thread ident, thread name)
+        self._writer_depth = 0
+        self._writer_since = 0.0
+        self._queue = []  # waiting writer tokens, oldest first
+        self._file_mutex = threading.Lock()
+        self._fp = None
+        self._file_mode = None  # None | "shared" | "exclusive"
+        self._stats = {
+            mode: {
+                "acquired": 0,
+                "timeouts": 0,
+                "total_wait_ms": 0.0,
+                "max_wait_ms": 0.0,
+            }
+            for mode in ("read", "write")
+        }
+
+    # -- in-process side -------------------------------------------------
+
+    def acquire_write(self, timeout: float):
+        started = time.monotonic()
+        deadline = started + timeout
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer and self._writer[0] == me:
+                self._writer_depth += 1  # re-entrant for the owning thread
+                return
+            token = object()
+            self._queue.append(token)
+            while self._writer is not None or self._queue[0] is not token:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(token)
+                    self._cond.notify_all()
+                    self._timed_out("write", timeout, self._holder_description())
+                self._cond.wait(remaining)
+            self._queue.pop(0)
+            self._writer = (me, threading.current_thread().name)
+            self._writer_depth = 1
+            self._writer_since = time.monotonic()
+        try:
+            self._raise_file_lock("exclusive", deadline, "write", timeout)
+        except BaseException:
+            self._release_writer()
+            raise
+        self._record("write", started)
+
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if self._writer_depth:
+                return
+        self._release_writer()
+
+    def _release_writer(self):
+        with self._cond:
+            self._writer = None
+            self._writer_depth = 0
+            self._cond.notify_all()
+        self._settle_file_lock()
+
+    def acquire_read(self, timeout: float):
+        started = time.monotonic()
+        with self._cond:
+            self._readers += 1
+        try:
+            self._raise_file_lock("shared", started + timeout, "read", timeout)
+        except BaseException:
+            self.release_read()
+            raise
+        self._record("read", started)
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+        self._settle_file_lock()
+
+    # -- cross-process side ---------------------------------------------
+
+    def _raise_file_lock(self, needed: str, deadline: float, mode: str, timeout):
+        """Waits until the file lock is at least `needed` ("shared"/"exclusive")."""
+        while True:
+            with self._file_mutex:
+                if _LOCK_RANK[self._file_mode] >= _LOCK_RANK[needed]:
+                    return
+                if needed == "shared" and self._writer is not None:
+                    # Covered by the exclusive lock this process's writer holds or
+                    # is waiting for; re-taking SH meanwhile would block that upgrade.
+                    return
+                if self._set_file_lock(needed):
+                    return
+            if time.monotonic() > deadline:
+                self._timed_out(
+                    mode, timeout, "another process holds the database lock file"
+                )
+            time.sleep(0.05)
+
+    def _settle_file_lock(self):
+        """
+        Moves the file lock to what the current holders need once one has
+        left: downgrades or releases it, and re-takes SH for readers that
+        were left unlocked by a writer's failed upgrade. Never waits.
+        """
+        with self._file_mutex:
+            with self._cond:
+                if self._writer is not None:
+                    wanted = "exclusive"
+                elif self._readers:
+                    wanted = "shared"
+                else:
+                    wanted = None
+            if _LOCK_RANK[wanted] < _LOCK_RANK[self._file_mode] or (
+                wanted == "shared" and self._file_mode is None
+            ):
+                self._set_file_lock(wanted)
+
+    def _set_file_lock(self, wanted) -> bool:
+        """
+        Tries to move the file lock to `wanted` and records the mode it ends
+        up in. flock converts SH <-> EX non-atomically (the old lock is
+        dropped first), so a failed conversion leaves the file unlocked.
+        """
+        if not (_HAS_FCNTL or _HAS_MSVCRT):
+            self._file_mode = wanted
+            return True
+        try:
+            if self._fp is None:
+                LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+                self._fp = open(LOCK_PATH, "a")
+            if _HAS_FCNTL:
+                if self._file_mode is not None and wanted is not None:
+                    # Release explicitly so two processes that both hold SH
+                    # with a writer waiting can't deadlock on the upgrade.
+                    fcntl.flock(self._fp.fileno(), fcntl.LOCK_UN)
+                    self._file_mode = None
+                flags = {
+                    "exclusive": fcntl.LOCK_EX | fcntl.LOCK_NB,
+                    "shared": fcntl.LOCK_SH | fcntl.LOCK_NB,
+                    None: fcntl.LOCK_UN,
+                }[wanted]
+                fcntl.flock(self._fp.fileno(), flags)
+            elif wanted == "exclusive":
+                msvcrt.locking(self._fp.fileno(), msvcrt.LK_NBLCK, 1)
+            elif self._file_mode == "exclusive":
+                # msvcrt has no shared mode: readers only keep writers out in-process
+                msvcrt.locking(self._fp.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            return False
+        self._file_mode = wanted
+        return True
+
+    # -- reporting --------------------------------------------------------
+
+    def _holder_description(self) -> str:
+        if self._writer is None:
+            return f"{len(self._queue) - 1} earlier writer(s) queued"
+        held = time.monotonic() - self._writer_since
+        return f"held by thread '{self._writer[1]}' for {held:.1f}s, {len(self._queue) - 1} writer(s) queued ahead"
+
+    def _timed_out(self, mode: str, timeout: float, reason: str):
+        self._stats[mode]["timeouts"] += 1
+        message = f"DBLock: Timed out after {timeout:.1f}s waiting for the {mode} lock ({reason})."
+        logger.error(message)
+        raise TimeoutError(
+            message + " Another process (Cursor/Antigravity) might be writing to "
+            "Function Store. Please try again in a few seconds."
+        )
+
+    def _record(self, mode: str, started: float):
+        waited = (time.monotonic() - started) * 1000
+        stats = self._stats[mode]
+        stats["acquired"] += 1
+        stats["total_wait_ms"] += waited
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], waited)
+        if waited > 1000:
+            logger.warning(f"DBLock: Waited {waited:.0f} ms for the {mode} lock.")
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            stats = {mode: dict(values) for mode, values in self._stats.items()}
+            stats["readers"] = self._readers
+            stats["writer"] = self._writer[1] if self._writer else None
+            stats["queued_writers"] = len(self._queue)
+            stats["file_mode"] = self._file_mode
+        for mode in ("read", "write"):
+            s = stats[mode]
+            total = s.pop("total_wait_ms")
+            s["avg_wait_ms"] = round(total / s["acquired"], 3) if s["acquired"] else 0
+            s["max_wait_ms"] = round(s["max_wait_ms"], 3)
+        return stats
+
+
+_process_lock = _ProcessDBLock()
 
 
 class DBWriteLock:
-    """Cross-process file lock for DuckDB write operations on Windows."""
+    """Exclusive database lock for writes (in-process FIFO and cross-process file lock)."""
 
     def __init__(self, timeout: float = 10.0):
         self.timeout = timeout
-        self._fp = None
 
     def __enter__(self):
-        # logger.debug(f"DEBUG: Thread {threading.get_ident()} trying to acquire L-Lock")
-        if not _inner_lock.acquire(timeout=self.timeout):
-            logger.error(f"DEBUG: Thread {threading.get_ident()} TIMEOUT on L-Lock")
-            raise TimeoutError("Could not acquire internal thread lock.")
+        _process_lock.acquire_write(self.timeout)
+        return self
 
-        if not _HAS_MSVCRT:
-            return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _process_lock.release_write()
 
-        try:
-            LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
-            self._fp = open(LOCK_PATH, "a")
-
-            deadline = time.monotonic() + self.timeout
-            while True:
-                try:
-                    msvcrt.locking(self._fp.fileno(), msvcrt.LK_NBLCK, 1)
-                    # logger.debug(f"DEBUG: Thread {threading.get_ident()} acquired F-Lock")
-                    return self
-                except OSError:
-                    if time.monotonic() > deadline:
-                        raise TimeoutError(
-                            "Could not acquire database lock. Another process (Cursor/Antigravity) "
-                            "might be writing to Function Store. Please try again in a few seconds."
-                        )
-                    time.sleep(0.1)
-        except Exception as e:
-            _inner_lock.release()
-            if isinstance(e, TimeoutError):
-                raise
-            raise RuntimeError(f"Lock initialization failed: {e}")
+
+class DBReadLock:
+    """
+    Shared database lock for multi-statement reads that must not interleave
+    with another process's writes. Never waits for writers in this process.
+    """
+
+    def __init__(self, timeout: float = 10.0):
+        self.timeout = timeout
+
+    def __enter__(self):
+        _process_lock.acquire_read(self.timeout)
+        return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        try:
-            if self._fp:
-                try:
-                    msvcrt.locking(self._fp.fileno(), msvcrt.LK_UNLCK, 1)
-                    # logger.debug(f"DEBUG: Thread {threading.get_ident()} released F-Lock")
-                except Exception:
-                    pass
-                finally:
-                    self._fp.close()
-                    self._fp = None
-        finally:
-            _inner_lock.release()
-            # logger.debug(f"DEBUG: Thread {threading.get_ident()} released L-Lock")
+        _process_lock.release_read()
+
+
+def get_lock_stats() -> dict:
+    """Wait times, timeouts and current holders of the database lock."""
+    return _process_lock.get_stats()
 
 
 def get_db_connection(read_only=False):
@@ -103,6 +317,8 @@ def get_db_connection(read_only=False):
                 or "is in use" in msg
                 or "locked" in msg
                 or "already open" in msg
+                # Another thread's instance for this file is still closing
+                or "already attached" in msg
             ):
                 time.sleep(retry_delay * (1.5**attempt))  # Exponential backoff
                 continue
@@ -112,136 +328,668 @@ def get_db_connection(read_only=False):
     raise last_err
 
 
+class _Lease:
+    """
+    A cursor handed out by `ConnectionManager`. Used like a connection;
+    `close()` gives it back (rolling back a transaction left open).
+    """
+
+    __slots__ = ("_manager", "_cursor", "_owned", "_in_transaction")
+
+    def __init__(self, manager, cursor, owned: bool):
+        self._manager = manager
+        self._cursor = cursor
+        self._owned = owned
+        self._in_transaction = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def begin(self):
+        self._cursor.begin()
+        self._in_transaction = True
+
+    def commit(self):
+        self._cursor.commit()
+        self._in_transaction = False
+
+    def rollback(self):
+        self._cursor.rollback()
+        self._in_transaction = False
+
+    def close(self):
+        if self._cursor is not None:
+            self._manager._release(self)
+            self._cursor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionManager:
+    """
+    One long-lived DuckDB connection for the Master process. Each thread works
+    on its own `cursor()` of it (cursors must not be shared across threads);
+    a nested lease on a thread whose cursor is in use gets a temporary one.
+    A cursor idle for more than HEALTH_CHECK_INTERVAL seconds is pinged
+    before reuse, and a failed ping reconnects.
+
+    Only the Master enables it: other processes keep opening and closing
+    connections, so they never hold the database file.
+    """
+
+    HEALTH_CHECK_INTERVAL = 30.0
+
+    def __init__(self):
+        self.enabled = False
+        self._root = None
+        self._path = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"leases": 0, "nested_leases": 0, "cursors": 0, "reconnects": 0}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        """Drops the root connection; every thread's cursor is renewed on next use."""
+        with self._lock:
+            self._close_root()
+
+    def _close_root(self):
+        if self._root is not None:
+            try:
+                self._root.close()
+            except duckdb.Error:
+                pass
+        self._root = None
+        self._generation += 1
+
+    def _root_connection(self):
+        path = str(config.DB_PATH)
+        with self._lock:
+            if self._root is None or self._path != path:
+                if self._root is not None:
+                    self._close_root()
+                    self._stats["reconnects"] += 1
+                self._root = get_db_connection()
+                self._path = path
+            return self._root, self._generation
+
+    def _new_cursor(self):
+        local = self._local
+        old = getattr(local, "cursor", None)
+        if old is not None:
+            try:
+                old.close()
+            except duckdb.Error:
+                pass
+        root, generation = self._root_connection()
+        local.cursor = root.cursor()
+        local.generation = generation
+        self._stats["cursors"] += 1
+        return local.cursor
+
+    def lease(self) -> _Lease:
+        local = self._local
+        if getattr(local, "busy", False):
+            root, _ = self._root_connection()
+            self._stats["nested_leases"] += 1
+            return _Lease(self, root.cursor(), owned=True)
+
+        cursor = getattr(local, "cursor", None)
+        if cursor is None or local.generation != self._root_connection()[1]:
+            cursor = self._new_cursor()
+        elif time.monotonic() - local.last_used > self.HEALTH_CHECK_INTERVAL:
+            try:
+                cursor.execute("SELECT 1").fetchone()
+            except duckdb.Error as e:
+                logger.warning(
+                    f"ConnectionManager: Health check failed ({e}), reconnecting."
+                )
+                with self._lock:
+                    self._close_root()
+                    self._stats["reconnects"] += 1
+                cursor = self._new_cursor()
+        local.busy = True
+        self._stats["leases"] += 1
+        return _Lease(self, cursor, owned=False)
+
+    def _release(self, lease: _Lease):
+        if lease._in_transaction:
+            try:
+                lease._cursor.rollback()
+            except duckdb.Error:
+                pass
+        if lease._owned:
+            lease._cursor.close()
+            return
+        self._local.busy = False
+        self._local.last_used = time.monotonic()
+
+    def get_stats(self) -> dict:
+        return dict(self._stats, enabled=self.enabled, path=self._path)
+
+
+# Singleton Instance (enabled by the Master process)
+connection_manager = ConnectionManager()
+
+
+def db_connection(read_only=False):
+    """
+    Connection for engine code: a pooled per-thread cursor in the Master,
+    otherwise a fresh `get_db_connection()`. Callers `close()` it either way.
+    """
+    if connection_manager.enabled and not read_only:
+        return connection_manager.lease()
+    return get_db_connection(read_only=read_only)
+
+
+def hot_metadata_values(metadata: dict) -> tuple:
+    """
+    Values for the typed columns that mirror hot `metadata` fields, in order:
+    (quality_score, reliability_tier, detected_imports_count, last_verified_at,
+    dependencies).
+    Writers of `functions.metadata` must set these alongside it.
+    """
+    qs = metadata.get("quality_score")
+    return (
+        int(qs) if qs is not None else None,
+        metadata.get("reliability_tier"),
+        len(metadata.get("detected_imports") or []),
+        metadata.get("last_verified_at"),
+        list(metadata.get("dependencies") or []),
+    )
+
+
 def init_db():
+    """Creates the schema and runs every startup migration synchronously."""
+    dim = embedding_service.get_model_info()["dimension"]
+    conn = get_db_connection()
+    try:
+        with DBWriteLock():
+            init_schema_internal(conn, dim)
+            migrate_schema_internal(conn)
+            migrate_vector_column_internal(conn, dim)
+            _check_model_version_internal(conn)
+        # Writes each batch through the write pipeline
+        recover_embeddings_internal(conn)
+    finally:
+        conn.close()
+
+
+def init_schema():
+    """
+    Creates missing tables. Fast on any store, so the Master runs it before
+    serving and leaves the rest of `init_db` to `core.migrations`.
+    """
+    dim = embedding_service.get_model_info()["dimension"]
     with DBWriteLock():
         conn = get_db_connection()
         try:
-            # Create Sequence for ID
-            conn.execute("CREATE SEQUENCE IF NOT EXISTS seq_function_id START 1")
-            conn.execute("CREATE SEQUENCE IF NOT EXISTS seq_emb_id START 1")
-
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS functions (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_function_id'),
-                    name VARCHAR,
-                    code VARCHAR,
-                    description VARCHAR,
-                    tags VARCHAR,
-                    metadata VARCHAR,
-                    status VARCHAR DEFAULT 'active',
-                    test_cases VARCHAR,
-                    call_count INTEGER DEFAULT 0,
-                    last_called_at VARCHAR,
-                    created_at VARCHAR,
-                    updated_at VARCHAR
-                )
-            """)
+            init_schema_internal(conn, dim)
+        finally:
+            conn.close()
 
-            conn.execute(
-                "CREATE UNIQUE INDEX IF NOT EXISTS idx_functions_name ON functions (name)"
-            )
 
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS embeddings (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_emb_id'),
-                    function_id INTEGER,
-                    vector FLOAT[],
-                    model_name VARCHAR,
-                    dimension INTEGER,
-                    encoded_at VARCHAR
-                )
-            """)
+def init_schema_internal(conn, dim: int):
+    # Create Sequence for ID
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS seq_function_id START 1")
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS seq_emb_id START 1")
 
-            # Config Table for Model Versioning
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS config (
-                    key VARCHAR PRIMARY KEY,
-                    value VARCHAR
-                )
-            """)
-
-            # Migrations
-            columns_res = conn.execute("DESCRIBE functions").fetchall()
-            columns = [row[0] for row in columns_res]
-
-            needed_cols = {
-                "metadata": "NULL",
-                "status": "'active'",
-                "test_cases": "NULL",
-                "call_count": "0",
-                "last_called_at": "NULL",
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS functions (
+            id INTEGER PRIMARY KEY DEFAULT nextval('seq_function_id'),
+            name VARCHAR,
+            code VARCHAR,
+            description VARCHAR,
+            tags VARCHAR[],
+            metadata VARCHAR,
+            status VARCHAR DEFAULT 'active',
+            test_cases JSON,
+            call_count INTEGER DEFAULT 0,
+            last_called_at VARCHAR,
+            created_at VARCHAR,
+            updated_at VARCHAR,
+            quality_score INTEGER,
+            reliability_tier VARCHAR,
+            detected_imports_count INTEGER,
+            last_verified_at VARCHAR,
+            dependencies VARCHAR[]
+        )
+    """)
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS embeddings (
+            id INTEGER PRIMARY KEY DEFAULT nextval('seq_emb_id'),
+            function_id INTEGER,
+            vector FLOAT[{dim}],
+            model_name VARCHAR,
+            dimension INTEGER,
+            encoded_at VARCHAR
+        )
+    """)
+
+    # Config Table for Model Versioning
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS config (
+            key VARCHAR PRIMARY KEY,
+            value VARCHAR
+        )
+    """)
+
+
+def migrate_schema():
+    with DBWriteLock():
+        conn = get_db_connection()
+        try:
+            migrate_schema_internal(conn)
+        finally:
+            conn.close()
+
+
+def migrate_schema_internal(conn):
+    """Column additions and type changes on `functions`, tag tables, indexes."""
+    columns_res = conn.execute("DESCRIBE functions").fetchall()
+    columns = [row[0] for row in columns_res]
+
+    needed_cols = {
+        "metadata": "NULL",
+        "status": "'active'",
+        "test_cases": "NULL",
+        "call_count": "0",
+        "last_called_at": "NULL",
+        # Hot metadata fields, backfilled once from the JSON column
+        "quality_score": "TRY_CAST(json_extract(metadata, '$.quality_score') AS DOUBLE)",
+        "reliability_tier": "json_extract_string(metadata, '$.reliability_tier')",
+        "detected_imports_count": "json_array_length(json_extract(metadata, '$.detected_imports'))",
+        "last_verified_at": "json_extract_string(metadata, '$.last_verified_at')",
+        "dependencies": "COALESCE(TRY_CAST(json_extract(metadata, '$.dependencies') AS VARCHAR[]), [])",
+    }
+
+    for col, default_val in needed_cols.items():
+        if col not in columns:
+            logger.info(f"Migrating DB: Adding '{col}' column.")
+            type_map = {
+                "call_count": "INTEGER",
+                "quality_score": "INTEGER",
+                "detected_imports_count": "INTEGER",
+                "dependencies": "VARCHAR[]",
             }
+            col_type = type_map.get(col, "VARCHAR")
+            conn.execute(f"ALTER TABLE functions ADD COLUMN {col} {col_type}")
+            conn.execute(
+                f"UPDATE functions SET {col} = {default_val} WHERE {col} IS NULL"
+            )
 
-            for col, default_val in needed_cols.items():
-                if col not in columns:
-                    logger.info(f"Migrating DB: Adding '{col}' column.")
-                    type_map = {"call_count": "INTEGER"}
-                    col_type = type_map.get(col, "VARCHAR")
-                    conn.execute(f"ALTER TABLE functions ADD COLUMN {col} {col_type}")
-                    conn.execute(
-                        f"UPDATE functions SET {col} = {default_val} WHERE {col} IS NULL"
-                    )
+    migrate_list_columns_internal(conn)
+    _create_tag_tables(conn)
 
-            # No need to open new connections inside these helpers
-            _check_model_version_internal(conn)
-            recover_embeddings_internal(conn)
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_functions_name ON functions (name)"
+    )
+    # Ranking and triage filter on these instead of parsing metadata per row
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_functions_status ON functions (status)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_functions_quality ON functions (quality_score)"
+    )
 
+
+def migrate_vectors(progress: Callable[[int, int], None] = None):
+    """Runs `migrate_vector_column_internal` for the current model dimension."""
+    dim = embedding_service.get_model_info()["dimension"]
+    with DBWriteLock():
+        conn = get_db_connection()
+        try:
+            migrate_vector_column_internal(conn, dim, progress)
         finally:
             conn.close()
 
 
-def recover_embeddings_internal(conn):
-    """Checks for model or dimension mismatch and re-calculates embeddings if necessary."""
+def _column_type(conn, table: str, column: str) -> str:
+    row = conn.execute(
+        "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = ?",
+        (table, column),
+    ).fetchone()
+    return row[0] if row else ""
+
+
+def _vector_column_type(conn) -> str:
+    return _column_type(conn, "embeddings", "vector")
+
+
+def migrate_list_columns_internal(conn):
+    """
+    Converts the JSON-string `functions.tags` to VARCHAR[] and `test_cases` to
+    the JSON type in one transaction. DuckDB cannot alter a column type while
+    the table has secondary indexes, so they are dropped here and recreated by
+    `init_db`. Unparseable values become an empty list.
+    """
+    if _column_type(conn, "functions", "tags") != "VARCHAR":
+        return
+    logger.info("Migrating DB: Converting tags to VARCHAR[] and test_cases to JSON.")
+    conn.begin()
     try:
-        current_model = embedding_service.model_name
-        expected_dim = embedding_service.get_model_info()["dimension"]
+        for index in (
+            "idx_functions_name",
+            "idx_functions_status",
+            "idx_functions_quality",
+        ):
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+        conn.execute(
+            """
+            ALTER TABLE functions ALTER tags TYPE VARCHAR[]
+            USING COALESCE(TRY_CAST(TRY_CAST(tags AS JSON) AS VARCHAR[]), [])
+        """
+        )
+        conn.execute(
+            """
+            ALTER TABLE functions ALTER test_cases TYPE JSON
+            USING COALESCE(TRY_CAST(test_cases AS JSON), '[]')
+        """
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
-        # 1. Find mismatched models, missing dimensions, or wrong dimensions
-        rows = conn.execute(
+
+def _create_tag_tables(conn):
+    """
+    `function_tags` holds one row per (function, tag) for indexed tag filters;
+    `tag_counts` is the per-tag aggregate behind the dashboard tag cloud. Both
+    are filled from `functions.tags` when first created.
+    """
+    exists = conn.execute(
+        "SELECT count(*) FROM information_schema.tables WHERE table_name = 'function_tags'"
+    ).fetchone()[0]
+    if exists:
+        return
+    conn.begin()
+    try:
+        conn.execute("CREATE TABLE function_tags (function_id INTEGER, tag VARCHAR)")
+        conn.execute("CREATE INDEX idx_function_tags_tag ON function_tags (tag)")
+        conn.execute(
+            "CREATE INDEX idx_function_tags_function ON function_tags (function_id)"
+        )
+        conn.execute("CREATE TABLE tag_counts (tag VARCHAR PRIMARY KEY, count INTEGER)")
+        conn.execute(
             """
-            SELECT f.id, f.name, f.description, f.tags, f.metadata, f.code, e.model_name, e.dimension
-            FROM functions f
-            JOIN embeddings e ON f.id = e.function_id
-            WHERE e.model_name != ? OR e.dimension != ? OR e.dimension IS NULL
+            INSERT INTO function_tags
+            SELECT DISTINCT id, unnest(tags) FROM functions WHERE tags IS NOT NULL
+        """
+        )
+        conn.execute(
+            "INSERT INTO tag_counts SELECT tag, count(*) FROM function_tags GROUP BY tag"
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def set_function_tags(conn, function_id: int, tags) -> None:
+    """
+    Syncs `function_tags` and the `tag_counts` aggregate with a function's new
+    tag list. Writers of `functions.tags` must call this alongside it (with []
+    when deleting the function). Counts that reach zero are kept as rows and
+    filtered out on read, so a batch that drops and re-adds a tag never
+    deletes and re-inserts the same key.
+    """
+    new = set(tags or [])
+    old = {
+        r[0]
+        for r in conn.execute(
+            "SELECT tag FROM function_tags WHERE function_id = ?", (function_id,)
+        ).fetchall()
+    }
+    removed, added = sorted(old - new), sorted(new - old)
+    if removed:
+        conn.execute(
+            "DELETE FROM function_tags WHERE function_id = ? AND tag IN (SELECT unnest(?::VARCHAR[]))",
+            (function_id, removed),
+        )
+        conn.execute(
+            "UPDATE tag_counts SET count = count - 1 WHERE tag IN (SELECT unnest(?::VARCHAR[]))",
+            (removed,),
+        )
+    if added:
+        conn.execute(
+            "INSERT INTO function_tags SELECT ?, unnest(?::VARCHAR[])",
+            (function_id, added),
+        )
+        conn.execute(
+            """
+            INSERT INTO tag_counts SELECT unnest(?::VARCHAR[]), 1
+            ON CONFLICT (tag) DO UPDATE SET count = count + 1
+        """,
+            (added,),
+        )
+
+
+def _get_config_value(conn, key: str):
+    row = conn.execute("SELECT value FROM config WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_config_value(conn, key: str, value):
+    conn.execute("DELETE FROM config WHERE key = ?", (key,))
+    if value is not None:
+        conn.execute("INSERT INTO config (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def migrate_vector_column_internal(
+    conn, dim: int, progress: Callable[[int, int], None] = None
+):
+    """
+    Migrates `embeddings.vector` to a fixed-width FLOAT[dim] ARRAY column with
+    L2-normalized values (so inner product == cosine similarity).
+    Rows are copied into a staging table in batches, one transaction each, so an
+    interrupted migration resumes from the last copied id. Rows whose length does
+    not match `dim` are kept with a NULL vector/dimension and re-embedded by
+    `recover_embeddings_internal`. `progress(done, total)` is called per batch.
+    """
+    target = f"FLOAT[{dim}]"
+    if _vector_column_type(conn) == target:
+        conn.execute("DROP TABLE IF EXISTS embeddings_migration")
+        return
+
+    staged_dim = _get_config_value(conn, "vector_migration_dim")
+    if staged_dim != str(dim):
+        # Staging table from an interrupted migration to another dimension
+        conn.execute("DROP TABLE IF EXISTS embeddings_migration")
+        _set_config_value(conn, "vector_migration_dim", dim)
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS embeddings_migration (
+            id INTEGER PRIMARY KEY DEFAULT nextval('seq_emb_id'),
+            function_id INTEGER,
+            vector {target},
+            model_name VARCHAR,
+            dimension INTEGER,
+            encoded_at VARCHAR
+        )
+    """)
+
+    total = conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+    logger.info(f"Migrating DB: Converting {total} vectors to {target}...")
+    while True:
+        last_id = conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM embeddings_migration"
+        ).fetchone()[0]
+        copied = conn.execute(
+            f"""
+            INSERT INTO embeddings_migration
+            SELECT id, function_id,
+                   (CASE
+                        WHEN len(vector) = {dim} AND list_dot_product(vector, vector) > 0
+                            THEN list_transform(vector, x -> x / sqrt(list_dot_product(vector, vector)))
+                        WHEN len(vector) = {dim} THEN vector
+                    END)::{target},
+                   model_name,
+                   CASE WHEN len(vector) = {dim} THEN {dim} END,
+                   encoded_at
+            FROM embeddings
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
         """,
+            (last_id, VECTOR_MIGRATION_BATCH),
+        ).fetchone()[0]
+        if not copied:
+            break
+        conn.commit()
+        logger.info(f"Migrating DB: Vector migration progress (last id {last_id}).")
+        if progress:
+            progress(
+                conn.execute("SELECT count(*) FROM embeddings_migration").fetchone()[0],
+                total,
+            )
+
+    conn.begin()
+    try:
+        conn.execute("DROP TABLE embeddings")
+        conn.execute("ALTER TABLE embeddings_migration RENAME TO embeddings")
+        _set_config_value(conn, "vector_migration_dim", None)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"Migrating DB: Vector column is now {target}.")
+
+
+def recover_embeddings_internal(
+    conn, progress: Callable[[int, int], None] = None
+) -> int:
+    """
+    Re-embeds rows whose model or dimension does not match the current model.
+    Rows go through the embedding service in batches and are written back with
+    one bulk UPDATE per batch. Each batch commits together with a checkpoint
+    in `config`, so an interrupted recovery resumes after the last written id.
+    Batches are written through `write_pipeline` like any other write, so the
+    Master keeps saving while this runs. Returns the number of embeddings fixed.
+    """
+    # Imported here: the pipeline itself builds on this module's locks
+    from mcp_core.core.write_pipeline import write_pipeline
+
+    count = 0
+    try:
+        current_model = embedding_service.model_name
+        expected_dim = embedding_service.get_model_info()["dimension"]
+        mismatch = "(e.model_name != ? OR e.dimension != ? OR e.dimension IS NULL)"
+
+        total = conn.execute(
+            f"SELECT count(DISTINCT f.id) FROM functions f JOIN embeddings e ON f.id = e.function_id WHERE {mismatch}",
             (current_model, expected_dim),
-        ).fetchall()
+        ).fetchone()[0]
+        if not total:
+            write_pipeline.execute(
+                _set_config_value, "embedding_recovery_checkpoint", None
+            )
+            return 0
 
-        if not rows:
-            return
+        # Checkpoint is "<model>:<dim>:<last function id>"
+        checkpoint = _get_config_value(conn, "embedding_recovery_checkpoint") or ""
+        prefix = f"{current_model}:{expected_dim}:"
+        last_id = int(checkpoint[len(prefix) :]) if checkpoint.startswith(prefix) else 0
 
         logger.warning(
-            f"Detected {len(rows)} inconsistent embeddings. Starting auto-recovery (Model: {current_model}, Dim: {expected_dim})..."
+            f"Detected {total} inconsistent embeddings. Starting auto-recovery (Model: {current_model}, Dim: {expected_dim}"
+            + (f", resuming after id {last_id}" if last_id else "")
+            + ")..."
         )
 
-        count = 0
-        for row in rows:
-            fid, name, desc, tags_json, meta_json, code, old_model, old_dim = row
-            tags = json.loads(tags_json) if tags_json else []
-            meta = json.loads(meta_json) if meta_json else {}
-            deps = meta.get("dependencies", [])
-
-            text_to_embed = f"Function Name: {name}\nDescription: {desc}\nTags: {', '.join(tags)}\nDependencies: {', '.join(deps)}\nCode:\n{code[:1000]}"
+        while True:
+            rows = conn.execute(
+                f"""
+                SELECT DISTINCT f.id, f.name, f.description, f.tags, f.code
+                FROM functions f
+                JOIN embeddings e ON f.id = e.function_id
+                WHERE {mismatch} AND f.id > ?
+                ORDER BY f.id
+                LIMIT ?
+            """,
+                (current_model, expected_dim, last_id, EMBEDDING_RECOVERY_BATCH),
+            ).fetchall()
+            if not rows:
+                break
 
+            texts = [
+                function_embedding_text(name, desc, tags or [], code)
+                for _, name, desc, tags, code in rows
+            ]
             try:
-                embedding = embedding_service.get_embedding(text_to_embed)
-                vector_list = embedding.tolist()
-
-                conn.execute(
-                    "UPDATE embeddings SET vector = ?, model_name = ?, dimension = ?, encoded_at = CURRENT_TIMESTAMP WHERE function_id = ?",
-                    (vector_list, current_model, len(vector_list), fid),
+                vectors = normalize_rows(
+                    embedding_service.get_embeddings(
+                        texts, batch_size=EMBEDDING_RECOVERY_BATCH
+                    )
                 )
-                count += 1
-                if count % 5 == 0:
-                    logger.info(f"Auto-recovery progress: {count}/{len(rows)}")
             except Exception as e:
-                logger.error(f"Failed to recover embedding for '{name}': {e}")
+                logger.error(
+                    f"Auto-recovery: Failed to embed ids {rows[0][0]}-{rows[-1][0]}: {e}"
+                )
+                vectors = None
+
+            last_id = rows[-1][0]
+            if vectors is not None and vectors.shape[1] != expected_dim:
+                vectors = None
+            write_pipeline.execute(
+                _apply_recovery_batch,
+                [r[0] for r in rows],
+                vectors,
+                current_model,
+                f"{prefix}{last_id}",
+            )
+            if vectors is not None:
+                count += len(rows)
+            logger.info(f"Auto-recovery progress: {count}/{total}")
+            if progress:
+                progress(count, total)
 
+        write_pipeline.execute(_set_config_value, "embedding_recovery_checkpoint", None)
         logger.info(f"Auto-recovery complete: Fixed {count} embeddings.")
-        conn.commit()
 
     except Exception as e:
         logger.error(f"Error during embedding recovery: {e}")
+    return count
+
+
+def _apply_recovery_batch(conn, function_ids, vectors, model_name: str, checkpoint):
+    """Write op: one recovered batch (None when it failed) and its checkpoint."""
+    if vectors is not None:
+        _bulk_update_vectors(conn, function_ids, vectors, model_name)
+    _set_config_value(conn, "embedding_recovery_checkpoint", checkpoint)
+
+
+def _bulk_update_vectors(conn, function_ids, vectors, model_name: str):
+    """
+    One UPDATE ... FROM for a whole batch. The matrix is bound as a single JSON
+    literal, which DuckDB casts far faster than per-float Python list binding.
+    """
+    dim = vectors.shape[1]
+    conn.execute(
+        f"""
+        UPDATE embeddings
+        SET vector = batch.vector, model_name = $1, dimension = {dim},
+            encoded_at = CURRENT_TIMESTAMP
+        FROM (
+            SELECT unnest($2::INTEGER[]) AS function_id,
+                   unnest($3::VARCHAR::FLOAT[{dim}][]) AS vector
+        ) AS batch
+        WHERE embeddings.function_id = batch.function_id
+    """,
+        (model_name, list(function_ids), json.dumps(vectors.tolist())),
+    )
 
 
 def _check_model_version_internal(conn):
@@ -275,13 +1023,12 @@ def _check_model_version_internal(conn):
 
 
 # Public wrappers if needed
-def recover_embeddings():
-    with DBWriteLock():
-        conn = get_db_connection()
-        try:
-            recover_embeddings_internal(conn)
-        finally:
-            conn.close()
+def recover_embeddings(progress: Callable[[int, int], None] = None) -> int:
+    conn = get_db_connection()
+    try:
+        return recover_embeddings_internal(conn, progress)
+    finally:
+        conn.close()
 
 
 def _check_model_version():
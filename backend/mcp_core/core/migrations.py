@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from mcp_core.core.config import MIGRATION_WAIT_TIMEOUT
+from mcp_core.core.database import (
+    _check_model_version,
+    migrate_schema,
+    migrate_vectors,
+    recover_embeddings,
+)
+from mcp_core.engine.result_cache import store_generation
+from mcp_core.engine.vector_index import vector_index
+
+logger = logging.getLogger(__name__)
+
+# Run order; each job assumes the ones before it finished. Every step is
+# idempotent or checkpointed, so a Master restarted mid-way resumes it.
+JOBS = ("schema", "vectors", "model_version", "embedding_recovery")
+
+SEMANTIC_JOBS = ("schema", "vectors", "model_version")
+
+# Jobs each tool needs. Searches only need the schema: until SEMANTIC_JOBS
+# are done they answer with lexical results (see `semantic_ready`).
+TOOL_REQUIREMENTS = {
+    "get_function": (),
+    "get_server_status": (),
+    "get_function_details": ("schema",),
+    "list_functions": ("schema",),
+    "list_functions_page": ("schema",),
+    "get_tag_counts": ("schema",),
+    # Internal: proxies score semantic searches against the read snapshot
+    "embed_query": (),
+    "get_triage_list": ("schema",),
+    "inject_local_package": ("schema",),
+    "search_functions": ("schema",),
+    "search_functions_batch": ("schema",),
+    "search_functions_page": ("schema",),
+    "smart_search_and_get": ("schema",),
+    "save_function": SEMANTIC_JOBS,
+    "delete_function": SEMANTIC_JOBS,
+    "check_search_recall": SEMANTIC_JOBS,
+    "reindex_embeddings": JOBS,
+}
+
+
+class ToolNotReady(RuntimeError):
+    """A tool was called before the startup migrations it needs finished."""
+
+
+class StartupMigrations:
+    """
+    Runs the slow part of `init_db` on a background thread so the Master can
+    serve reads as soon as `init_schema` has run. Each job's state (pending /
+    running / done / failed / blocked) and progress is tracked, and `require`
+    gates a tool on the jobs listed for it in TOOL_REQUIREMENTS.
+
+    Until `start` is called (tests, CLI tools, non-Master processes that ran
+    `init_db` themselves) every tool counts as ready.
+    """
+
+    def __init__(self, steps: Optional[Dict[str, Callable]] = None):
+        # Each step takes a progress(done, total) callback
+        self._steps = steps or {
+            "schema": lambda progress: migrate_schema(),
+            "vectors": migrate_vectors,
+            "model_version": lambda progress: _check_model_version(),
+            "embedding_recovery": recover_embeddings,
+        }
+        self.started = False
+        self._cond = threading.Condition()
+        self._jobs = {name: {"state": "pending"} for name in JOBS}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._cond:
+            if self.started:
+                return
+            self.started = True
+        self._thread = threading.Thread(
+            target=self._run_all, name="startup-migrations", daemon=True
+        )
+        self._thread.start()
+
+    def _run_all(self):
+        for i, name in enumerate(JOBS):
+            if not self._run(name):
+                for later in JOBS[i + 1 :]:
+                    self._update(later, state="blocked", blocked_by=name)
+                return
+            if name in ("vectors", "embedding_recovery"):
+                # The index may hold rows from before the rewrite
+                vector_index.invalidate()
+                store_generation.bump()
+        logger.info("StartupMigrations: All startup migrations complete.")
+
+    def _run(self, name: str) -> bool:
+        self._update(name, state="running", started_at=datetime.now().isoformat())
+        start = time.perf_counter()
+
+        def progress(done: int, total: int):
+            self._update(name, done=done, total=total)
+
+        try:
+            result = self._steps[name](progress)
+        except Exception as e:
+            logger.error(f"StartupMigrations: '{name}' failed: {e}", exc_info=True)
+            self._update(
+                name,
+                state="failed",
+                error=str(e),
+                elapsed_s=round(time.perf_counter() - start, 3),
+            )
+            return False
+        self._update(
+            name,
+            state="done",
+            result=result,
+            elapsed_s=round(time.perf_counter() - start, 3),
+        )
+        logger.info(f"StartupMigrations: '{name}' done.")
+        return True
+
+    def _update(self, name: str, **fields):
+        with self._cond:
+            self._jobs[name].update(fields)
+            self._cond.notify_all()
+
+    def _blocking_job(self, tool: str) -> Optional[str]:
+        for name in TOOL_REQUIREMENTS.get(tool, JOBS):
+            if self._jobs[name]["state"] != "done":
+                return name
+        return None
+
+    def require(self, tool: str, timeout: float = None):
+        """
+        Returns once every job `tool` needs is done, waiting up to `timeout`
+        seconds (MIGRATION_WAIT_TIMEOUT by default). Raises ToolNotReady
+        naming the job otherwise.
+        """
+        if not self.started:
+            return
+        timeout = MIGRATION_WAIT_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                name = self._blocking_job(tool)
+                if name is None:
+                    return
+                job = self._jobs[name]
+                if job["state"] in ("failed", "blocked"):
+                    raise ToolNotReady(
+                        f"'{tool}' is unavailable: startup migration '{name}' "
+                        f"{job['state']} ({job.get('error') or job.get('blocked_by')})."
+                    )
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    done = f", {job['done']}/{job['total']}" if "total" in job else ""
+                    raise ToolNotReady(
+                        f"'{tool}' is not ready yet: startup migration '{name}' is "
+                        f"{job['state']}{done}. Retry shortly."
+                    )
+                self._cond.wait(remaining)
+
+    def is_done(self, name: str) -> bool:
+        if not self.started:
+            return True
+        with self._cond:
+            return self._jobs[name]["state"] == "done"
+
+    def semantic_ready(self) -> bool:
+        """True once vector search can use the migrated embeddings."""
+        if not self.started:
+            return True
+        with self._cond:
+            return all(self._jobs[n]["state"] == "done" for n in SEMANTIC_JOBS)
+
+    def get_readiness(self) -> Dict:
+        with self._cond:
+            jobs = {name: dict(job) for name, job in self._jobs.items()}
+            tools = {}
+            for tool in TOOL_REQUIREMENTS:
+                name = self._blocking_job(tool) if self.started else None
+                tools[tool] = (
+                    "ready"
+                    if name is None
+                    else f"needs '{name}' ({self._jobs[name]['state']})"
+                )
+        return {"started": self.started, "jobs": jobs, "tools": tools}
+
+
+# Singleton Instance (started by the Master process)
+startup_migrations = StartupMigrations()
@@ -0,0 +1,186 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Tuple
+
+from mcp_core.core.database import DBWriteLock, db_connection
+
+logger = logging.getLogger(__name__)
+
+# (op, args, future)
+_Item = Tuple[Callable, tuple, Future]
+
+
+class WritePipeline:
+    """
+    Single writer for the Master process. Every mutation is an `op(conn, *args)`
+    callable queued here; one thread takes everything that queued up while the
+    previous commit ran (up to MAX_BATCH) and applies it in one transaction
+    (group commit), then resolves each caller's future with its op's return
+    value. If any op fails the batch is rolled back and replayed one op per
+    transaction, so only the failing caller sees the error. Ops therefore
+    must only touch the database and must not commit themselves.
+
+    While disabled (the default, and in every other process) an op runs in
+    its own transaction on the calling thread.
+
+    The startup schema, vector column and model version migrations are the
+    one exception: they run DDL (ALTER, DROP/RENAME of whole tables) that
+    must not share a transaction with other ops, so they write on their own
+    connection under `DBWriteLock`, which still serializes them with this
+    writer. Saves and deletes wait for them (see `core.migrations`).
+    """
+
+    MAX_BATCH = 128
+
+    def __init__(self):
+        self.enabled = False
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._conn = None  # The writer thread's open batch connection
+        self._lock = threading.Lock()
+        self._stats = {
+            "ops": 0,
+            "batches": 0,
+            "largest_batch": 0,
+            "replayed_batches": 0,
+            "failed_ops": 0,
+        }
+
+    def enable(self):
+        with self._lock:
+            if self.enabled:
+                return
+            self.enabled = True
+            self._thread = threading.Thread(
+                target=self._run, name="db-writer", daemon=True
+            )
+            self._thread.start()
+        logger.info("WritePipeline: Writer thread started.")
+
+    def disable(self):
+        """Stops the writer thread after it has applied everything queued."""
+        with self._lock:
+            if not self.enabled:
+                return
+            self.enabled = False
+            self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        # Ops that raced the shutdown run on this thread instead
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftovers.append(item)
+        for item in leftovers:
+            self._apply([item])
+
+    def submit(self, op: Callable, *args) -> Future:
+        """Queues `op(conn, *args)`; the future resolves once it is committed."""
+        if threading.current_thread() is self._thread:
+            # An op issuing a write of its own joins the open batch
+            future = Future()
+            future.set_result(op(self._conn, *args))
+            return future
+        if not self.enabled:
+            future = Future()
+            self._apply([(op, args, future)])
+            return future
+        future = Future()
+        self._queue.put((op, args, future))
+        return future
+
+    def execute(self, op: Callable, *args, timeout: float = None) -> Any:
+        """Runs `op(conn, *args)` through the pipeline and returns its result."""
+        return self.submit(op, *args).result(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._apply(batch)
+            if stop:
+                return
+
+    def _apply(self, batch: List[_Item]):
+        try:
+            results = self._transaction(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+                return
+            self._count("replayed_batches")
+            for item in batch:
+                try:
+                    (result,) = self._transaction([item])
+                except Exception as item_error:
+                    self._fail(item, item_error)
+                else:
+                    item[2].set_result(result)
+            return
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _transaction(self, batch: List[_Item]) -> List[Any]:
+        with DBWriteLock():
+            conn = db_connection()
+            on_writer = threading.current_thread() is self._thread
+            if on_writer:
+                self._conn = conn
+            try:
+                conn.begin()
+                results = [op(conn, *args) for op, args, _ in batch]
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                if on_writer:
+                    self._conn = None
+                conn.close()
+        with self._lock:
+            self._stats["ops"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+        return results
+
+    def _fail(self, item: _Item, error: Exception):
+        op, _, future = item
+        self._count("failed_ops")
+        logger.warning(f"WritePipeline: {op.__name__} failed: {error}")
+        future.set_exception(error)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch"] = (
+            round(stats["ops"] / stats["batches"], 2) if stats["batches"] else 0
+        )
+        stats["queued"] = self._queue.qsize()
+        stats["enabled"] = self.enabled
+        return stats
+
+
+# Singleton Instance (enabled by the Master process)
+write_pipeline = WritePipeline()
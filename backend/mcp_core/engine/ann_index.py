@@ -0,0 +1,405 @@
+import atexit
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from mcp_core.core import config
+from mcp_core.engine.embedding import normalize
+from mcp_core.engine.vector_index import VectorIndex, vector_index
+from mcp_core.engine.worker import task_worker
+
+logger = logging.getLogger(__name__)
+
+# Persist incremental changes after this many inserts/deletes
+PERSIST_EVERY = 500
+# Retrain when the store has grown this much since the last training
+RETRAIN_GROWTH = 2.0
+
+
+def _content_hash(vector: np.ndarray) -> int:
+    """Fingerprint of one stored vector, to spot ids re-embedded while offline."""
+    digest = hashlib.blake2b(
+        np.ascontiguousarray(vector, dtype=np.float32).tobytes(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _content_hashes(vectors: np.ndarray) -> np.ndarray:
+    return np.fromiter((_content_hash(v) for v in vectors), np.int64, len(vectors))
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index (IVF with spherical k-means) in pure NumPy.
+    It only pre-selects candidates: the `nprobe` closest clusters are gathered and
+    handed to VectorIndex, which scores them exactly with the quality blend.
+    Persisted next to the DuckDB file (with a content hash per id) and kept
+    in sync incrementally.
+    """
+
+    def __init__(self, vectors: VectorIndex, nprobe: int = 16):
+        self._vectors = vectors
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._source = None  # (db_path, model_name) the lists belong to
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[set] = []
+        self._assign: Dict[int, int] = {}
+        self._hashes: Dict[int, int] = {}  # {fid: content hash of its vector}
+        self._trained_size = 0
+        self._dirty = 0
+        self._building = False
+        self._pending = []  # mutations received while a build is running
+        self.last_build_seconds = None
+        vectors.subscribe(self)
+
+    @staticmethod
+    def index_path() -> Path:
+        return Path(config.DB_PATH).with_suffix(".ivf.npz")
+
+    @property
+    def is_ready(self) -> bool:
+        return (
+            self._centroids is not None
+            and self._source is not None
+            and self._source == self._vectors.source
+        )
+
+    def should_use(self, mode: Optional[str] = None) -> bool:
+        """Decides whether a query goes through ANN or the exact scan."""
+        mode = mode or config.SEARCH_MODE
+        if mode == "exact":
+            return False
+        if mode == "auto" and len(self._vectors) < config.ANN_MIN_VECTORS:
+            return False
+        if self.is_ready:
+            return True
+        self._schedule_build()
+        return False  # exact scan until the ANN lists are available
+
+    def _schedule_build(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+            self._pending = []
+        logger.info("IVFIndex: Scheduling background build.")
+        task_worker.add_task(self.load_or_rebuild)
+
+    def load_or_rebuild(self):
+        """Loads the persisted lists, or trains new ones. Runs on the background worker."""
+        if not self._load_persisted():
+            self.rebuild()
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _choose_nlist(n: int) -> int:
+        return int(np.clip(int(np.sqrt(n) * 2), 8, 4096))
+
+    @staticmethod
+    def _assign_to(centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        out = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], 8192):
+            chunk = vectors[start : start + 8192]
+            out[start : start + chunk.shape[0]] = np.argmax(chunk @ centroids.T, axis=1)
+        return out
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: int, iterations: int = 8, seed: int = 0):
+        """Spherical k-means on a sample of the (normalized) vectors."""
+        rng = np.random.default_rng(seed)
+        n = vectors.shape[0]
+        nlist = min(nlist, n)
+        sample_size = min(n, nlist * 40)
+        sample = vectors[rng.choice(n, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = cls._assign_to(centroids, sample)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty clusters with random sample points
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        return centroids
+
+    def rebuild(self):
+        """Full (re)training. Runs on the background worker."""
+        started = time.monotonic()
+        with self._lock:
+            self._building = True
+            self._pending = []
+        try:
+            source = self._vectors.source
+            ids, vectors = self._vectors.export()
+            if len(ids) == 0:
+                logger.info("IVFIndex: Store is empty. Nothing to build.")
+                return
+
+            centroids = self.train(vectors, self._choose_nlist(len(ids)))
+            labels = self._assign_to(centroids, vectors)
+
+            hashes = _content_hashes(vectors)
+            with self._lock:
+                self._install(source, centroids, ids, labels, hashes)
+                self._trained_size = len(ids)
+                self._replay_pending()
+            self.last_build_seconds = time.monotonic() - started
+            logger.info(
+                f"IVFIndex: Built {len(self._lists)} lists over {len(ids)} vectors "
+                f"in {self.last_build_seconds:.2f}s."
+            )
+            self.save()
+        except Exception as e:
+            logger.error(f"IVFIndex: Build failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._building = False
+
+    def _replay_pending(self):
+        """Applies mutations that arrived during a build. Caller holds lock."""
+        pending, self._pending = self._pending, []
+        for op, fid, vector in pending:
+            if op == "upsert":
+                self._add(fid, vector)
+            else:
+                self._discard(fid)
+
+    def _install(self, source, centroids, ids, labels, hashes):
+        self._source = source
+        self._centroids = centroids
+        self._lists = [set() for _ in range(centroids.shape[0])]
+        self._assign = {}
+        for fid, label in zip(ids.tolist(), labels.tolist()):
+            self._lists[label].add(fid)
+            self._assign[fid] = label
+        self._hashes = dict(zip(ids.tolist(), hashes.tolist()))
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance (VectorIndex observer)
+    # ------------------------------------------------------------------
+
+    def _add(self, fid: int, vector: np.ndarray):
+        self._discard(fid)
+        label = int(np.argmax(self._centroids @ vector))
+        self._lists[label].add(fid)
+        self._assign[fid] = label
+        self._hashes[fid] = _content_hash(vector)
+
+    def _discard(self, fid: int):
+        self._hashes.pop(fid, None)
+        label = self._assign.pop(fid, None)
+        if label is not None:
+            self._lists[label].discard(fid)
+
+    def vector_upserted(self, fid: int, vector: np.ndarray):
+        with self._lock:
+            if self._building:
+                self._pending.append(("upsert", fid, vector.copy()))
+            elif self.is_ready:
+                self._add(fid, vector)
+                self._mark_dirty()
+
+    def vector_removed(self, fid: int):
+        with self._lock:
+            if self._building:
+                self._pending.append(("remove", fid, None))
+            elif self.is_ready:
+                self._discard(fid)
+                self._mark_dirty()
+
+    def _mark_dirty(self):
+        self._dirty += 1
+        if len(self._assign) > self._trained_size * RETRAIN_GROWTH:
+            self._building = True
+            task_worker.add_task(self.rebuild)
+        elif self._dirty >= PERSIST_EVERY:
+            self._dirty = 0
+            task_worker.add_task(self.save)
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+
+    def candidates(self, query_vector: np.ndarray, limit: int) -> Optional[np.ndarray]:
+        """Returns the function ids in the closest lists (None if not ready)."""
+        with self._lock:
+            if not self.is_ready:
+                return None
+            order = np.argsort(-(self._centroids @ query_vector))
+            probed = []
+            count = 0
+            for i, label in enumerate(order):
+                probed.append(self._lists[label])
+                count += len(self._lists[label])
+                if i + 1 >= self.nprobe and count >= limit:
+                    break
+            return np.fromiter(itertools.chain.from_iterable(probed), dtype=np.int64)
+
+    def search(self, query_vector, limit: int = 20):
+        """ANN search with the same result shape as VectorIndex.search."""
+        q = normalize(query_vector)
+        candidate_ids = self.candidates(q, limit)
+        return self._vectors.search(q, limit, candidate_ids=candidate_ids)
+
+    def measure_recall(self, k: int = 10, samples: int = 50, seed: int = 0) -> Dict:
+        """
+        Compares ANN results against the exact scan, using stored vectors as
+        queries. Builds the index synchronously if needed.
+        """
+        if not self.is_ready:
+            self.rebuild()
+        ids, vectors = self._vectors.export()
+        if len(ids) == 0 or not self.is_ready:
+            return {"error": "Vector index is empty."}
+
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(len(ids), min(samples, len(ids)), replace=False)
+        hit, total = 0, 0
+        exact_time, ann_time = 0.0, 0.0
+        for row in picks:
+            q = vectors[row]
+            t0 = time.perf_counter()
+            exact = {h[0] for h in self._vectors.search(q, k)}
+            t1 = time.perf_counter()
+            approx = {h[0] for h in self.search(q, k)}
+            t2 = time.perf_counter()
+            exact_time += t1 - t0
+            ann_time += t2 - t1
+            hit += len(exact & approx)
+            total += len(exact)
+
+        return {
+            f"recall@{k}": round(hit / total, 4) if total else 0.0,
+            "samples": len(picks),
+            "vectors": len(ids),
+            "nlist": len(self._lists),
+            "nprobe": self.nprobe,
+            "exact_ms_avg": round(exact_time / len(picks) * 1000, 3),
+            "ann_ms_avg": round(ann_time / len(picks) * 1000, 3),
+        }
+
+    def get_status(self) -> Dict:
+        return {
+            "mode": config.SEARCH_MODE,
+            "ready": self.is_ready,
+            "building": self._building,
+            "nlist": len(self._lists),
+            "nprobe": self.nprobe,
+            "indexed": len(self._assign),
+            "last_build_seconds": self.last_build_seconds,
+        }
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self):
+        """Writes the lists atomically next to the DB file."""
+        with self._lock:
+            if not self.is_ready:
+                return
+            fids = np.fromiter(self._assign.keys(), dtype=np.int64)
+            labels = np.fromiter(self._assign.values(), dtype=np.int32)
+            hashes = np.fromiter(
+                (self._hashes.get(fid, 0) for fid in self._assign), dtype=np.int64
+            )
+            centroids = self._centroids
+            db_path, model_name = self._source
+            trained_size = self._trained_size
+            self._dirty = 0
+
+        path = self.index_path()
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    centroids=centroids,
+                    fids=fids,
+                    labels=labels,
+                    hashes=hashes,
+                    model_name=np.array(model_name),
+                    trained_size=np.array(trained_size),
+                )
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.error(f"IVFIndex: Failed to persist index: {e}")
+
+    def _load_persisted(self) -> bool:
+        """
+        Loads the on-disk lists if they match the current model, then reconciles
+        them with the live store: removed ids are dropped, new ids and ids whose
+        vector changed (by content hash) are (re)assigned. Runs on the
+        background worker with `_building` set, without the lock.
+        """
+        path = self.index_path()
+        if not path.exists():
+            return False
+        try:
+            with np.load(path) as data:
+                model_name = str(data["model_name"])
+                centroids = data["centroids"]
+                fids = data["fids"]
+                labels = data["labels"]
+                # Files written before hashes were stored: reassign every id
+                hashes = data["hashes"] if "hashes" in data else np.zeros_like(fids)
+                trained_size = int(data["trained_size"])
+
+            ids, vectors = self._vectors.export()
+            source = self._vectors.source
+            if model_name != source[1]:
+                logger.info("IVFIndex: Persisted index belongs to another model.")
+                return False
+            if len(ids) and centroids.shape[1] != vectors.shape[1]:
+                return False
+
+            # Changes made to the store while the index was not running
+            live_hashes = _content_hashes(vectors)
+            stored = dict(zip(fids.tolist(), hashes.tolist()))
+            stale = np.array(
+                [stored.get(fid) != h for fid, h in zip(ids.tolist(), live_hashes)],
+                dtype=bool,
+            )
+            new_labels = self._assign_to(centroids, vectors[stale])
+            with self._lock:
+                self._install(source, centroids, fids, labels, hashes)
+                self._trained_size = trained_size
+                for fid in set(self._assign) - set(ids.tolist()):
+                    self._discard(fid)
+                for fid, label, h in zip(
+                    ids[stale].tolist(), new_labels.tolist(), live_hashes[stale]
+                ):
+                    self._discard(fid)
+                    self._lists[label].add(fid)
+                    self._assign[fid] = label
+                    self._hashes[fid] = int(h)
+                self._replay_pending()
+                self._building = False
+            logger.info(
+                f"IVFIndex: Loaded {len(self._assign)} entries from {path} "
+                f"({int(stale.sum())} reassigned)."
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"IVFIndex: Could not load persisted index: {e}")
+            return False
+
+
+# Singleton Instance (Master process)
+ann_index = IVFIndex(vector_index, nprobe=config.ANN_NPROBE)
+atexit.register(ann_index.save)
@@ -0,0 +1,327 @@
+"""
+Bulk (re)indexing of every stored function's embedding.
+
+Used after a model change, a large hub pull or a switch of FS_MODEL_TYPE.
+Texts are sharded across a process pool with one ONNX session per worker;
+finished shards are written back to DuckDB in batches as they complete.
+
+    python -m mcp_core.engine.bulk_indexer --workers 4
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    wait,
+)
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from mcp_core.core import config
+from mcp_core.core.database import get_db_connection
+from mcp_core.core.write_pipeline import write_pipeline
+from mcp_core.engine.embedding import (
+    embedding_service,
+    function_embedding_text,
+    normalize_rows,
+)
+from mcp_core.engine.embedding_cache import embedding_cache
+
+logger = logging.getLogger(__name__)
+
+# Rows read from the DB per page
+READ_PAGE_ROWS = 1000
+
+# ------------------------------------------------------------------
+# Worker process side
+# ------------------------------------------------------------------
+
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int):
+    """Loads one ONNX session per worker, limited to `threads` intra-op threads."""
+    global _worker_model
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    from fastembed import TextEmbedding
+
+    _worker_model = TextEmbedding(
+        model_name=model_name, cache_dir=str(config.CACHE_DIR), threads=threads
+    )
+
+
+def _embed_shard(texts: List[str]) -> np.ndarray:
+    return np.asarray(list(_worker_model.embed(texts)), dtype=np.float32)
+
+
+# ------------------------------------------------------------------
+# Parent side
+# ------------------------------------------------------------------
+
+
+def plan_workers(workers: Optional[int] = None) -> Tuple[int, int]:
+    """
+    (worker processes, intra-op threads per worker). Together they never
+    exceed the CPU count, so the pool doesn't oversubscribe the machine.
+    """
+    cpus = os.cpu_count() or 1
+    if not workers or workers < 1:
+        workers = max(1, min(4, cpus // 2))
+    workers = min(workers, cpus)
+    return workers, max(1, cpus // workers)
+
+
+def count_functions() -> int:
+    conn = get_db_connection()
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM functions WHERE status != 'deleted'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def iter_function_texts(page_rows: int = READ_PAGE_ROWS) -> Iterator[Tuple[int, str]]:
+    """(function id, embedding text) for every live function, in id order."""
+    last_id = 0
+    while True:
+        conn = get_db_connection()
+        try:
+            rows = conn.execute(
+                """
+                SELECT id, name, description, tags, code FROM functions
+                WHERE status != 'deleted' AND id > ?
+                ORDER BY id LIMIT ?
+                """,
+                (last_id, page_rows),
+            ).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        for fid, name, desc, tags, code in rows:
+            yield fid, function_embedding_text(name, desc, tags or [], code)
+        last_id = rows[-1][0]
+
+
+def write_embeddings(function_ids: List[int], vectors: np.ndarray, model_name: str):
+    """Replaces the embeddings of a batch of functions in one transaction."""
+    write_pipeline.execute(_replace_embeddings, function_ids, vectors, model_name)
+
+
+def _replace_embeddings(conn, function_ids, vectors: np.ndarray, model_name: str):
+    dim = vectors.shape[1]
+    conn.execute(
+        "DELETE FROM embeddings WHERE function_id IN (SELECT unnest($1::INTEGER[]))",
+        (function_ids,),
+    )
+    conn.execute(
+        f"""
+        INSERT INTO embeddings (function_id, vector, model_name, dimension, encoded_at)
+        SELECT unnest($1::INTEGER[]), unnest($2::VARCHAR::FLOAT[{dim}][]),
+               $3, {dim}, CURRENT_TIMESTAMP
+        """,
+        (function_ids, json.dumps(vectors.tolist()), model_name),
+    )
+
+
+class BulkIndexer:
+    """
+    Re-embeds the whole store. `workers > 1` shards the texts across a process
+    pool (FastEmbed only); otherwise the in-process embedding service is used
+    in batches (also the path for the cloud backend, where inference is remote).
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        batch_size: int = 64,
+        progress: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.workers, self.threads = plan_workers(workers)
+        if config.MODEL_TYPE == "gemini":
+            self.workers = 1
+        self.batch_size = batch_size
+        self.progress = progress
+        self.model_name = embedding_service.model_name
+
+    def run(self) -> Dict:
+        started = time.perf_counter()
+        stats = {"indexed": 0, "cached": 0, "workers": self.workers}
+        texts = iter_function_texts()
+
+        if self.workers > 1:
+            self._run_pool(texts, stats, started)
+        else:
+            for batch in _chunks(texts, self.batch_size):
+                ids = [fid for fid, _ in batch]
+                vectors = embedding_service.get_embeddings(
+                    [t for _, t in batch], batch_size=self.batch_size
+                )
+                self._write(ids, vectors, stats, started)
+
+        self._refresh_indexes()
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 3)
+        stats["texts_per_second"] = (
+            round(stats["indexed"] / elapsed, 1) if elapsed else 0
+        )
+        logger.info(
+            f"BulkIndexer: Reindexed {stats['indexed']} functions in {elapsed:.1f}s "
+            f"({stats['texts_per_second']} texts/s, {self.workers} workers)."
+        )
+        return stats
+
+    def _run_pool(self, texts, stats: Dict, started: float):
+        # spawn: the parent may already hold an ONNX session and DuckDB handles
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.model_name, self.threads),
+        ) as pool:
+            in_flight = {}
+            for batch in _chunks(texts, self.batch_size):
+                ids = [fid for fid, _ in batch]
+                batch_texts = [t for _, t in batch]
+                cached = embedding_cache.get_many(self.model_name, batch_texts)
+                if all(v is not None for v in cached):
+                    stats["cached"] += len(ids)
+                    self._write(ids, np.stack(cached), stats, started)
+                    continue
+                future = pool.submit(_embed_shard, batch_texts)
+                in_flight[future] = (ids, batch_texts)
+                # Bounded read-ahead keeps memory flat on large stores
+                if len(in_flight) >= self.workers * 2:
+                    self._drain(in_flight, stats, started, FIRST_COMPLETED)
+            self._drain(in_flight, stats, started, ALL_COMPLETED)
+
+    def _drain(self, in_flight: Dict, stats: Dict, started: float, return_when):
+        """Writes back finished shards (the first one, or all of them)."""
+        done, _ = wait(list(in_flight), return_when=return_when)
+        for future in done:
+            ids, batch_texts = in_flight.pop(future)
+            vectors = future.result()
+            embedding_cache.put_many(self.model_name, batch_texts, vectors)
+            self._write(ids, vectors, stats, started)
+
+    def _write(self, ids: List[int], vectors, stats: Dict, started: float):
+        write_embeddings(ids, normalize_rows(vectors), self.model_name)
+        stats["indexed"] += len(ids)
+        elapsed = time.perf_counter() - started
+        rate = stats["indexed"] / elapsed if elapsed else 0.0
+        logger.info(f"BulkIndexer: {stats['indexed']} indexed ({rate:.1f} texts/s).")
+        if self.progress:
+            self.progress({"indexed": stats["indexed"], "texts_per_second": rate})
+
+    @staticmethod
+    def _refresh_indexes():
+        """Rebuilds the in-memory indexes from the new vectors."""
+        from mcp_core.engine.ann_index import ann_index
+        from mcp_core.engine.result_cache import store_generation
+        from mcp_core.engine.vector_index import vector_index
+        from mcp_core.engine.worker import task_worker
+
+        vector_index.invalidate()
+        vector_index.ensure_loaded()
+        if ann_index.is_ready:
+            task_worker.add_task(ann_index.rebuild)  # Lists were trained on old vectors
+        store_generation.bump()
+
+
+class ReindexJob:
+    """
+    Runs `BulkIndexer` on a background thread for the `reindex_embeddings`
+    tool and tracks it like a startup migration job: state (idle / running /
+    done / failed), done/total and the final stats, for `get_server_status`.
+    One reindex runs at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._job: Dict = {"state": "idle"}
+
+    def start(self, workers: Optional[int] = None, batch_size: int = 64) -> Dict:
+        """Starts a reindex unless one is running. Returns the job status."""
+        with self._lock:
+            if self._job["state"] == "running":
+                return dict(self._job, started=False)
+            self._job = {
+                "state": "running",
+                "started_at": datetime.now().isoformat(),
+                "done": 0,
+                "total": count_functions(),
+            }
+            status = dict(self._job, started=True)
+        threading.Thread(
+            target=self._run,
+            args=(workers, batch_size),
+            name="reindex-embeddings",
+            daemon=True,
+        ).start()
+        return status
+
+    def _run(self, workers, batch_size):
+        start = time.perf_counter()
+
+        def progress(update: Dict):
+            self._update(done=update["indexed"])
+
+        try:
+            result = BulkIndexer(workers, batch_size, progress=progress).run()
+        except Exception as e:
+            logger.error(f"BulkIndexer: Reindex failed: {e}", exc_info=True)
+            self._update(
+                state="failed",
+                error=str(e),
+                elapsed_s=round(time.perf_counter() - start, 3),
+            )
+            return
+        self._update(
+            state="done",
+            result=result,
+            elapsed_s=round(time.perf_counter() - start, 3),
+        )
+
+    def _update(self, **fields):
+        with self._lock:
+            self._job.update(fields)
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            return dict(self._job)
+
+
+# Singleton Instance (Master process)
+reindex_job = ReindexJob()
+
+
+def _chunks(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Re-embed every stored function.")
+    parser.add_argument("--workers", type=int, default=0, help="0 = auto")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    print(BulkIndexer(args.workers, args.batch_size).run())
@@ -0,0 +1,214 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from mcp_core.core import config
+from mcp_core.core.write_pipeline import write_pipeline
+
+logger = logging.getLogger(__name__)
+
+# config key holding the token of the last committed flush
+FLUSH_TOKEN_KEY = "call_counter_flush"
+# Committed flushes remembered for readers whose transaction predates them
+RECENT_FLUSHES = 16
+
+
+def _apply_counts(conn, rows: list, token: str):
+    placeholders = ", ".join("(?, ?, ?)" for _ in rows)
+    params = [value for row in rows for value in row]
+    conn.execute(
+        f"""
+        UPDATE functions
+        SET call_count = COALESCE(call_count, 0) + v.n,
+            last_called_at = GREATEST(COALESCE(last_called_at, ''), v.ts)
+        FROM (VALUES {placeholders}) AS v(name, n, ts)
+        WHERE functions.name = v.name
+        """,
+        params,
+    )
+    conn.execute("DELETE FROM config WHERE key = ?", (FLUSH_TOKEN_KEY,))
+    conn.execute(
+        "INSERT INTO config (key, value) VALUES (?, ?)", (FLUSH_TOKEN_KEY, token)
+    )
+
+
+class CallCounter:
+    """
+    Write-behind `call_count` / `last_called_at` for `get_function`.
+    `record` only appends to a deque (atomic under the GIL, no lock on the
+    read path); `flush` folds the calls per function and writes them with one
+    batched UPDATE through the write pipeline. Readers add the calls their
+    view of the store doesn't include yet: `unflushed(conn)` inside the
+    transaction that reads the stored counts. Each flush commits a token with
+    its UPDATE, which tells whether that transaction already sees it, so a
+    reader never waits for a flush and never counts a call twice.
+
+    Flushes leave the store generation alone: no searchable field changes.
+    `flush_count` is what tells the snapshot publisher to republish.
+
+    Calls are kept per store (DB_PATH) and only flushed into their own store.
+    """
+
+    def __init__(self):
+        self._calls: deque = deque()
+        self._lock = threading.Lock()
+        # db_path -> name -> [count, last_called_at]
+        self._pending: Dict[str, Dict[str, list]] = {}
+        # db_path -> [(token, name -> (count, last_called_at))], oldest first:
+        # the last RECENT_FLUSHES committed flushes, then the one being written
+        self._flushes: Dict[str, deque] = {}
+        self._in_flight: Dict[str, str] = {}  # db_path -> token being written
+        self._flush_lock = threading.Lock()  # One flush at a time
+        self.flushed_calls = 0
+        self.flush_count = 0
+
+    def record(self, name: str, called_at: Optional[str] = None):
+        self._calls.append(
+            (str(config.DB_PATH), name, called_at or datetime.now().isoformat())
+        )
+
+    def _fold(self):
+        # Caller holds self._lock
+        while self._calls:
+            try:
+                db_path, name, called_at = self._calls.popleft()
+            except IndexError:
+                break
+            entry = self._pending.setdefault(db_path, {}).setdefault(name, [0, ""])
+            entry[0] += 1
+            entry[1] = max(entry[1], called_at)
+
+    def pending(self) -> Dict[str, Tuple[int, str]]:
+        """Unflushed (count, last_called_at) per function of the current store."""
+        with self._lock:
+            return self._merged(str(config.DB_PATH), None)
+
+    def unflushed(self, conn) -> Dict[str, Tuple[int, str]]:
+        """
+        Like `pending`, as seen from `conn`'s open transaction: also the
+        calls of flushes that transaction doesn't include yet. Read the stored
+        counts in the same transaction.
+        """
+        row = conn.execute(
+            "SELECT value FROM config WHERE key = ?", (FLUSH_TOKEN_KEY,)
+        ).fetchone()
+        with self._lock:
+            return self._merged(str(config.DB_PATH), row[0] if row else None)
+
+    def _merged(self, db_path: str, seen_token) -> Dict[str, Tuple[int, str]]:
+        # Caller holds self._lock. `seen_token` None: only the in-flight flush
+        self._fold()
+        merged = {
+            name: (n, ts) for name, (n, ts) in self._pending.get(db_path, {}).items()
+        }
+        flushes = list(self._flushes.get(db_path, ()))
+        if seen_token is None:
+            in_flight = self._in_flight.get(db_path)
+            flushes = [f for f in flushes if f[0] == in_flight]
+        else:
+            tokens = [token for token, _ in flushes]
+            if seen_token in tokens:
+                flushes = flushes[tokens.index(seen_token) + 1 :]
+        for _, counts in flushes:
+            for name, (n, ts) in counts.items():
+                m, last = merged.get(name, (0, ""))
+                merged[name] = (m + n, max(last, ts))
+        return merged
+
+    def apply(self, name: str, call_count: Optional[int], last_called_at, pending=None):
+        """
+        Stored values plus the unflushed calls for `name`. Pass one `pending()`
+        or `unflushed()` snapshot when merging many rows.
+        """
+        n, ts = (self.pending() if pending is None else pending).get(name, (0, ""))
+        return (call_count or 0) + n, max(last_called_at or "", ts) or None
+
+    def discard(self, name: str):
+        """Drops the unflushed calls of a deleted function."""
+        with self._lock:
+            self._fold()
+            self._pending.get(str(config.DB_PATH), {}).pop(name, None)
+            for _, counts in self._flushes.get(str(config.DB_PATH), ()):
+                counts.pop(name, None)
+
+    def flush(self) -> int:
+        """Writes the current store's pending calls. Returns the number written."""
+        db_path = str(config.DB_PATH)
+        with self._flush_lock:
+            with self._lock:
+                self._fold()
+                counts = self._pending.pop(db_path, None)
+                if not counts:
+                    return 0
+                token = uuid.uuid4().hex
+                in_flight = {name: tuple(entry) for name, entry in counts.items()}
+                flushes = self._flushes.setdefault(db_path, deque())
+                flushes.append((token, in_flight))
+                self._in_flight[db_path] = token
+            rows = [(name, n, ts) for name, (n, ts) in in_flight.items()]
+            try:
+                write_pipeline.execute(_apply_counts, rows, token)
+            except Exception as e:
+                logger.error(f"CallCounter: Flush failed, keeping counts: {e}")
+                with self._lock:
+                    flushes.pop()
+                    del self._in_flight[db_path]
+                    merged = self._pending.setdefault(db_path, {})
+                    # Skips functions deleted while the write was running
+                    for name, (n, ts) in in_flight.items():
+                        entry = merged.setdefault(name, [0, ""])
+                        entry[0] += n
+                        entry[1] = max(entry[1], ts)
+                return 0
+            with self._lock:
+                del self._in_flight[db_path]
+                while len(flushes) > RECENT_FLUSHES:
+                    flushes.popleft()
+                written = sum(n for n, _ in in_flight.values())
+                self.flushed_calls += written
+                self.flush_count += 1
+        return written
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._fold()
+            queued = sum(
+                n
+                for db_path, counts in self._pending.items()
+                for n, _ in counts.values()
+            ) + sum(
+                n
+                for db_path, token in self._in_flight.items()
+                for t, counts in self._flushes[db_path]
+                if t == token
+                for n, _ in counts.values()
+            )
+        return {
+            "pending_calls": queued,
+            "flushed_calls": self.flushed_calls,
+            "flushes": self.flush_count,
+        }
+
+    def start(self, interval: float):
+        """
+        Master only: flushes every `interval` seconds on a daemon thread
+        (0 = only at exit) and at interpreter exit.
+        """
+        atexit.register(self.flush)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.flush()
+
+        if interval > 0:
+            threading.Thread(target=run, daemon=True, name="call-counter").start()
+
+
+# Singleton Instance
+call_counter = CallCounter()
@@ -1,13 +1,23 @@
 import logging
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List
 
 import numpy as np
 from mcp_core.core.config import (
     CACHE_DIR,
     EMBEDDING_MODEL_ID,
     GEMINI_API_KEY,
+    GEMINI_BASE_URL,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_MAX_RETRIES,
+    GEMINI_REQUESTS_PER_MINUTE,
     MODEL_TYPE,
 )
+from mcp_core.engine.embedding_cache import embedding_cache
+from mcp_core.engine.rate_limiter import TokenBucket, backoff_delay
 
 # Suppress verbose third-party logging
 logging.getLogger("fastembed").setLevel(logging.WARNING)
@@ -17,17 +27,162 @@ logging.getLogger("google.genai").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
-class GeminiEmbeddingService:
+class EmbeddingUnavailable(Exception):
+    """The backend could not produce an embedding (after retries)."""
+
+
+def normalize(vector) -> np.ndarray:
+    """Returns an L2-normalized float32 copy. Zero vectors stay zero."""
+    v = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(v))
+    if norm == 0.0 or not np.isfinite(norm):
+        return np.zeros_like(v)
+    return v / norm
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """Row-wise `normalize` for an (n, dim) matrix."""
+    m = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[(norms == 0) | ~np.isfinite(norms)] = np.inf
+    return m / norms
+
+
+def function_embedding_text(name: str, description: str, tags, code: str) -> str:
+    """The document text embedded for a stored function (save and recovery alike)."""
+    return f"Function: {name}\nDesc: {description}\nTags: {','.join(tags or [])}\nCode:\n{(code or '')[:500]}"
+
+
+class _CachedEmbeddingService:
+    """
+    Public embedding API shared by the backends. Vectors are served from the
+    on-disk content-addressed cache when the same text was embedded before by
+    the same model; only misses reach `_embed` / `_embed_batch`.
+    """
+
+    model_name: str
+    default_batch_size = 32
+
+    # Warmup / readiness: idle (lazy load on first use) -> loading -> ready | failed
+    _readiness = {"state": "idle"}
+    _warmup_lock = threading.Lock()
+
+    def start_warmup(self):
+        """
+        Loads the model on a daemon thread (called once the master role is
+        decided). While it loads, searches use the lexical path instead of waiting.
+        """
+        with self._warmup_lock:
+            if self._readiness["state"] in ("loading", "ready"):
+                return
+            self._readiness = {
+                "state": "loading",
+                "model_name": self.model_name,
+                "started_at": datetime.now().isoformat(),
+            }
+        threading.Thread(
+            target=self._warmup, daemon=True, name="embedding-warmup"
+        ).start()
+
+    def _warmup(self):
+        start = time.perf_counter()
+        error = None
+        try:
+            self._ensure_initialized()
+            if self.is_loaded():
+                self._embed("warmup", True)  # First inference builds the session
+            else:
+                error = "Model could not be loaded (see logs)."
+        except Exception as e:
+            error = str(e)
+        elapsed = round(time.perf_counter() - start, 3)
+
+        readiness = dict(self._readiness, load_seconds=elapsed)
+        if error:
+            readiness.update(state="failed", error=error)
+            logger.error(f"EmbeddingService: Warmup failed after {elapsed}s: {error}")
+        else:
+            readiness.update(state="ready", ready_at=datetime.now().isoformat())
+            logger.info(f"EmbeddingService: Model ready in {elapsed}s.")
+        self._readiness = readiness
+
+    def is_warming_up(self) -> bool:
+        return self._readiness["state"] == "loading"
+
+    def get_readiness(self) -> dict:
+        return dict(self._readiness)
+
+    def is_loaded(self) -> bool:
+        raise NotImplementedError
+
+    def get_embedding(self, text: str, is_query: bool = False) -> np.ndarray:
+        cached = embedding_cache.get(self.model_name, text, is_query)
+        if cached is not None:
+            return cached
+        vector = self._embed(text, is_query)
+        embedding_cache.put(self.model_name, text, vector, is_query)
+        return vector
+
+    def get_embeddings(
+        self, texts: List[str], is_query: bool = False, batch_size: int = None
+    ) -> np.ndarray:
+        """Returns a (len(texts), dim) float32 matrix; only cache misses are embedded."""
+        found = embedding_cache.get_many(self.model_name, texts, is_query)
+        misses = [i for i, v in enumerate(found) if v is None]
+        if len(misses) == len(texts):
+            computed = self._embed_batch(
+                texts, is_query, batch_size or self.default_batch_size
+            )
+            embedding_cache.put_many(self.model_name, texts, computed, is_query)
+            return computed
+
+        dim = next(len(v) for v in found if v is not None)
+        out = np.empty((len(texts), dim), dtype=np.float32)
+        for i, v in enumerate(found):
+            if v is not None:
+                out[i] = v
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            computed = self._embed_batch(
+                miss_texts, is_query, batch_size or self.default_batch_size
+            )
+            embedding_cache.put_many(self.model_name, miss_texts, computed, is_query)
+            out[misses] = computed
+        return out
+
+    def _embed(self, text: str, is_query: bool) -> np.ndarray:
+        raise NotImplementedError
+
+    def _embed_batch(
+        self, texts: List[str], is_query: bool, batch_size: int
+    ) -> np.ndarray:
+        raise NotImplementedError
+
+
+class GeminiEmbeddingService(_CachedEmbeddingService):
     """
     Cloud Embedding Service using Google Gemini (1536D).
+
+    Texts are sent in `embed_content` batches. Requests pass a token bucket
+    (FS_GEMINI_REQUESTS_PER_MINUTE) and a bounded number run concurrently
+    (FS_GEMINI_MAX_CONCURRENCY). 429/5xx/network errors are retried with
+    jittered exponential backoff. A request that still fails raises
+    `EmbeddingUnavailable`. It never returns a zero vector.
     """
 
+    default_batch_size = 100  # batchEmbedContents limit
+
     def __init__(self):
         self.model_name = (
             "models/text-embedding-004"  # Latest recommended for embeddings
         )
         self._api_key = GEMINI_API_KEY
         self._client = None
+        self._limiter = TokenBucket(
+            GEMINI_REQUESTS_PER_MINUTE / 60.0,
+            capacity=max(1, GEMINI_MAX_CONCURRENCY),
+        )
+        self._slots = threading.BoundedSemaphore(max(1, GEMINI_MAX_CONCURRENCY))
 
     def _ensure_initialized(self):
         if self._client:
@@ -40,35 +195,76 @@ class GeminiEmbeddingService:
         try:
             from google import genai
 
-            self._client = genai.Client(api_key=self._api_key)
+            http_options = {"base_url": GEMINI_BASE_URL} if GEMINI_BASE_URL else None
+            self._client = genai.Client(
+                api_key=self._api_key, http_options=http_options
+            )
             logger.info("GeminiEmbeddingService: Initialized successfully.")
         except Exception as e:
             logger.error(f"GeminiEmbeddingService: Initialization Failed: {e}")
 
-    def get_embedding(self, text: str, is_query: bool = False) -> np.ndarray:
+    def is_loaded(self) -> bool:
+        return self._client is not None
+
+    def _request(self, texts: List[str], is_query: bool) -> np.ndarray:
+        """One rate-limited `embed_content` call, retried on transient errors."""
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            self._limiter.acquire()
+            try:
+                with self._slots:
+                    result = self._client.models.embed_content(
+                        model=self.model_name,
+                        contents=texts,
+                        config={
+                            "task_type": "RETRIEVAL_QUERY"
+                            if is_query
+                            else "RETRIEVAL_DOCUMENT"
+                        },
+                    )
+                vectors = np.asarray(
+                    [e.values for e in result.embeddings], dtype=np.float32
+                )
+                if vectors.shape[0] != len(texts):
+                    raise EmbeddingUnavailable(
+                        f"Expected {len(texts)} embeddings, got {vectors.shape[0]}"
+                    )
+                return vectors
+            except EmbeddingUnavailable:
+                raise
+            except Exception as e:
+                if attempt == GEMINI_MAX_RETRIES or not _is_retryable(e):
+                    logger.error(f"GeminiEmbeddingService: Inference Failed - {e}")
+                    raise EmbeddingUnavailable(str(e)) from e
+                delay = backoff_delay(attempt)
+                logger.warning(
+                    f"GeminiEmbeddingService: {e} - retry {attempt + 1}/{GEMINI_MAX_RETRIES} in {delay:.2f}s"
+                )
+                time.sleep(delay)
+
+    def _embed(self, text: str, is_query: bool) -> np.ndarray:
         self._ensure_initialized()
         if not self._client:
-            return np.zeros(1536, dtype=np.float32)
+            raise EmbeddingUnavailable("Gemini client is not initialized.")
+        return self._request([text], is_query)[0]
 
-        try:
-            # text-embedding-004 supports 1536D by default
-            # We explicitly specify the model and text
-            result = self._client.models.embed_content(
-                model=self.model_name,
-                contents=text,
-                config={
-                    "task_type": "RETRIEVAL_QUERY" if is_query else "RETRIEVAL_DOCUMENT"
-                },
-            )
-            # Result contains 'embeddings', which is a list of lists if batch,
-            # or a single list if single content.
-            # Using google-genai SDK
-            vector = result.embeddings[0].values
-            return np.array(vector, dtype=np.float32)
+    def _embed_batch(
+        self, texts: List[str], is_query: bool, batch_size: int
+    ) -> np.ndarray:
+        """Embeds many texts, one request per `batch_size` chunk, chunks in parallel."""
+        self._ensure_initialized()
+        if not texts:
+            return np.zeros((0, 1536), dtype=np.float32)
+        if not self._client:
+            raise EmbeddingUnavailable("Gemini client is not initialized.")
 
-        except Exception as e:
-            logger.error(f"GeminiEmbeddingService: Inference Failed - {e}")
-            return np.zeros(1536, dtype=np.float32)
+        chunks = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+        if len(chunks) == 1:
+            return self._request(chunks[0], is_query)
+        with ThreadPoolExecutor(
+            max_workers=min(len(chunks), max(1, GEMINI_MAX_CONCURRENCY))
+        ) as pool:
+            parts = list(pool.map(lambda c: self._request(c, is_query), chunks))
+        return np.concatenate(parts)
 
     def get_model_info(self) -> dict:
         return {
@@ -78,7 +274,15 @@ class GeminiEmbeddingService:
         }
 
 
-class FastEmbeddingService:
+def _is_retryable(error: Exception) -> bool:
+    """429 / 408 / 5xx and transport errors are transient; other API errors are not."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in (408, 429) or code >= 500
+    return True
+
+
+class FastEmbeddingService(_CachedEmbeddingService):
     """
     Local Embedding Service using FastEmbed (ONNX).
     """
@@ -119,29 +323,45 @@ class FastEmbeddingService:
             except Exception as e:
                 logger.error(f"FastEmbeddingService: Initialization Failed: {e}")
 
-    def get_embedding(self, text: str, is_query: bool = False) -> np.ndarray:
+    def is_loaded(self) -> bool:
+        return self._initialized
+
+    def _embed(self, text: str, is_query: bool) -> np.ndarray:
         """
-        Get embedding vector using FastEmbed.
+        Get embedding vector using FastEmbed. Raises `EmbeddingUnavailable`
+        when the model is not loaded or inference fails.
+        """
+        return self._embed_batch([text], is_query, 1)[0]
+
+    def _embed_batch(
+        self, texts: List[str], is_query: bool, batch_size: int
+    ) -> np.ndarray:
+        """
+        Embeds many texts in one ONNX pass (FastEmbed batches internally).
+        Returns a (len(texts), dim) float32 matrix, or raises
+        `EmbeddingUnavailable`; never zero vectors.
         """
         self._ensure_initialized()
+        if not texts:
+            return np.zeros((0, 768), dtype=np.float32)
         if not self._initialized or not FastEmbeddingService._client_instance:
-            # Mock fallback if not initialized
-            logger.warning(
-                f"FastEmbeddingService not ready. Using zero vector for '{text[:20]}...'"
-            )
-            return np.zeros(768, dtype=np.float32)
+            raise EmbeddingUnavailable("FastEmbed model is not loaded.")
 
         try:
             # FastEmbed returns a generator of numpy arrays
-            embeddings = list(FastEmbeddingService._client_instance.embed([text]))
-            if not embeddings:
-                return np.zeros(768, dtype=np.float32)
-
-            return np.array(embeddings[0], dtype=np.float32)
-
+            embeddings = list(
+                FastEmbeddingService._client_instance.embed(
+                    texts, batch_size=batch_size
+                )
+            )
         except Exception as e:
             logger.error(f"FastEmbeddingService: Inference Failed - {e}")
-            return np.zeros(768, dtype=np.float32)
+            raise EmbeddingUnavailable(str(e)) from e
+        if len(embeddings) != len(texts):
+            raise EmbeddingUnavailable(
+                f"Expected {len(texts)} embeddings, got {len(embeddings)}"
+            )
+        return np.asarray(embeddings, dtype=np.float32)
 
     def get_model_info(self) -> dict:
         # Jina v2 base code is 768 dim
@@ -0,0 +1,290 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from mcp_core.core import config
+
+try:
+    import msvcrt
+
+    _HAS_MSVCRT = True
+except ImportError:
+    _HAS_MSVCRT = False
+
+try:
+    import fcntl
+
+    _HAS_FCNTL = True
+except ImportError:
+    _HAS_FCNTL = False
+
+logger = logging.getLogger(__name__)
+
+DIGEST_BYTES = 32  # sha256
+
+
+def text_digest(text: str, is_query: bool = False) -> bytes:
+    """Content address of an embedded text. Query and document embeddings differ."""
+    prefix = b"query\0" if is_query else b"doc\0"
+    return hashlib.sha256(prefix + text.encode("utf-8")).digest()
+
+
+class _Slab:
+    """
+    Fixed-capacity store for one model, as three memory-mapped .npy files:
+    vectors (capacity x dim float32), keys (capacity x 32 sha256 bytes) and
+    ticks (last use per slot, 0 marks a free slot, followed by one shared
+    clock slot). The hash -> slot index is rebuilt from `keys` on open; a
+    full slab evicts its least recently used slot.
+
+    Every process that embeds (Master, API server, background server) maps
+    the same files, so all access happens under `locked()`, and `sync()`
+    rebuilds the index once another process has advanced the shared clock.
+    Files are never truncated in place: a torn slab, or one sized for another
+    capacity/dimension, is replaced by a new generation directory that
+    `CURRENT` is atomically switched to. Processes still mapping the old
+    files keep valid pages and follow on their next `sync()`.
+    """
+
+    def __init__(self, directory: Path, capacity: int, dim: int):
+        self.directory = directory
+        self.capacity = capacity
+        self.dim = dim
+        directory.mkdir(parents=True, exist_ok=True)
+        self._lock_fp = open(directory / "slab.lock", "a")
+        with self.locked():
+            self._open()
+
+    def _open(self):
+        """Caller holds `locked()`. Maps the generation `CURRENT` names, or starts one."""
+        try:
+            name = (self.directory / "CURRENT").read_text(encoding="utf-8").strip()
+            self._map(self.directory / name)
+        except (OSError, ValueError):
+            # Missing, torn, or sized for another capacity/dimension: start over
+            self._new_generation()
+        self._stamp = self._current_stamp()
+        self._rebuild()
+
+    def _map(self, path: Path):
+        vectors, keys, ticks = (
+            np.load(path / f, mmap_mode="r+")
+            for f in ("vectors.npy", "keys.npy", "ticks.npy")
+        )
+        if (
+            vectors.shape != (self.capacity, self.dim)
+            or keys.shape != (self.capacity, DIGEST_BYTES)
+            or ticks.shape != (self.capacity + 1,)
+        ):
+            raise ValueError("slab shape changed")
+        self._files = (vectors, keys, ticks)
+        self.vectors, self.keys = vectors, keys
+        self.ticks, self._clock = ticks[: self.capacity], ticks[self.capacity :]
+
+    def _new_generation(self):
+        name = f"g{uuid.uuid4().hex[:12]}"
+        path = self.directory / name
+        path.mkdir()
+        open_memmap = np.lib.format.open_memmap
+        for file_name, dtype, shape in (
+            ("vectors.npy", np.float32, (self.capacity, self.dim)),
+            ("keys.npy", np.uint8, (self.capacity, DIGEST_BYTES)),
+            ("ticks.npy", np.uint64, (self.capacity + 1,)),
+        ):
+            open_memmap(path / file_name, "w+", dtype, shape).flush()
+        self._map(path)
+        current_tmp = self.directory / "CURRENT.tmp"
+        current_tmp.write_text(name, encoding="utf-8")
+        os.replace(current_tmp, self.directory / "CURRENT")
+        for old in self.directory.glob("g*"):
+            if old.name != name:
+                # POSIX keeps unlinked files mapped; Windows refuses, retried next time
+                shutil.rmtree(old, ignore_errors=True)
+
+    def _current_stamp(self):
+        try:
+            st = os.stat(self.directory / "CURRENT")
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _rebuild(self):
+        used = np.flatnonzero(self.ticks)
+        self.slot_of: Dict[bytes, int] = {
+            self.keys[slot].tobytes(): int(slot) for slot in used
+        }
+        self.free = np.flatnonzero(self.ticks == 0).tolist()[::-1]
+        self.clock = int(self._clock[0])
+
+    @contextmanager
+    def locked(self):
+        """Exclusive file lock on the slab, held across processes."""
+        fd = self._lock_fp.fileno()
+        if _HAS_FCNTL:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        elif _HAS_MSVCRT:
+            self._lock_fp.seek(0)
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if _HAS_FCNTL:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            elif _HAS_MSVCRT:
+                self._lock_fp.seek(0)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def sync(self):
+        """
+        Caller holds `locked()`. Every get/put advances the shared clock, so
+        a clock other than ours means another process changed slots.
+        """
+        if self._current_stamp() != self._stamp:
+            self._open()  # Another process started a new generation
+        elif int(self._clock[0]) != self.clock:
+            self._rebuild()
+
+    def _tick(self, slot: int):
+        self.clock += 1
+        self.ticks[slot] = self.clock
+        self._clock[0] = self.clock
+
+    def get(self, digest: bytes) -> Optional[np.ndarray]:
+        slot = self.slot_of.get(digest)
+        if slot is None:
+            return None
+        self._tick(slot)
+        return np.array(self.vectors[slot])
+
+    def put(self, digest: bytes, vector: np.ndarray):
+        slot = self.slot_of.get(digest)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+            else:
+                slot = int(np.argmin(self.ticks))
+                self.slot_of.pop(self.keys[slot].tobytes(), None)
+            self.slot_of[digest] = slot
+        # The slot reads as free while it is rewritten, so a crash mid-write
+        # never maps a key to another text's vector
+        self.ticks[slot] = 0
+        self.vectors[slot] = vector
+        self.keys[slot] = np.frombuffer(digest, dtype=np.uint8)
+        self._tick(slot)
+
+    def flush(self):
+        for array in self._files:
+            array.flush()
+
+
+class EmbeddingDiskCache:
+    """
+    Persistent embedding cache keyed by (model_name, sha256(text)), stored in
+    `config.CACHE_DIR/embeddings/<model>/<generation>/`. Re-embedding a byte-identical text
+    (re-save, sync pull, recovery, switching back to a previous model) is a
+    memory-mapped read instead of an inference call.
+    Shared by every process that embeds; see `_Slab` for the locking.
+    """
+
+    def __init__(self, max_entries: int = 20000, directory: Optional[Path] = None):
+        self.max_entries = max_entries
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._slabs: Dict[tuple, _Slab] = {}
+        self.hit_count = 0
+        self.miss_count = 0
+
+    @property
+    def directory(self) -> Path:
+        return Path(self._directory or config.CACHE_DIR) / "embeddings"
+
+    def _slab(self, model_name: str, dim: Optional[int]) -> Optional[_Slab]:
+        path = self.directory / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        slab = self._slabs.get((path, model_name))
+        if slab is not None and (dim is None or slab.dim == dim):
+            return slab
+        if dim is None:
+            dim = self._stored_dim(path)
+            if dim is None:
+                return None
+        try:
+            slab = _Slab(path, self.max_entries, dim)
+        except OSError as e:
+            logger.warning(f"EmbeddingCache: Disabled for '{model_name}': {e}")
+            return None
+        self._slabs[(path, model_name)] = slab
+        return slab
+
+    @staticmethod
+    def _stored_dim(path: Path) -> Optional[int]:
+        try:
+            name = (path / "CURRENT").read_text(encoding="utf-8").strip()
+            return int(np.load(path / name / "vectors.npy", mmap_mode="r").shape[1])
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def get_many(
+        self, model_name: str, texts: List[str], is_query: bool = False
+    ) -> List[Optional[np.ndarray]]:
+        """Cached vectors in input order; None for every miss."""
+        if self.max_entries <= 0:
+            return [None] * len(texts)
+        with self._lock:
+            slab = self._slab(model_name, None)
+            if slab is None:
+                found = [None] * len(texts)
+            else:
+                with slab.locked():
+                    slab.sync()
+                    found = [slab.get(text_digest(t, is_query)) for t in texts]
+            hits = sum(v is not None for v in found)
+            self.hit_count += hits
+            self.miss_count += len(texts) - hits
+        return found
+
+    def put_many(
+        self, model_name: str, texts: List[str], vectors, is_query: bool = False
+    ):
+        """Stores freshly computed vectors. All-zero (failed) embeddings are skipped."""
+        if self.max_entries <= 0 or not len(texts):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            slab = self._slab(model_name, vectors.shape[1])
+            if slab is None:
+                return
+            with slab.locked():
+                slab.sync()
+                for text, vector in zip(texts, vectors):
+                    if np.any(vector):
+                        slab.put(text_digest(text, is_query), vector)
+                slab.flush()
+
+    def get(self, model_name: str, text: str, is_query: bool = False):
+        return self.get_many(model_name, [text], is_query)[0]
+
+    def put(self, model_name: str, text: str, vector, is_query: bool = False):
+        self.put_many(model_name, [text], np.atleast_2d(vector), is_query)
+
+    def get_stats(self) -> Dict:
+        total = self.hit_count + self.miss_count
+        return {
+            "models": len(self._slabs),
+            "entries": sum(len(s.slot_of) for s in self._slabs.values()),
+            "max_entries": self.max_entries,
+            "hit_count": self.hit_count,
+            "miss_count": self.miss_count,
+            "hit_rate": f"{(self.hit_count / total * 100) if total else 0:.2f}%",
+        }
+
+
+# Singleton Instance
+embedding_cache = EmbeddingDiskCache(config.EMBEDDING_CACHE_SIZE)
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List
+
+import numpy as np
+from mcp_core.core import config
+from mcp_core.engine.embedding import embedding_service
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ("text", "is_query", "future", "submitted")
+
+    def __init__(self, text: str, is_query: bool):
+        self.text = text
+        self.is_query = is_query
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class EmbeddingDispatcher:
+    """
+    Coalesces concurrent single-text embedding requests (one thread per IPC
+    client) into batched inferences.
+
+    There is no dispatcher thread: the first caller to find no batch running
+    becomes the leader, drains up to `max_batch` pending requests, runs one
+    `get_embeddings` call and resolves every caller's future. Requests that
+    arrive while a batch is running queue up and form the next batch. The
+    leader only waits `window_ms` for company when the previous batch was
+    shared, so a lone request pays no extra latency.
+    """
+
+    def __init__(self, service=None, max_batch: int = 32, window_ms: float = 5.0):
+        self._service = service
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self._cond = threading.Condition()
+        self._pending: List[_Request] = []
+        self._leader_active = False
+        self._last_batch_size = 0
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    @property
+    def service(self):
+        return self._service or embedding_service
+
+    def embed(self, text: str, is_query: bool = False) -> np.ndarray:
+        """Same contract as `embedding_service.get_embedding`, batched with peers."""
+        request = _Request(text, is_query)
+        with self._cond:
+            self._pending.append(request)
+            self._cond.notify_all()
+
+        while True:
+            with self._cond:
+                while not request.future.done() and self._leader_active:
+                    self._cond.wait()
+                if request.future.done():
+                    break
+                self._leader_active = True
+            try:
+                self._run_batch()
+            finally:
+                with self._cond:
+                    self._leader_active = False
+                    self._cond.notify_all()
+        return request.future.result()
+
+    def _run_batch(self):
+        with self._cond:
+            if self._last_batch_size > 1 and len(self._pending) < self.max_batch:
+                # Under concurrent load: give peers a moment to join this batch
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.max_batch, timeout=self.window
+                )
+            batch = self._pending[: self.max_batch]
+            del self._pending[: self.max_batch]
+            self._last_batch_size = len(batch)
+
+        started = time.perf_counter()
+        for is_query in (False, True):
+            group = [r for r in batch if r.is_query == is_query]
+            if group:
+                self._embed_group(group)
+
+        waits = [(started - r.submitted) * 1000 for r in batch]
+        with self._cond:
+            stats = self._stats
+            stats["requests"] += len(batch)
+            stats["batches"] += 1
+            stats["max_batch_size"] = max(stats["max_batch_size"], len(batch))
+            stats["total_wait_ms"] += sum(waits)
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], max(waits))
+
+    def _embed_group(self, group: List[_Request]):
+        try:
+            if len(group) == 1:
+                request = group[0]
+                vectors = [
+                    self.service.get_embedding(request.text, is_query=request.is_query)
+                ]
+            else:
+                vectors = self.service.get_embeddings(
+                    [r.text for r in group], is_query=group[0].is_query
+                )
+            for request, vector in zip(group, vectors):
+                request.future.set_result(np.asarray(vector, dtype=np.float32))
+        except Exception as e:
+            logger.error(f"EmbeddingDispatcher: Batch of {len(group)} failed: {e}")
+            for request in group:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            s = dict(self._stats)
+        return {
+            "requests": s["requests"],
+            "batches": s["batches"],
+            "avg_batch_size": round(s["requests"] / s["batches"], 2)
+            if s["batches"]
+            else 0,
+            "max_batch_size": s["max_batch_size"],
+            "avg_wait_ms": round(s["total_wait_ms"] / s["requests"], 3)
+            if s["requests"]
+            else 0,
+            "max_wait_ms": round(s["max_wait_ms"], 3),
+        }
+
+
+# Singleton Instance (Master process)
+embedding_dispatcher = EmbeddingDispatcher(
+    max_batch=config.EMBED_MAX_BATCH, window_ms=config.EMBED_BATCH_WINDOW_MS
+)
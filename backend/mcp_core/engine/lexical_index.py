@@ -0,0 +1,228 @@
+import ast
+import heapq
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from mcp_core.core import config
+from mcp_core.core.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Field weights (term frequency multipliers)
+NAME_WEIGHT = 3
+TAG_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+CODE_WEIGHT = 1
+# Reciprocal Rank Fusion constant
+RRF_K = 60
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_SEGMENT_RE = re.compile(rf"[{_CJK}]+|[^{_CJK}]+")
+_CJK_RE = re.compile(rf"[{_CJK}]+")
+
+
+def split_identifier(identifier: str) -> List[str]:
+    """'parseISODate_v2' -> ['parse', 'iso', 'date', 'v', '2'] (snake_case + camelCase)."""
+    parts = []
+    for chunk in identifier.split("_"):
+        parts.extend(p.lower() for p in _CAMEL_RE.findall(chunk))
+    return parts
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenizes free text or identifiers. Each word is kept whole (so exact
+    identifiers like `parse_iso_date` match strongly) and also split into
+    its snake/camel parts. CJK runs are indexed as character bigrams.
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text or ""):
+        for seg in _SEGMENT_RE.findall(word):
+            if _CJK_RE.fullmatch(seg):
+                tokens.extend(seg[i : i + 2] for i in range(max(1, len(seg) - 1)))
+                continue
+            tokens.append(seg.lower())
+            parts = split_identifier(seg)
+            if len(parts) > 1:
+                tokens.extend(parts)
+    return tokens
+
+
+def extract_code_identifiers(code: str) -> List[str]:
+    """Collects function/class/argument/attribute/import names from the AST."""
+    try:
+        tree = ast.parse(code or "")
+    except SyntaxError:
+        return sorted(set(_WORD_RE.findall(code or "")))
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            names.add(node.attr)
+        elif isinstance(node, ast.alias):
+            names.add(node.name.split(".")[0])
+    return sorted(names)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], k: int = RRF_K
+) -> List[Tuple[int, float]]:
+    """Fuses ranked id lists: score(d) = sum(1 / (k + rank)). Best first."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 inverted index over names, descriptions, tags and code
+    identifiers. Built once from the DB and then maintained incrementally on
+    save and delete. Needs no embedding model.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._source: Optional[str] = None  # db_path the index was built from
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Counter] = {}
+        self._doc_len: Dict[int, int] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._source is not None and self._source == str(config.DB_PATH)
+
+    def invalidate(self):
+        with self._lock:
+            self._source = None
+            self._reset()
+
+    def ensure_loaded(self):
+        if self.is_loaded:
+            return
+        with self._lock:
+            if self.is_loaded:
+                return
+            self.load()
+
+    def load(self):
+        source = str(config.DB_PATH)
+        conn = get_db_connection()
+        try:
+            rows = conn.execute(
+                "SELECT id, name, description, tags, code FROM functions WHERE status != 'deleted'"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._reset()
+            for fid, name, desc, tags, code in rows:
+                self._add(fid, name, desc, tags or [], code)
+            self._source = source
+        logger.info(f"LexicalIndex: Built with {len(rows)} documents.")
+
+    @staticmethod
+    def _document_terms(
+        name: str, description: str, tags: Iterable[str], code: str
+    ) -> Counter:
+        terms = Counter()
+        for t in tokenize(name or ""):
+            terms[t] += NAME_WEIGHT
+        for tag in tags or []:
+            for t in tokenize(tag):
+                terms[t] += TAG_WEIGHT
+        for t in tokenize(description or ""):
+            terms[t] += DESCRIPTION_WEIGHT
+        for ident in extract_code_identifiers(code or ""):
+            for t in tokenize(ident):
+                terms[t] += CODE_WEIGHT
+        return terms
+
+    def _add(self, fid: int, name, description, tags, code):
+        self._add_terms(fid, self._document_terms(name, description, tags, code))
+
+    def _add_terms(self, fid: int, terms: Counter):
+        self._remove(fid)
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[fid] = tf
+        length = sum(terms.values())
+        self._doc_terms[fid] = terms
+        self._doc_len[fid] = length
+        self._total_len += length
+
+    def _remove(self, fid: int):
+        terms = self._doc_terms.pop(fid, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(fid, None)
+                if not posting:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(fid, 0)
+
+    def upsert(self, fid: int, name: str, description: str, tags, code: str):
+        """Indexes (or re-indexes) one function."""
+        with self._lock:
+            if not self.is_loaded:
+                return  # The first search builds from the committed rows.
+            self._add(fid, name, description, tags, code)
+
+    def remove(self, fid: int):
+        with self._lock:
+            if self.is_loaded:
+                self._remove(fid)
+
+    def search(self, query: str, limit: Optional[int] = 20) -> List[Tuple[int, float]]:
+        """Returns [(function_id, bm25_score)] best first (all matches if limit is None)."""
+        self.ensure_loaded()
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._doc_len)
+            if n == 0 or not terms or (limit is not None and limit <= 0):
+                return []
+            avgdl = self._total_len / n
+            scores: Dict[int, float] = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for fid, tf in posting.items():
+                    norm = K1 * (1 - B + B * self._doc_len[fid] / avgdl)
+                    scores[fid] = scores.get(fid, 0.0) + idf * tf * (K1 + 1) / (
+                        tf + norm
+                    )
+        if limit is None:
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+# Singleton Instance (Master process)
+lexical_index = LexicalIndex()
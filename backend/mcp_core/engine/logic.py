@@ -1,16 +1,57 @@
 # Core logic implementation for Function Store, free from any MCP or FastAPI decorators.
+import atexit
 import json
 import logging
+import threading
 import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Set
-
-from mcp_core.core.database import DBWriteLock, get_db_connection
-from mcp_core.engine.embedding import embedding_service
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from mcp_core.core.config import (
+    CACHE_DIR,
+    QUERY_CACHE_PREWARM,
+    QUERY_CACHE_SNAPSHOT_INTERVAL,
+    SEARCH_PAGE_DEPTH,
+)
+from mcp_core.core.database import (
+    EMBEDDING_RECOVERY_BATCH,
+    DBReadLock,
+    _bulk_update_vectors,
+    connection_manager,
+    db_connection,
+    get_lock_stats,
+    hot_metadata_values,
+    set_function_tags,
+)
+from mcp_core.core.migrations import startup_migrations
+from mcp_core.core.write_pipeline import write_pipeline
+from mcp_core.engine.ann_index import ann_index
+from mcp_core.engine.bulk_indexer import reindex_job
+from mcp_core.engine.call_counter import call_counter
+from mcp_core.engine.embedding import (
+    EmbeddingUnavailable,
+    embedding_service,
+    function_embedding_text,
+    normalize,
+    normalize_rows,
+)
+from mcp_core.engine.embedding_cache import embedding_cache
+from mcp_core.engine.embedding_dispatcher import embedding_dispatcher
+from mcp_core.engine.lexical_index import lexical_index, reciprocal_rank_fusion
+from mcp_core.engine.pagination import (
+    after_score_key,
+    decode_cursor,
+    encode_cursor,
+    query_fingerprint,
+)
 from mcp_core.engine.popular_query_cache import PopularQueryCache
 from mcp_core.engine.quality_gate import QualityGate
+from mcp_core.engine.read_snapshot import snapshot_publisher
+from mcp_core.engine.result_cache import result_cache, store_generation
 from mcp_core.engine.router import router
 from mcp_core.engine.sanitizer import DataSanitizer
+from mcp_core.engine.vector_index import vector_index
 from mcp_core.engine.worker import task_worker
 
 logger = logging.getLogger(__name__)
@@ -41,104 +82,115 @@ def do_save_impl(
         sanitized["tags"],
     )
 
-    with DBWriteLock():
-        conn = get_db_connection()
-        try:
-            # --- MANDATORY LOCAL GATE (RELAXED) ---
-            is_syntax_valid = True
-            try:
-                import ast
-
-                ast.parse(code)
-            except SyntaxError:
-                is_syntax_valid = False
-
-            from mcp_core.core.security import ASTSecurityChecker, _contains_secrets
-
-            # Strict Security check ONLY if syntax is valid
-            if is_syntax_valid:
-                is_safe, s_msg = ASTSecurityChecker.check(code)
-                if not is_safe:
-                    return f"REJECTED: Security Block - {s_msg}"
-
-            # Secret detection (text-based) is always mandatory
-            has_secret, secret_val = _contains_secrets(code)
-            if has_secret:
-                return "REJECTED: Secret detected in code. Please remove API keys or passwords."
-
-            initial_status = "pending" if is_syntax_valid else "broken"
-            error_log = "" if is_syntax_valid else "Draft contains syntax errors."
-            if skip_test:
-                initial_status = "unverified"
-                error_log = "Verification SKIPPED"
-
-            now = datetime.now().isoformat()
-            # Initial quality estimate
-            initial_qs = 10 if not is_syntax_valid else (100 if skip_test else 0)
-
-            metadata = {
-                "dependencies": dependencies,
-                "saved_at": now,
-                "schema_version": "v2.0_duckdb",
-                "quality_score": initial_qs,
-                "quality_feedback": "Pending background verification"
-                if is_syntax_valid
-                else "Draft: Syntax Error",
-                "last_verified_at": now if skip_test else None,
-                "verification_error": error_log
-                if skip_test or not is_syntax_valid
-                else None,
-                "reliability_tier": "low" if not is_syntax_valid else "pending",
-                "verified_dependencies": [],
-                "detected_imports": [],
-                "internal_dependencies": [],
-            }
+    # --- MANDATORY LOCAL GATE (RELAXED) ---
+    is_syntax_valid = True
+    try:
+        import ast
+
+        ast.parse(code)
+    except SyntaxError:
+        is_syntax_valid = False
+
+    from mcp_core.core.security import ASTSecurityChecker, _contains_secrets
+
+    # Strict Security check ONLY if syntax is valid
+    if is_syntax_valid:
+        is_safe, s_msg = ASTSecurityChecker.check(code)
+        if not is_safe:
+            return f"REJECTED: Security Block - {s_msg}"
+
+    # Secret detection (text-based) is always mandatory
+    has_secret, secret_val = _contains_secrets(code)
+    if has_secret:
+        return "REJECTED: Secret detected in code. Please remove API keys or passwords."
+
+    initial_status = "pending" if is_syntax_valid else "broken"
+    error_log = "" if is_syntax_valid else "Draft contains syntax errors."
+    if skip_test:
+        initial_status = "unverified"
+        error_log = "Verification SKIPPED"
+
+    now = datetime.now().isoformat()
+    # Initial quality estimate
+    initial_qs = 10 if not is_syntax_valid else (100 if skip_test else 0)
+
+    metadata = {
+        "dependencies": dependencies,
+        "saved_at": now,
+        "schema_version": "v2.0_duckdb",
+        "quality_score": initial_qs,
+        "quality_feedback": "Pending background verification"
+        if is_syntax_valid
+        else "Draft: Syntax Error",
+        "last_verified_at": now if skip_test else None,
+        "verification_error": error_log if skip_test or not is_syntax_valid else None,
+        "reliability_tier": "low" if not is_syntax_valid else "pending",
+        "verified_dependencies": [],
+        "detected_imports": [],
+        "internal_dependencies": [],
+    }
 
-            existing = conn.execute(
-                "SELECT id, code, test_cases, description FROM functions WHERE name = ?",
-                (asset_name,),
-            ).fetchone()
+    def write(conn) -> int:
+        existing = conn.execute(
+            "SELECT id FROM functions WHERE name = ?", (asset_name,)
+        ).fetchone()
 
-            if existing:
-                function_id, old_code, old_tests, old_desc = existing
-                conn.execute(
-                    """
-                    UPDATE functions SET 
-                        code=?, description=?, tags=?, metadata=?, test_cases=?, status=?, updated_at=? 
-                    WHERE id = ?
-                """,
-                    (
-                        code,
-                        description,
-                        json.dumps(tags),
-                        json.dumps(metadata),
-                        json.dumps(test_cases),
-                        initial_status,
-                        now,
-                        function_id,
-                    ),
-                )
-            else:
-                conn.execute(
-                    """
-                    INSERT INTO functions (name, code, description, tags, metadata, test_cases, status, created_at, updated_at) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        asset_name,
-                        code,
-                        description,
-                        json.dumps(tags),
-                        json.dumps(metadata),
-                        json.dumps(test_cases),
-                        initial_status,
-                        now,
-                        now,
-                    ),
-                )
-            conn.commit()
-        finally:
-            conn.close()
+        if existing:
+            conn.execute(
+                """
+                UPDATE functions SET
+                    code=?, description=?, tags=?, metadata=?, test_cases=?, status=?, updated_at=?,
+                    quality_score=?, reliability_tier=?, detected_imports_count=?, last_verified_at=?, dependencies=?
+                WHERE id = ?
+            """,
+                (
+                    code,
+                    description,
+                    list(tags),
+                    json.dumps(metadata),
+                    json.dumps(test_cases),
+                    initial_status,
+                    now,
+                    *hot_metadata_values(metadata),
+                    existing[0],
+                ),
+            )
+            function_id = existing[0]
+        else:
+            function_id = conn.execute(
+                """
+                INSERT INTO functions (name, code, description, tags, metadata, test_cases, status, created_at, updated_at,
+                    quality_score, reliability_tier, detected_imports_count, last_verified_at, dependencies)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING id
+            """,
+                (
+                    asset_name,
+                    code,
+                    description,
+                    list(tags),
+                    json.dumps(metadata),
+                    json.dumps(test_cases),
+                    initial_status,
+                    now,
+                    now,
+                    *hot_metadata_values(metadata),
+                ),
+            ).fetchone()[0]
+        set_function_tags(conn, function_id, tags)
+        return function_id
+
+    function_id = write_pipeline.execute(write)
+    lexical_index.upsert(function_id, asset_name, description, tags, code)
+    vector_index.update_attributes(
+        function_id,
+        quality_score=initial_qs,
+        status=initial_status,
+        tags=tags,
+        dependencies=dependencies,
+    )
+    # After the in-memory indexes, so no search caches pre-write results
+    store_generation.bump()
 
     # --- BACKGROUND TASKS ---
     task_worker.add_task(
@@ -165,8 +217,8 @@ def run_background_maintenance(
         all_deps = list(set(f_deps + detected_deps))
 
         # Internal dependencies
-        with DBWriteLock():
-            conn = get_db_connection(read_only=False)
+        with DBReadLock():
+            conn = db_connection(read_only=False)
             try:
                 all_func_names = {
                     r[0] for r in conn.execute("SELECT name FROM functions").fetchall()
@@ -202,10 +254,15 @@ def run_background_maintenance(
                 if python_exe:
                     lock_data = env_manager.capture_freeze(python_exe)
 
-        # Generate embedding
-        txt = f"Function: {f_name}\nDesc: {f_desc}\nTags: {','.join(f_tags)}\nCode:\n{f_code[:500]}"
-        emb = embedding_service.get_embedding(txt)
-        v_list = emb.tolist()
+        # Generate embedding. A failed one is stored as pending (NULL) rather
+        # than as a zero vector and retried by `retry_pending_embeddings`.
+        txt = function_embedding_text(f_name, f_desc, f_tags, f_code)
+        try:
+            emb = normalize(embedding_dispatcher.embed(txt))
+        except EmbeddingUnavailable as ee:
+            logger.warning(f"Embedding for '{f_name}' is pending: {ee}")
+            emb = None
+        v_list = emb.tolist() if emb is not None else None
 
         # Quality Scoring
         quality_score = 0
@@ -217,40 +274,73 @@ def run_background_maintenance(
         except Exception as qe:
             logger.error(f"Quality Scoring Failed for '{f_name}': {qe}")
 
-        with DBWriteLock():
-            c2 = get_db_connection()
-            try:
-                row = c2.execute(
-                    "SELECT id, metadata FROM functions WHERE name = ?", (f_name,)
-                ).fetchone()
-                if row:
-                    fid = row[0]
-                    existing_meta = json.loads(row[1]) if row[1] else {}
-                    existing_meta.update(
-                        {
-                            "verification_error": verify_err,
-                            "quality_score": quality_score,
-                            "reliability_tier": reliability,
-                            "verified_dependencies": lock_data,
-                            "detected_imports": detected_deps,
-                            "internal_dependencies": internal_deps,
-                        }
-                    )
-                    c2.execute(
-                        "UPDATE functions SET status = ?, metadata = ? WHERE id = ?",
-                        (verify_status, json.dumps(existing_meta), fid),
-                    )
-                    c2.execute(
-                        "DELETE FROM embeddings WHERE function_id = ? AND model_name = ?",
-                        (fid, embedding_service.model_name),
-                    )
-                    c2.execute(
-                        "INSERT INTO embeddings (function_id, vector, model_name, dimension, encoded_at) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
-                        (fid, v_list, embedding_service.model_name, len(v_list)),
-                    )
-                    c2.commit()
-            finally:
-                c2.close()
+        def write(c2) -> Optional[int]:
+            row = c2.execute(
+                "SELECT id, metadata FROM functions WHERE name = ?", (f_name,)
+            ).fetchone()
+            if not row:
+                return None
+            fid = row[0]
+            existing_meta = json.loads(row[1]) if row[1] else {}
+            existing_meta.update(
+                {
+                    "verification_error": verify_err,
+                    "quality_score": quality_score,
+                    "reliability_tier": reliability,
+                    "verified_dependencies": lock_data,
+                    "detected_imports": detected_deps,
+                    "internal_dependencies": internal_deps,
+                }
+            )
+            if is_syntax_valid_bg and not skip_verify:
+                existing_meta["last_verified_at"] = datetime.now().isoformat()
+            c2.execute(
+                """
+                UPDATE functions SET status = ?, metadata = ?,
+                    quality_score = ?, reliability_tier = ?, detected_imports_count = ?, last_verified_at = ?, dependencies = ?
+                WHERE id = ?
+                """,
+                (
+                    verify_status,
+                    json.dumps(existing_meta),
+                    *hot_metadata_values(existing_meta),
+                    fid,
+                ),
+            )
+            c2.execute(
+                "DELETE FROM embeddings WHERE function_id = ? AND model_name = ?",
+                (fid, embedding_service.model_name),
+            )
+            if v_list is not None:
+                c2.execute(
+                    "INSERT INTO embeddings (function_id, vector, model_name, dimension, encoded_at) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                    (fid, v_list, embedding_service.model_name, len(v_list)),
+                )
+            else:
+                c2.execute(
+                    "INSERT INTO embeddings (function_id, model_name) VALUES (?, ?)",
+                    (fid, embedding_service.model_name),
+                )
+            return fid
+
+        fid = write_pipeline.execute(write)
+
+        if fid is not None and emb is None:
+            # Still findable by keyword; drop any stale vector from the index
+            vector_index.remove(fid)
+            store_generation.bump()
+        elif fid is not None:
+            vector_index.upsert(
+                fid,
+                emb,
+                quality_score,
+                status=verify_status,
+                tags=f_tags,
+                dependencies=all_deps,
+            )
+            store_generation.bump()
+            if _pending_embedding_count():
+                retry_pending_embeddings()  # The backend is answering again
         logger.info(f"Background maintenance for '{f_name}' complete.")
     except Exception as ex:
         logger.error(
@@ -258,6 +348,71 @@ def run_background_maintenance(
         )
 
 
+def _pending_embedding_count() -> int:
+    conn = db_connection()
+    try:
+        return conn.execute(
+            "SELECT count(*) FROM embeddings WHERE vector IS NULL"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def retry_pending_embeddings() -> int:
+    """
+    Re-embeds functions whose embedding is pending (a failed earlier attempt)
+    and adds them to the vector index. Returns the number still pending.
+    """
+    conn = db_connection()
+    try:
+        rows = conn.execute(
+            """
+            SELECT DISTINCT f.id, f.name, f.description, f.tags, f.code, f.quality_score, f.status,
+                   f.dependencies, json_extract(f.metadata, '$.detected_imports') AS imports
+            FROM functions f JOIN embeddings e ON f.id = e.function_id
+            WHERE e.vector IS NULL
+            ORDER BY f.id
+            """
+        ).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return 0
+
+    # Embedded outside the writer, which only applies the finished batch
+    texts = [
+        function_embedding_text(name, desc, tags or [], code)
+        for _, name, desc, tags, code, *_ in rows
+    ]
+    try:
+        vectors = normalize_rows(
+            embedding_service.get_embeddings(texts, batch_size=EMBEDDING_RECOVERY_BATCH)
+        )
+    except Exception as e:
+        logger.warning(f"Embeddings: {len(rows)} embeddings still pending: {e}")
+        return len(rows)
+    write_pipeline.execute(
+        _bulk_update_vectors,
+        [r[0] for r in rows],
+        vectors,
+        embedding_service.model_name,
+    )
+
+    for row, vector in zip(rows, vectors):
+        fid, _, _, tags, _, quality_score, status, deps, imports = row
+        vector_index.upsert(
+            fid,
+            vector,
+            quality_score,
+            status=status,
+            tags=tags or [],
+            dependencies=(deps or []) + json.loads(imports or "[]"),
+        )
+    store_generation.bump()
+    logger.info(f"Embeddings: {len(rows)} pending embeddings recovered.")
+    return 0
+
+
 def do_triage_list_impl(limit: int = 5) -> List[Dict]:
     """Core logic for listing broken functions."""
     from mcp_core.engine.triage import triage_engine
@@ -265,18 +420,51 @@ def do_triage_list_impl(limit: int = 5) -> List[Dict]:
     return triage_engine.get_broken_functions(limit)
 
 
-def do_search_impl(query: str, limit: int = 20) -> List[Dict]:
-    """Search for functions using semantic search."""
+def do_search_impl(
+    query: str,
+    limit: int = 20,
+    mode: str = "hybrid",
+    tags: Optional[List[str]] = None,
+    status_in: Optional[List[str]] = None,
+    min_quality: Optional[int] = None,
+    dependencies_available: Optional[bool] = None,
+) -> List[Dict]:
+    """
+    Search for functions. `mode` is "hybrid" (vector + BM25 fused with RRF),
+    "vector" (semantic only) or "lexical" (BM25 only, no embedding model).
+    Hybrid results are ordered by the fused `rrf_score`; `score` stays the
+    blended similarity/quality relevance in every mode but lexical.
+    The filters are applied inside the index scan (see `_search_filters`).
+    """
+    filters = _search_filters(tags, status_in, min_quality, dependencies_available)
+
+    # Results are valid until the next write bumps the store generation
+    cache_key = result_cache.make_key(query, limit, mode, filters)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    not_ready = _semantic_unavailable() if mode != "lexical" else None
+    if not_ready:
+        # Don't block on it; keyword results are not cached as `mode`
+        logger.info(f"Search: {not_ready}, serving lexical results.")
+        return _do_search_query(query, limit, "lexical", filters)
 
     # Simple retry logic for when search is called immediately after save
     # and background embedding might be in progress or DuckDB is temporarily busy.
+    results = None
     for attempt in range(3):
         try:
-            results = _do_search_query(query, limit)
+            results = _do_search_query(query, limit, mode, filters)
             if results:
-                return results
+                break
             if attempt < 2:
                 time.sleep(1.0)  # Wait for background tasks to progress
+        except EmbeddingUnavailable as e:
+            logger.warning(
+                f"Search: Embedding unavailable ({e}), serving lexical results."
+            )
+            return _do_search_query(query, limit, "lexical", filters)
         except Exception as e:
             msg = str(e)
             if (
@@ -291,55 +479,410 @@ def do_search_impl(query: str, limit: int = 20) -> List[Dict]:
                 continue
             logger.error(f"Search error: {e}")
             return []
+    if results is None:
+        return []  # Every attempt hit contention; nothing to cache
+
+    result_cache.put(cache_key, results)
+    return results
+
+
+def do_search_page_impl(
+    query: str,
+    limit: int = 20,
+    mode: str = "hybrid",
+    cursor: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    status_in: Optional[List[str]] = None,
+    min_quality: Optional[int] = None,
+    dependencies_available: Optional[bool] = None,
+) -> Dict:
+    """
+    One page of the ranking `do_search_impl` returns, plus an opaque
+    `next_cursor`. The ranking (up to SEARCH_PAGE_DEPTH results) is computed
+    once per store generation and cached as ids, so a page only hydrates its
+    own rows. The cursor holds the generation, offset and last id; after a
+    write the new ranking is resumed right after that id.
+    """
+    filters = _search_filters(tags, status_in, min_quality, dependencies_available)
+    fingerprint = query_fingerprint("search", query, mode, filters)
+    position = decode_cursor(cursor, fingerprint)
+
+    generation = store_generation.value
+    hits, extras = _search_ranking(query, mode, filters)
+    start = 0
+    if position is not None:
+        start = position["n"]
+        if position["g"] != generation:
+            ids = [h[0] for h in hits]
+            if position["id"] in ids:
+                start = ids.index(position["id"]) + 1
+
+    page = hits[start : start + limit]
+    items = _hydrate_hits([page], [extras])[0]
+    next_cursor = None
+    if page and start + limit < len(hits):
+        next_cursor = encode_cursor(
+            {"q": fingerprint, "g": generation, "n": start + limit, "id": page[-1][0]}
+        )
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _search_ranking(query: str, mode: str, filters: Optional[Dict]):
+    """
+    (hits, extras) of the full ranking for `search_functions_page`, cached per
+    store generation like `do_search_impl` results.
+    """
+    cache_key = result_cache.make_key(query, "ranking", mode, filters)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    depth = SEARCH_PAGE_DEPTH
+    not_ready = _semantic_unavailable() if mode != "lexical" else None
+    if not_ready:
+        logger.info(f"Search: {not_ready}, serving lexical results.")
+        return _rank_hits(query, depth, "lexical", filters)
+    try:
+        ranking = _rank_hits(query, depth, mode, filters)
+    except EmbeddingUnavailable as e:
+        logger.warning(f"Search: Embedding unavailable ({e}), serving lexical results.")
+        return _rank_hits(query, depth, "lexical", filters)
+    result_cache.put(cache_key, ranking)
+    return ranking
+
+
+def iter_search_impl(
+    query: str,
+    limit: int = 100,
+    mode: str = "hybrid",
+    page_size: int = 20,
+    **filters,
+) -> Iterator[Dict]:
+    """Yields up to `limit` search results, fetched one cursor page at a time."""
+    cursor = None
+    remaining = limit
+    while remaining > 0:
+        page = do_search_page_impl(
+            query, min(page_size, remaining), mode, cursor, **filters
+        )
+        yield from page["items"]
+        remaining -= len(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
 
-    return []
+def _semantic_unavailable() -> Optional[str]:
+    """Why vector search can't be used right now, or None if it can."""
+    if embedding_service.is_warming_up():
+        return "Embedding model still loading"
+    if not startup_migrations.semantic_ready():
+        return "Vector migrations still running"
+    return None
 
 
-def _do_search_query(query: str, limit: int = 20) -> List[Dict]:
-    """Internal semantic search implementation."""
+def _search_filters(
+    tags=None, status_in=None, min_quality=None, dependencies_available=None
+) -> Optional[Dict]:
+    """
+    Builds the VectorIndex filter dict: all `tags` must be present, status in
+    `status_in`, quality >= `min_quality`, and (if True) every dependency
+    importable in the current environment. None when nothing is filtered.
+    """
+    filters = {
+        "tags": tags or None,
+        "status_in": status_in or None,
+        "min_quality": min_quality,
+        "dependencies_available": dependencies_available or None,
+    }
+    filters = {k: v for k, v in filters.items() if v is not None}
+    return filters or None
+
+
+def _query_embedding(query: str) -> List[float]:
     # 1. Check popular query cache
     query_embedding = popular_cache.get_embedding_cache(query)
     if query_embedding is None:
         # 2. Compute embedding if cache miss
-        emb = embedding_service.get_embedding(query)
+        emb = embedding_dispatcher.embed(query)
         query_embedding = emb.tolist()
         # 3. Cache if popular
         popular_cache.cache_embedding_if_popular(query, query_embedding)
+    return query_embedding
+
+
+def do_embed_query_impl(query: str) -> List[float]:
+    """Query vector for a proxy that scores the search against its read snapshot."""
+    return _query_embedding(query)
+
+
+def _query_cache_snapshot_path() -> Path:
+    return CACHE_DIR / "query_embeddings.npz"
+
+
+def save_query_cache_snapshot(path: Optional[Path] = None) -> int:
+    """Writes the hot query embeddings to disk, tagged with the current model."""
+    try:
+        return popular_cache.save_snapshot(
+            path or _query_cache_snapshot_path(), embedding_service.model_name
+        )
+    except Exception as e:
+        logger.error(f"QueryCache: Snapshot failed: {e}")
+        return 0
+
+
+def warm_query_cache(
+    path: Optional[Path] = None, prewarm: int = QUERY_CACHE_PREWARM
+) -> int:
+    """
+    Restores the query-embedding snapshot at Master startup. A snapshot from
+    another model is not restored; its `prewarm` most popular queries are
+    re-embedded in one batch instead. Returns the number of cached queries.
+    """
+    stale = popular_cache.load_snapshot(
+        path or _query_cache_snapshot_path(), embedding_service.model_name
+    )
+    if stale and prewarm > 0:
+        queries = stale[:prewarm]
+        try:
+            vectors = embedding_service.get_embeddings(queries)
+            popular_cache.restore(queries[::-1], vectors[::-1])  # coldest first
+        except EmbeddingUnavailable as e:
+            logger.warning(f"QueryCache: Pre-warm skipped: {e}")
+    size = popular_cache.get_stats()["cache_size"]
+    logger.info(f"QueryCache: Warmed with {size} query embeddings.")
+    return size
+
+
+def start_query_cache_persistence():
+    """
+    Master only: warms the cache on a daemon thread, then snapshots it every
+    FS_QUERY_CACHE_SNAPSHOT_INTERVAL seconds and at interpreter exit.
+    """
+    atexit.register(save_query_cache_snapshot)
+
+    def run():
+        warm_query_cache()
+        while QUERY_CACHE_SNAPSHOT_INTERVAL > 0:
+            time.sleep(QUERY_CACHE_SNAPSHOT_INTERVAL)
+            save_query_cache_snapshot()
 
-    conn = get_db_connection(read_only=False)
+    threading.Thread(target=run, daemon=True, name="query-cache-snapshot").start()
+
+
+def _vector_hits(query_embedding, limit: int, filters=None) -> List[tuple]:
+    # Score against the resident vector index (IVF pre-selection on large stores).
+    # Filtered queries scan only the matching rows, which needs no ANN.
+    if filters is None and ann_index.should_use():
+        return ann_index.search(query_embedding, limit)
+    return vector_index.search(query_embedding, limit, filters=filters)
+
+
+def _lexical_hits(query: str, limit: int, filters=None) -> List[tuple]:
+    if filters is None:
+        return lexical_index.search(query, limit)
+    hits = lexical_index.search(query, None)
+    allowed = set(vector_index.filter_ids([fid for fid, _ in hits], filters))
+    return [h for h in hits if h[0] in allowed][:limit]
+
+
+def _fuse_hits(
+    query: str, query_embedding, vector_hits: List[tuple], limit: int, filters=None
+):
+    """
+    Fuses a vector ranking with the BM25 ranking for the same query.
+    Returns (hits, extras) in the shape `_hydrate_hits` expects.
+    """
+    lexical_hits = _lexical_hits(query, _candidate_pool(limit), filters)
+    fused = reciprocal_rank_fusion(
+        [[h[0] for h in vector_hits], [fid for fid, _ in lexical_hits]]
+    )[:limit]
+
+    by_id = {h[0]: h for h in vector_hits}
+    missing = [fid for fid, _ in fused if fid not in by_id]
+    if missing and query_embedding is not None:
+        # Lexical-only matches still get their semantic similarity
+        for h in vector_index.search(query_embedding, len(missing), missing):
+            by_id[h[0]] = h
+
+    lexical_scores = dict(lexical_hits)
+    hits = [by_id.get(fid, (fid, None, None)) for fid, _ in fused]
+    extras = {
+        fid: {
+            "lexical_score": round(lexical_scores[fid], 4)
+            if fid in lexical_scores
+            else None,
+            "rrf_score": round(rrf, 6),
+        }
+        for fid, rrf in fused
+    }
+    return hits, extras
+
+
+def _candidate_pool(limit: int) -> int:
+    """How many hits each ranking contributes before fusion."""
+    return max(limit * 3, 30)
+
+
+def _do_search_query(
+    query: str, limit: int = 20, mode: str = "hybrid", filters: Optional[Dict] = None
+) -> List[Dict]:
+    """Internal search implementation."""
+    hits, extras = _rank_hits(query, limit, mode, filters)
+    return _hydrate_hits([hits], [extras])[0]
+
+
+def _rank_hits(
+    query: str, limit: int, mode: str, filters: Optional[Dict] = None
+) -> tuple:
+    """Ranked (hits, extras) in the shape `_hydrate_hits` expects."""
+    if mode == "lexical":
+        lexical_hits = _lexical_hits(query, limit, filters)
+        hits = [(fid, None, None) for fid, _ in lexical_hits]
+        extras = {
+            fid: {"lexical_score": round(s, 4), "score": round(s, 4)}
+            for fid, s in lexical_hits
+        }
+        return hits, extras
+
+    query_embedding = _query_embedding(query)
+    if mode == "vector":
+        return _vector_hits(query_embedding, limit, filters), {}
+
+    vector_hits = _vector_hits(query_embedding, _candidate_pool(limit), filters)
+    return _fuse_hits(query, query_embedding, vector_hits, limit, filters)
+
+
+def _hydrate_hits(
+    hit_lists: List[List[tuple]], extras: Optional[List[Dict[int, Dict]]] = None
+) -> List[List[Dict]]:
+    """
+    Turns index hits into result dicts with one metadata query for all lists.
+    Hits are (id, similarity, quality_score); similarity/quality may be None
+    for lexical-only matches. `extras` holds per-list field overrides by id.
+    """
+    ids = list({h[0] for hits in hit_lists for h in hits})
+    if not ids:
+        return [[] for _ in hit_lists]
+
+    conn = db_connection(read_only=False)
     try:
-        # 4. Search using the embedding
-        sql = """
-            SELECT f.id, f.name, f.description, f.tags, f.status,
-                   list_cosine_similarity(e.vector, ?::FLOAT[]) as similarity,
-                   COALESCE(CAST(json_extract(f.metadata, '$.quality_score') AS INTEGER), 50) as qs
-            FROM functions f
-            JOIN embeddings e ON f.id = e.function_id
-            WHERE f.status != 'deleted' AND e.model_name = ?
-            ORDER BY (similarity * 0.7 + (qs / 100.0) * 0.3) DESC
-            LIMIT ?
-        """
+        placeholders = ", ".join("?" for _ in ids)
         rows = conn.execute(
-            sql, (query_embedding, embedding_service.model_name, limit)
+            f"""
+            SELECT id, name, description, tags, status,
+                   COALESCE(quality_score, 50)
+            FROM functions WHERE id IN ({placeholders}) AND status != 'deleted'
+            """,
+            ids,
         ).fetchall()
+    finally:
+        conn.close()
+    by_id = {r[0]: r for r in rows}
 
+    output = []
+    for i, hits in enumerate(hit_lists):
+        overrides = extras[i] if extras else {}
         results = []
-        for r in rows:
-            results.append(
-                {
-                    "id": r[0],
-                    "name": r[1],
-                    "description": r[2],
-                    "tags": json.loads(r[3]) if r[3] else [],
-                    "status": r[4],
-                    "similarity": round(float(r[5]), 4),
-                    "quality_score": r[6],
-                    "score": round(float(r[5]) * 0.7 + (r[6] / 100.0) * 0.3, 4),
-                }
+        for fid, similarity, qs in hits:
+            r = by_id.get(fid)
+            if not r:
+                continue
+            if qs is None:
+                qs = r[5]
+            result = {
+                "id": r[0],
+                "name": r[1],
+                "description": r[2],
+                "tags": r[3] or [],
+                "status": r[4],
+                "similarity": round(similarity, 4) if similarity is not None else None,
+                "quality_score": qs,
+                "score": round((similarity or 0.0) * 0.7 + (qs / 100.0) * 0.3, 4),
+            }
+            result.update(overrides.get(fid, {}))
+            results.append(result)
+        output.append(results)
+    return output
+
+
+def do_search_batch_impl(
+    queries: List[str],
+    limit: int = 5,
+    mode: str = "hybrid",
+    tags: Optional[List[str]] = None,
+    status_in: Optional[List[str]] = None,
+    min_quality: Optional[int] = None,
+    dependencies_available: Optional[bool] = None,
+) -> List[Dict]:
+    """
+    Searches many related queries at once: one embedding call for all cache
+    misses, one scoring pass over the store, one metadata query.
+    The filters apply to every query.
+    """
+    if not queries:
+        return []
+    filters = _search_filters(tags, status_in, min_quality, dependencies_available)
+
+    not_ready = _semantic_unavailable() if mode != "lexical" else None
+    if not_ready:
+        logger.info(f"Search: {not_ready}, serving lexical results.")
+        mode = "lexical"
+    if mode == "lexical":
+        return [
+            {"query": q, "results": _do_search_query(q, limit, mode, filters)}
+            for q in queries
+        ]
+
+    vectors = [popular_cache.get_embedding_cache(q) for q in queries]
+    misses = [i for i, v in enumerate(vectors) if v is None]
+    if misses:
+        try:
+            embs = embedding_service.get_embeddings([queries[i] for i in misses])
+        except EmbeddingUnavailable as e:
+            logger.warning(
+                f"Search: Embedding unavailable ({e}), serving lexical results."
             )
-        return results
-    finally:
-        conn.close()
+            return do_search_batch_impl(
+                queries,
+                limit,
+                "lexical",
+                tags,
+                status_in,
+                min_quality,
+                dependencies_available,
+            )
+        for i, emb in zip(misses, embs):
+            vectors[i] = emb.tolist()
+            popular_cache.cache_embedding_if_popular(queries[i], vectors[i])
+
+    try:
+        pool = limit if mode == "vector" else _candidate_pool(limit)
+        if filters is None and ann_index.should_use():
+            hit_lists = [ann_index.search(v, pool) for v in vectors]
+        else:
+            hit_lists = vector_index.search_batch(vectors, pool, filters=filters)
+
+        if mode == "vector":
+            results = _hydrate_hits(hit_lists)
+        else:
+            fused = [
+                _fuse_hits(q, v, hits, limit, filters)
+                for q, v, hits in zip(queries, vectors, hit_lists)
+            ]
+            results = _hydrate_hits([f[0] for f in fused], [f[1] for f in fused])
+    except Exception as e:
+        logger.error(f"Batch search error: {e}")
+        results = [[] for _ in queries]
+
+    return [{"query": q, "results": r} for q, r in zip(queries, results)]
+
+
+def do_search_recall_impl(k: int = 10, samples: int = 50) -> Dict:
+    """Measures ANN recall against the exact scan on the current store."""
+    report = ann_index.measure_recall(k=k, samples=samples)
+    report["index"] = ann_index.get_status()
+    return report
 
 
 def _resolve_bundle(name: str, visited: Set[str], codes: List[str]):
@@ -372,66 +915,74 @@ def do_get_impl(asset_name: str, integrate_dependencies: bool = False) -> str:
             return f"Function '{asset_name}' not found."
         return "\n\n".join(codes)
 
-    conn = get_db_connection()
+    conn = db_connection()
     try:
         row = conn.execute(
             "SELECT code FROM functions WHERE name = ?", (asset_name,)
         ).fetchone()
-        if row:
-            with DBWriteLock():
-                now = datetime.now().isoformat()
-                conn.execute(
-                    "UPDATE functions SET call_count = call_count + 1, last_called_at = ? WHERE name = ?",
-                    (now, asset_name),
-                )
-                conn.commit()
-            return row[0]
-        else:
-            return f"Function '{asset_name}' not found."
     finally:
         conn.close()
+    if not row:
+        return f"Function '{asset_name}' not found."
+    # Kept in memory; the Master writes the counters in batches
+    call_counter.record(asset_name)
+    return row[0]
 
 
 def do_delete_impl(asset_name: str) -> str:
     """Core logic for deleting a function with manual cascaded cleanup."""
-    with DBWriteLock():
-        conn = get_db_connection()
-        try:
-            row = conn.execute(
-                "SELECT id FROM functions WHERE name = ?", (asset_name,)
-            ).fetchone()
-            if row:
-                fid = row[0]
-                conn.execute("DELETE FROM embeddings WHERE function_id = ?", (fid,))
-                conn.execute("DELETE FROM functions WHERE id = ?", (fid,))
-                conn.commit()
-                return f"SUCCESS: Function '{asset_name}' and its vector data deleted."
-            return f"Error: Function '{asset_name}' not found."
-        except Exception as e:
-            logger.error(f"Delete Error: {e}")
-            return f"Error: Failed to delete function '{asset_name}': {e}"
-        finally:
-            conn.close()
+
+    def delete(conn) -> Optional[int]:
+        row = conn.execute(
+            "SELECT id FROM functions WHERE name = ?", (asset_name,)
+        ).fetchone()
+        if row:
+            set_function_tags(conn, row[0], [])
+            conn.execute("DELETE FROM embeddings WHERE function_id = ?", (row[0],))
+            conn.execute("DELETE FROM functions WHERE id = ?", (row[0],))
+            return row[0]
+        return None
+
+    try:
+        fid = write_pipeline.execute(delete)
+    except Exception as e:
+        logger.error(f"Delete Error: {e}")
+        return f"Error: Failed to delete function '{asset_name}': {e}"
+    if fid is None:
+        return f"Error: Function '{asset_name}' not found."
+    call_counter.discard(asset_name)
+    vector_index.remove(fid)
+    lexical_index.remove(fid)
+    store_generation.bump()
+    return f"SUCCESS: Function '{asset_name}' and its vector data deleted."
 
 
 def do_get_details_impl(name: str) -> Dict:
     """Gets full metadata for a function."""
-    conn = get_db_connection(read_only=False)
+    conn = db_connection(read_only=False)
     try:
         # Schema version check: Ensure we handle optional columns
         sql = "SELECT id, name, status, description, tags, call_count, last_called_at, code, metadata FROM functions WHERE name = ?"
-        row = conn.execute(sql, [name]).fetchone()
-        if not row:
-            return {"error": f"Function '{name}' not found"}
+        # Stored counts and the calls they don't include yet, from one view
+        conn.begin()
+        try:
+            row = conn.execute(sql, [name]).fetchone()
+            if not row:
+                return {"error": f"Function '{name}' not found"}
+            call_count, last_called_at = call_counter.apply(
+                row[1], row[5], row[6], call_counter.unflushed(conn)
+            )
+        finally:
+            conn.rollback()  # Read only
 
         return {
             "id": row[0],
             "name": row[1],
             "status": row[2],
             "description": row[3],
-            "tags": json.loads(row[4]) if row[4] else [],
-            "call_count": row[5],
-            "last_called_at": row[6],
+            "tags": row[4] or [],
+            "call_count": call_count,
+            "last_called_at": last_called_at,
             "code": row[7],
             "metadata": json.loads(row[8]) if row[8] else {},
         }
@@ -443,56 +994,180 @@ def do_list_impl(
     query: Optional[str] = None, tag: Optional[str] = None, limit: int = 100
 ) -> List[Dict]:
     """Core logic for listing functions with basic filtering."""
-    conn = get_db_connection(read_only=False)
+    return do_list_page_impl(query, tag, limit)["items"]
+
+
+def do_list_page_impl(
+    query: Optional[str] = None,
+    tag: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Dict:
+    """
+    One page of `do_list_impl` plus an opaque `next_cursor` (None on the last
+    page). Plain and tag listings walk (updated_at DESC, id DESC) with a
+    keyset predicate. With a `query`, BM25-ranked matches come first in
+    (score DESC, id ASC) order, then the remaining name/description substring
+    matches in (updated_at DESC, id DESC) order.
+    """
+    fingerprint = query_fingerprint("list", query, tag)
+    position = decode_cursor(cursor, fingerprint)
+
+    ranked, page_ranked = [], []
+    if query and not tag:
+        ranked = sorted(lexical_index.search(query, None), key=lambda h: (-h[1], h[0]))
+        if position is None:
+            page_ranked = ranked
+        elif "s" in position:
+            page_ranked = [h for h in ranked if after_score_key(h[1], h[0], position)]
+
+    columns = "SELECT id, name, status, description, call_count, last_called_at, tags, COALESCE(updated_at, '') FROM functions"
+    where_clauses, params = [], []
+    if tag:
+        where_clauses.append(
+            "id IN (SELECT function_id FROM function_tags WHERE tag = ?)"
+        )
+        params.append(tag)
+    elif query:
+        where_clauses.append("(name ILIKE ? OR description ILIKE ?)")
+        params.extend([f"%{query}%", f"%{query}%"])
+        if ranked:
+            where_clauses.append("id NOT IN (SELECT unnest(?::INTEGER[]))")
+            params.append([fid for fid, _ in ranked])
+    if position is not None and position.get("u") is not None:
+        where_clauses.append(
+            "(COALESCE(updated_at, '') < ? OR (COALESCE(updated_at, '') = ? AND id < ?))"
+        )
+        params.extend([position["u"], position["u"], position["id"]])
+    sql = columns
+    if where_clauses:
+        sql += " WHERE " + " AND ".join(where_clauses)
+    sql += " ORDER BY COALESCE(updated_at, '') DESC, id DESC LIMIT ?"
+    # Ranked rows first; the keyset walk fills what is left of the page
+    remaining = limit - len(page_ranked)
+    params.append(remaining + 1)
+
+    conn = db_connection(read_only=False)
     try:
-        sql = "SELECT id, name, status, description, call_count, last_called_at, tags FROM functions"
-        params = []
-        where_clauses = []
+        conn.begin()
+        try:
+            rows = []
+            if page_ranked:
+                page_ids = [fid for fid, _ in page_ranked[:limit]]
+                rows = conn.execute(
+                    f"{columns} WHERE id IN ({', '.join('?' for _ in page_ids)})",
+                    page_ids,
+                ).fetchall()
+                rank = {fid: i for i, fid in enumerate(page_ids)}
+                rows.sort(key=lambda r: rank[r[0]])
+            tail = conn.execute(sql, params).fetchall() if remaining >= 0 else []
+            pending_calls = call_counter.unflushed(conn)
+        finally:
+            conn.rollback()  # Read only
+    finally:
+        conn.close()
 
-        if tag:
-            where_clauses.append("tags LIKE ?")
-            params.append(f'%"{tag}"%')
-        elif query:
-            where_clauses.append("(name ILIKE ? OR description ILIKE ?)")
-            params.extend([f"%{query}%", f"%{query}%"])
+    next_cursor = None
+    if remaining < 0:
+        fid, score = page_ranked[limit - 1]
+        next_cursor = encode_cursor({"q": fingerprint, "s": score, "id": fid})
+    elif len(tail) > remaining:
+        tail = tail[:remaining]
+        if tail:
+            last = tail[-1]
+            next_cursor = encode_cursor({"q": fingerprint, "u": last[7], "id": last[0]})
+        else:
+            # The ranked matches filled this page; the substring walk starts next
+            next_cursor = encode_cursor({"q": fingerprint, "u": None})
+    rows += tail
+
+    items = []
+    for r in rows:
+        call_count, last_called_at = call_counter.apply(r[1], r[4], r[5], pending_calls)
+        items.append(
+            {
+                "id": r[0],
+                "name": r[1],
+                "status": r[2],
+                "description": r[3],
+                "call_count": call_count,
+                "last_called_at": last_called_at,
+                "tags": r[6] or [],
+            }
+        )
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def iter_list_impl(
+    query: Optional[str] = None, tag: Optional[str] = None, page_size: int = 500
+) -> Iterator[Dict]:
+    """Yields every listed function, one keyset page in memory at a time."""
+    cursor = None
+    while True:
+        page = do_list_page_impl(query, tag, page_size, cursor)
+        yield from page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
 
-        if where_clauses:
-            sql += " WHERE " + " AND ".join(where_clauses)
 
-        sql += " ORDER BY updated_at DESC LIMIT ?"
-        params.append(limit)
+def do_reindex_impl(workers: int = 0, batch_size: int = 64) -> Dict:
+    """
+    Starts re-embedding every stored function in the background (see
+    engine.bulk_indexer) and returns at once; progress is in
+    `get_server_status` under "reindex".
+    """
+    return reindex_job.start(workers, batch_size)
 
-        rows = conn.execute(sql, params).fetchall()
 
-        output = []
-        for r in rows:
-            output.append(
-                {
-                    "id": r[0],
-                    "name": r[1],
-                    "status": r[2],
-                    "description": r[3],
-                    "call_count": r[4],
-                    "last_called_at": r[5],
-                    "tags": json.loads(r[6]) if r[6] else [],
-                }
-            )
-        return output
+def do_status_impl() -> Dict:
+    """Readiness of the embedding model plus cache and batching statistics."""
+    return {
+        "embedding_model": embedding_service.get_readiness(),
+        "startup": startup_migrations.get_readiness(),
+        "search_result_cache": result_cache.get_stats(),
+        "query_embedding_cache": popular_cache.get_stats(),
+        "embedding_cache": embedding_cache.get_stats(),
+        "embedding_batches": embedding_dispatcher.get_stats(),
+        "pending_embeddings": _pending_embedding_count(),
+        "db_connections": connection_manager.get_stats(),
+        "db_lock": get_lock_stats(),
+        "db_writer": write_pipeline.get_stats(),
+        "call_counter": call_counter.get_stats(),
+        "read_snapshot": snapshot_publisher.get_stats(),
+        "reindex": reindex_job.get_status(),
+    }
+
+
+def do_tag_counts_impl(limit: int = 50) -> Dict[str, int]:
+    """Most used tags with their function counts (from the `tag_counts` aggregate)."""
+    conn = db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT tag, count FROM tag_counts WHERE count > 0 ORDER BY count DESC, tag LIMIT ?",
+            (limit,),
+        ).fetchall()
     finally:
         conn.close()
+    return dict(rows)
 
 
 def get_stats_impl() -> Dict:
     """Core logic for getting database statistics."""
-    conn = get_db_connection(read_only=False)
+    conn = db_connection(read_only=False)
     try:
         total = conn.execute("SELECT count(*) FROM functions").fetchone()[0]
         active = conn.execute(
             "SELECT count(*) FROM functions WHERE status IN ('active', 'verified')"
         ).fetchone()[0]
-        total_calls = (
-            conn.execute("SELECT sum(call_count) FROM functions").fetchone()[0] or 0
-        )
+        conn.begin()
+        try:
+            total_calls = (
+                conn.execute("SELECT sum(call_count) FROM functions").fetchone()[0] or 0
+            )
+            total_calls += sum(n for n, _ in call_counter.unflushed(conn).values())
+        finally:
+            conn.rollback()  # Read only
         recent = conn.execute(
             "SELECT name, updated_at FROM functions ORDER BY updated_at DESC LIMIT 5"
         ).fetchall()
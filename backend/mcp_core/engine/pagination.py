@@ -0,0 +1,40 @@
+import base64
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+
+def query_fingerprint(*parts: Any) -> str:
+    """Short digest of the arguments a cursor was issued for."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Opaque, URL-safe cursor for a keyset position."""
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], fingerprint: str) -> Optional[Dict]:
+    """
+    Decodes a cursor issued by `encode_cursor`. Raises ValueError if it is
+    malformed or was issued for a different query (fingerprint mismatch).
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if not isinstance(position, dict) or position.get("q") != fingerprint:
+        raise ValueError("Invalid cursor: it belongs to a different query")
+    return position
+
+
+def after_score_key(item_score: float, item_id: int, position: Dict) -> bool:
+    """True if (score, id) comes after the cursor in (score DESC, id ASC) order."""
+    return item_score < position["s"] or (
+        item_score == position["s"] and item_id > position["id"]
+    )
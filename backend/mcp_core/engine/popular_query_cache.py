@@ -1,70 +1,270 @@
 import hashlib
 import logging
-import time
-from collections import Counter
-from typing import Dict, List, Optional
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+class CountMinSketch:
+    """
+    クエリ頻度の近似カウンタ（4行の Count-Min Sketch）。メモリは容量に比例し、
+    カウンタは15で頭打ち。サンプル数が容量の10倍に達するたびに全体を半減して
+    古い人気を忘れる。
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity: int):
+        width = 1 << max(4, (max(1, capacity) * 4 - 1).bit_length())
+        self._table = np.zeros((self.DEPTH, width), dtype=np.uint8)
+        self._rows = np.arange(self.DEPTH)
+        self._mask = width - 1
+        self._sample_size = 10 * max(1, capacity)
+        self._additions = 0
+
+    def _indexes(self, key: bytes) -> np.ndarray:
+        return np.frombuffer(key, dtype=np.uint32) & self._mask
+
+    def increment(self, key: bytes, count: int = 1) -> None:
+        idx = self._indexes(key)
+        for _ in range(count):
+            counts = self._table[self._rows, idx]
+            current = counts.min()
+            if current < self.MAX_COUNT:
+                # Conservative update: only the minimal counters grow
+                hit = counts == current
+                self._table[self._rows[hit], idx[hit]] += 1
+            self._additions += 1
+            if self._additions >= self._sample_size:
+                self._table >>= 1
+                self._additions //= 2
+
+    def estimate(self, key: bytes) -> int:
+        return int(self._table[self._rows, self._indexes(key)].min())
+
+
 class PopularQueryCache:
     """
     人気クエリのembedding結果をキャッシュして検索パフォーマンス向上
+
+    W-TinyLFU: 新しいクエリはまず小さな LRU ウィンドウ(1%)に入り、ウィンドウから
+    溢れた候補は Count-Min Sketch の推定頻度がメイン領域の LRU 犠牲者より高い
+    場合だけ採用される。メイン領域は SLRU（probation 20% / protected 80%）。
+    参照・追加・追い出しはすべて O(1)。
     """
 
-    def __init__(self, max_cache_size: int = 500, popularity_threshold: int = 3):
-        self.query_embeddings = {}  # {query_hash: embedding_vector}
-        self.query_frequency = Counter()  # {query_text: access_count}
-        self.last_accessed = {}  # {query_hash: timestamp}
-        self.hit_count = 0
+    TIERS = ("window", "probation", "protected")
+
+    def __init__(self, max_cache_size: int = 500):
+        self.max_cache_size = max(2, max_cache_size)
+        self._window_capacity = max(1, self.max_cache_size // 100)
+        self._main_capacity = self.max_cache_size - self._window_capacity
+        self._protected_capacity = max(1, int(self._main_capacity * 0.8))
+
+        # {key: (query text, embedding)}, least recently used first
+        self._window: "OrderedDict[bytes, Tuple[str, List[float]]]" = OrderedDict()
+        self._probation: "OrderedDict[bytes, Tuple[str, List[float]]]" = OrderedDict()
+        self._protected: "OrderedDict[bytes, Tuple[str, List[float]]]" = OrderedDict()
+        self._sketch = CountMinSketch(self.max_cache_size)
+        self._lock = threading.Lock()
+
+        self._hits = dict.fromkeys(self.TIERS, 0)
         self.miss_count = 0
-        self.max_cache_size = max_cache_size
-        self.popularity_threshold = popularity_threshold
+        self.admitted = 0
+        self.rejected = 0
+
+    @staticmethod
+    def canonical_key(query: str) -> bytes:
+        """大文字小文字・空白の違いを無視した正規化クエリのハッシュ"""
+        normalized = " ".join(query.lower().split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+    @property
+    def hit_count(self) -> int:
+        return sum(self._hits.values())
 
     def get_embedding_cache(self, query: str) -> Optional[List[float]]:
         """人気クエリのembeddingを取得"""
-        query_hash = hashlib.md5(query.encode()).hexdigest()
-        if query_hash in self.query_embeddings:
-            self.last_accessed[query_hash] = time.time()
-            self.hit_count += 1
-            return self.query_embeddings[query_hash]
-        self.miss_count += 1
-        return None
+        key = self.canonical_key(query)
+        with self._lock:
+            self._sketch.increment(key)
+            if key in self._window:
+                self._window.move_to_end(key)
+                self._hits["window"] += 1
+                return self._window[key][1]
+            if key in self._protected:
+                self._protected.move_to_end(key)
+                self._hits["protected"] += 1
+                return self._protected[key][1]
+            if key in self._probation:
+                # Second hit in the main region: promote
+                entry = self._probation.pop(key)
+                self._protected[key] = entry
+                if len(self._protected) > self._protected_capacity:
+                    demoted, value = self._protected.popitem(last=False)
+                    self._probation[demoted] = value
+                self._hits["probation"] += 1
+                return entry[1]
+            self.miss_count += 1
+            return None
 
     def cache_embedding_if_popular(self, query: str, embedding: List[float]) -> None:
-        """人気クエリのembeddingをキャッシュ"""
-        normalized_query = query.lower().strip()
-        self.query_frequency[normalized_query] += 1
-
-        if self.query_frequency[normalized_query] >= self.popularity_threshold:
-            if len(self.query_embeddings) >= self.max_cache_size:
-                self._evict_least_popular()
-
-            query_hash = hashlib.md5(query.encode()).hexdigest()
-            self.query_embeddings[query_hash] = embedding
-            self.last_accessed[query_hash] = time.time()
-            logger.info(f"Cached popular query: {normalized_query}")
-
-    def _evict_least_popular(self) -> None:
-        """人気度の低いキャッシュを削除"""
-        if not self.last_accessed:
-            return
+        """人気クエリのembeddingをキャッシュ（採用はTinyLFUの頻度比較で決定）"""
+        key = self.canonical_key(query)
+        with self._lock:
+            for tier in (self._window, self._probation, self._protected):
+                if key in tier:
+                    tier[key] = (tier[key][0], embedding)
+                    return
+            self._window[key] = (query, embedding)
+            if len(self._window) > self._window_capacity:
+                candidate, value = self._window.popitem(last=False)
+                self._admit(candidate, value)
 
-        oldest_hash = min(
-            self.last_accessed.keys(), key=lambda h: self.last_accessed[h]
-        )
-        del self.query_embeddings[oldest_hash]
-        del self.last_accessed[oldest_hash]
-        logger.info(f"Evicted cache entry: {oldest_hash}")
+    def _admit(self, candidate: bytes, value: Tuple[str, List[float]]) -> None:
+        """ウィンドウから溢れた候補をメイン領域に入れるか判定"""
+        if len(self._probation) + len(self._protected) < self._main_capacity:
+            self._probation[candidate] = value
+            return
+        victims = self._probation if self._probation else self._protected
+        victim = next(iter(victims))
+        if self._sketch.estimate(candidate) > self._sketch.estimate(victim):
+            del victims[victim]
+            self._probation[candidate] = value
+            self.admitted += 1
+        else:
+            self.rejected += 1
 
     def get_stats(self) -> Dict:
-        """キャッシュ統計情報"""
-        total_requests = self.hit_count + self.miss_count
-        hit_rate = (self.hit_count / total_requests * 100) if total_requests > 0 else 0
+        """キャッシュ統計情報（層ごとのヒット率を含む）"""
+        with self._lock:
+            hits = dict(self._hits)
+            sizes = {
+                "window": len(self._window),
+                "probation": len(self._probation),
+                "protected": len(self._protected),
+            }
+            miss_count, admitted, rejected = (
+                self.miss_count,
+                self.admitted,
+                self.rejected,
+            )
+        capacities = {
+            "window": self._window_capacity,
+            "probation": self._main_capacity - self._protected_capacity,
+            "protected": self._protected_capacity,
+        }
+        total_hits = sum(hits.values())
+        total_requests = total_hits + miss_count
+
+        def rate(n):
+            return f"{(n / total_requests * 100) if total_requests else 0:.2f}%"
+
         return {
-            "cache_size": len(self.query_embeddings),
-            "hit_count": self.hit_count,
-            "miss_count": self.miss_count,
-            "hit_rate": f"{hit_rate:.2f}%",
-            "total_queries": len(self.query_frequency),
+            "cache_size": sum(sizes.values()),
+            "hit_count": total_hits,
+            "miss_count": miss_count,
+            "hit_rate": rate(total_hits),
+            "tiers": {
+                tier: {
+                    "size": sizes[tier],
+                    "capacity": capacities[tier],
+                    "hits": hits[tier],
+                    "hit_rate": rate(hits[tier]),
+                }
+                for tier in self.TIERS
+            },
+            "admitted": admitted,
+            "rejected": rejected,
         }
+
+    # ------------------------------------------------------------------
+    # Snapshot (survives Master restarts)
+    # ------------------------------------------------------------------
+
+    def save_snapshot(self, path: Path, model_name: str) -> int:
+        """
+        キャッシュ内容を `path` (.npz) に保存する。モデル名でタグ付けし、
+        頻度の低い順に並べる。保存した件数を返す。
+        """
+        with self._lock:
+            entries = [
+                (self._sketch.estimate(key), text, vector)
+                for tier in (self._window, self._probation, self._protected)
+                for key, (text, vector) in tier.items()
+            ]
+        if not entries:
+            return 0
+        entries.sort(key=lambda e: e[0])
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                model_name=np.array(model_name),
+                counts=np.array([e[0] for e in entries], dtype=np.int32),
+                queries=np.array([e[1] for e in entries]),
+                vectors=np.asarray([e[2] for e in entries], dtype=np.float32),
+            )
+        os.replace(tmp, path)
+        return len(entries)
+
+    def load_snapshot(self, path: Path, model_name: str) -> List[str]:
+        """
+        保存済みスナップショットを読み込む。同じモデルのものならembeddingを
+        そのまま復元して空リストを返す。別モデルのものならembeddingは捨て、
+        再計算用のクエリを人気順に返す。
+        """
+        path = Path(path)
+        if not path.exists():
+            return []
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                snapshot_model = str(data["model_name"])
+                counts = data["counts"].tolist()
+                queries = data["queries"].tolist()
+                vectors = data["vectors"]
+        except Exception as e:
+            logger.warning(f"PopularQueryCache: Ignoring unreadable snapshot: {e}")
+            return []
+
+        if snapshot_model != model_name:
+            logger.info(
+                f"PopularQueryCache: Snapshot is for '{snapshot_model}', not restoring vectors."
+            )
+            return queries[::-1]
+        self.restore(queries, vectors, counts)
+        return []
+
+    def restore(self, queries: List[str], vectors, counts: Optional[List[int]] = None):
+        """
+        計算済みのembeddingをメイン領域に入れる（頻度の低い順に渡す）。
+        Sketchにも頻度を反映し、再起動後も採用判定で優先されるようにする。
+        """
+        counts = counts or [1] * len(queries)
+        with self._lock:
+            for query, vector, count in zip(queries, vectors, counts):
+                key = self.canonical_key(query)
+                self._sketch.increment(
+                    key, max(1, min(count, CountMinSketch.MAX_COUNT))
+                )
+                self._window.pop(key, None)
+                self._probation.pop(key, None)
+                self._protected.pop(key, None)
+                self._protected[key] = (query, np.asarray(vector).tolist())
+                if len(self._protected) > self._protected_capacity:
+                    demoted, value = self._protected.popitem(last=False)
+                    self._probation[demoted] = value
+                    if (
+                        len(self._probation) + len(self._protected)
+                        > self._main_capacity
+                    ):
+                        self._probation.popitem(last=False)
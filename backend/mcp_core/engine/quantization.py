@@ -0,0 +1,82 @@
+import tempfile
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Rows converted back to float32 per block while scoring int8 codes.
+# Small enough that the converted block stays in L2 cache.
+SCORE_BLOCK_ROWS = 256
+
+
+def fit_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-dimension affine parameters mapping [min, max] onto the 256 int8 levels.
+    An empty store falls back to [-1, 1], the range of normalized components.
+    """
+    dim = vectors.shape[1]
+    if vectors.shape[0] == 0:
+        low = np.full(dim, -1.0, dtype=np.float32)
+        high = np.full(dim, 1.0, dtype=np.float32)
+    else:
+        low = vectors.min(axis=0).astype(np.float32)
+        high = vectors.max(axis=0).astype(np.float32)
+    scale = (high - low) / 255.0
+    scale[scale == 0] = 1.0
+    return scale.astype(np.float32), low
+
+
+def quantize_int8(vectors, scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    """float -> int8 code; values outside the fitted range are clipped."""
+    codes = np.rint((np.asarray(vectors, dtype=np.float32) - offset) / scale) - 128
+    return np.clip(codes, -128, 127).astype(np.int8)
+
+
+def dequantize_int8(codes: np.ndarray, scale: np.ndarray, offset: np.ndarray):
+    return (codes.astype(np.float32) + 128) * scale + offset
+
+
+def int8_dot(codes: np.ndarray, queries: np.ndarray, scale, offset) -> np.ndarray:
+    """
+    Approximate `dequantize(codes) @ queries.T` without materializing the
+    float matrix: q . v = (q * scale) . code + q . (offset + 128 * scale).
+    `queries` is (dim,) or (m, dim); the result is (n,) or (n, m).
+    """
+    q = np.asarray(queries, dtype=np.float32)
+    q2 = np.atleast_2d(q)
+    weights = (q2 * scale).T  # (dim, m)
+    bias = q2 @ (offset + 128 * scale)  # (m,)
+
+    out = np.empty((codes.shape[0], q2.shape[0]), dtype=np.float32)
+    for start in range(0, codes.shape[0], SCORE_BLOCK_ROWS):
+        block = codes[start : start + SCORE_BLOCK_ROWS]
+        out[start : start + block.shape[0]] = block.astype(np.float32) @ weights
+    out += bias
+    return out[:, 0] if q.ndim == 1 else out
+
+
+class SpillMatrix:
+    """
+    float32 (rows x dim) matrix backed by an unlinked temporary file and
+    memory-mapped, so it lives in the OS page cache rather than the heap.
+    Used to keep exact vectors next to the int8 codes for re-ranking.
+    """
+
+    def __init__(self, dim: int, capacity: int, directory: Optional[str] = None):
+        self.dim = dim
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self.data = None
+        self.resize(capacity)
+
+    def resize(self, capacity: int):
+        """Grows the backing file; existing rows are kept in place."""
+        capacity = max(capacity, 1)
+        if self.data is not None:
+            self.data.flush()
+        self._file.truncate(capacity * self.dim * 4)
+        self.data = np.memmap(
+            self._file, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def close(self):
+        self.data = None
+        self._file.close()
@@ -0,0 +1,44 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `rate` tokens per second refill up to
+    `capacity`; `acquire` blocks until enough tokens are available.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Takes the tokens (possibly going into debt); returns the seconds to wait."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Blocks until `tokens` may be spent. Returns the seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        delay = self._reserve(tokens)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter (attempt 0 = first retry)."""
+    return random.uniform(0, min(cap, base * (2**attempt)))
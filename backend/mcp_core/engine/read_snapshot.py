@@ -0,0 +1,757 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import duckdb
+import numpy as np
+from mcp_core.core import config
+from mcp_core.core.database import db_connection
+from mcp_core.core.migrations import startup_migrations
+from mcp_core.engine.call_counter import call_counter
+from mcp_core.engine.embedding import embedding_service, normalize, normalize_rows
+from mcp_core.engine.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from mcp_core.engine.result_cache import store_generation
+from mcp_core.engine.vector_index import (
+    DEFAULT_QUALITY,
+    QUALITY_WEIGHT,
+    SIMILARITY_WEIGHT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Published versions kept on disk; readers may still have older ones mapped
+SNAPSHOT_KEEP = 3
+
+SNAPSHOT_COLUMNS = (
+    "id, name, status, description, COALESCE(tags, []) AS tags, call_count, "
+    "last_called_at, code, metadata, COALESCE(updated_at, '') AS updated_at, "
+    "COALESCE(quality_score, 50) AS quality_score"
+)
+
+
+def snapshot_root() -> Path:
+    """Snapshots live next to the store they were published from."""
+    return Path(config.DB_PATH).with_name("snapshots")
+
+
+def _sql_path(path: Path) -> str:
+    return str(path).replace("'", "''")
+
+
+def read_manifest(root: Optional[Path] = None) -> Optional[Dict]:
+    """The `CURRENT` manifest of the newest complete version, if any."""
+    try:
+        with open((root or snapshot_root()) / "CURRENT", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class SnapshotPublisher:
+    """
+    Master only: publishes an immutable, versioned copy of the store for
+    proxies and the dashboard. A version is a directory holding
+    `functions.parquet` (written by DuckDB) and, once the vector migrations
+    are done, the normalized embeddings as `ids.npy` / `vectors.npy` with
+    their rows' quality scores in `quality.npy`. Rows and
+    vectors are read in one transaction, so they always match. The directory
+    is complete before `CURRENT` is atomically switched to it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._published_generation: Optional[int] = None
+        # Call count flushes don't bump the generation but change the rows
+        self._published_flushes: Optional[int] = None
+        # (embeddings fingerprint, version dir) of the last vectors written
+        self._published_vectors: Optional[Tuple[tuple, Path]] = None
+        self.publish_count = 0
+        self.vectors_reused = 0
+        self.last_publish_s = 0.0
+
+    def publish(self) -> Optional[int]:
+        """Writes a new version and points `CURRENT` at it. Returns the version."""
+        with self._lock:
+            # Taken before the COPY: every write these cover is in the copy
+            generation = store_generation.value
+            taken_at = time.time()
+            start = time.perf_counter()
+            root = snapshot_root()
+            root.mkdir(parents=True, exist_ok=True)
+            version = (read_manifest(root) or {}).get("version", 0) + 1
+            name = f"v{version:08d}"
+            tmp = root / f".{name}.tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            tmp.mkdir()
+
+            has_vectors = startup_migrations.semantic_ready()
+            fingerprint = None
+            conn = db_connection()
+            try:
+                conn.begin()
+                try:
+                    # Taken before the transaction's first read: a flush that
+                    # commits after it is republished next time
+                    flushes = call_counter.flush_count
+                    count = conn.execute(
+                        "SELECT count(*) FROM functions WHERE status != 'deleted'"
+                    ).fetchone()[0]
+                    pending = call_counter.unflushed(conn)
+                    self._copy_functions(conn, tmp, pending)
+                    if has_vectors:
+                        fingerprint = self._copy_vectors(conn, tmp)
+                        self._copy_quality(conn, tmp)
+                finally:
+                    conn.rollback()  # Read only
+            finally:
+                conn.close()
+
+            shutil.rmtree(root / name, ignore_errors=True)  # left by a crashed publish
+            os.replace(tmp, root / name)
+            manifest = {
+                "version": version,
+                "dir": name,
+                "functions": count,
+                "vectors": has_vectors,
+                "session": store_generation.session,
+                "generation": generation,
+                "taken_at": taken_at,
+                "published_at": time.time(),
+            }
+            current_tmp = root / "CURRENT.tmp"
+            with open(current_tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(current_tmp, root / "CURRENT")
+
+            self._published_generation = generation
+            self._published_flushes = flushes
+            self._published_vectors = (
+                (fingerprint, root / name) if fingerprint is not None else None
+            )
+            self.publish_count += 1
+            self.last_publish_s = round(time.perf_counter() - start, 3)
+            self._prune(root, version)
+        logger.info(f"ReadSnapshot: Published version {version} ({count} functions).")
+        return version
+
+    def _copy_vectors(self, conn, tmp: Path) -> tuple:
+        """
+        Writes the current model's embeddings of the copied rows. When none
+        changed since the last version, its files are hard-linked instead.
+        Returns the embeddings fingerprint.
+        """
+        model_name = embedding_service.model_name
+        dim = embedding_service.get_model_info()["dimension"]
+        # Embedding rows get a fresh id when rewritten, a new encoded_at when updated
+        fingerprint = (model_name, dim) + tuple(
+            conn.execute(
+                """
+                SELECT count(*), COALESCE(bit_xor(hash(e.id, e.encoded_at)), 0)
+                FROM functions f JOIN embeddings e ON f.id = e.function_id
+                WHERE f.status != 'deleted' AND e.model_name = ?
+                  AND e.vector IS NOT NULL
+                """,
+                (model_name,),
+            ).fetchone()
+        )
+        if self._published_vectors and self._published_vectors[0] == fingerprint:
+            previous = self._published_vectors[1]
+            try:
+                for file_name in ("ids.npy", "vectors.npy"):
+                    os.link(previous / file_name, tmp / file_name)
+                self.vectors_reused += 1
+                return fingerprint
+            except OSError:
+                pass  # Pruned, or no hard links here: write them again
+
+        res = conn.execute(
+            """
+            SELECT f.id, e.vector
+            FROM functions f JOIN embeddings e ON f.id = e.function_id
+            WHERE f.status != 'deleted' AND e.model_name = ? AND len(e.vector) = ?
+            QUALIFY row_number() OVER (PARTITION BY f.id ORDER BY e.id DESC) = 1
+            ORDER BY f.id
+            """,
+            (model_name, dim),
+        ).fetchnumpy()
+        ids = np.asarray(res["id"], dtype=np.int64)
+        vectors = (
+            normalize_rows(np.stack(res["vector"]).astype(np.float32, copy=False))
+            if len(ids)
+            else np.zeros((0, dim), dtype=np.float32)
+        )
+        for file_name, array in (("ids.npy", ids), ("vectors.npy", vectors)):
+            path = tmp / file_name
+            path.unlink(missing_ok=True)  # A half-done link attempt
+            np.save(path, array)
+        return fingerprint
+
+    @staticmethod
+    def _copy_quality(conn, tmp: Path):
+        """Writes `quality.npy`, the quality score of each row of `ids.npy`."""
+        ids = np.load(tmp / "ids.npy")
+        res = conn.execute(
+            "SELECT id, COALESCE(quality_score, ?) AS q FROM functions "
+            "WHERE status != 'deleted' ORDER BY id",
+            (DEFAULT_QUALITY,),
+        ).fetchnumpy()
+        live = np.asarray(res["id"], dtype=np.int64)
+        quality = np.asarray(res["q"], dtype=np.float32)
+        pos = np.searchsorted(live, ids)  # Every vector belongs to a live row
+        np.save(tmp / "quality.npy", quality[pos] if len(live) else quality)
+
+    @staticmethod
+    def _copy_functions(conn, tmp: Path, pending: Dict):
+        """Copies the live rows, with not yet flushed calls added to the counts."""
+        conn.execute(
+            "CREATE OR REPLACE TEMP TABLE snapshot_pending_calls "
+            "(name VARCHAR, n BIGINT, ts VARCHAR)"
+        )
+        try:
+            if pending:
+                conn.execute(
+                    """
+                    INSERT INTO snapshot_pending_calls
+                    SELECT p.name, p.n, p.ts
+                    FROM (SELECT unnest(from_json(?, '[{"name": "VARCHAR", "n": "BIGINT", "ts": "VARCHAR"}]')) AS p)
+                    """,
+                    [
+                        json.dumps(
+                            [
+                                {"name": name, "n": n, "ts": ts}
+                                for name, (n, ts) in pending.items()
+                            ]
+                        )
+                    ],
+                )
+            columns = SNAPSHOT_COLUMNS.replace(
+                "call_count, last_called_at,",
+                "COALESCE(f.call_count, 0) + COALESCE(p.n, 0) AS call_count, "
+                "NULLIF(GREATEST(COALESCE(f.last_called_at, ''), "
+                "COALESCE(p.ts, '')), '') AS last_called_at,",
+            )
+            conn.execute(
+                f"""
+                COPY (
+                    SELECT {columns}
+                    FROM functions f LEFT JOIN snapshot_pending_calls p USING (name)
+                    WHERE status != 'deleted'
+                    ORDER BY COALESCE(updated_at, '') DESC, id DESC
+                ) TO '{_sql_path(tmp / "functions.parquet")}' (FORMAT PARQUET)
+                """
+            )
+        finally:
+            conn.execute("DROP TABLE IF EXISTS snapshot_pending_calls")
+
+    @staticmethod
+    def _prune(root: Path, version: int):
+        for path in root.glob("v*"):
+            try:
+                if int(path.name[1:]) <= version - SNAPSHOT_KEEP:
+                    # Windows refuses while a reader still maps it; retried next time
+                    shutil.rmtree(path)
+            except (ValueError, OSError):
+                continue
+
+    def publish_if_changed(self) -> Optional[int]:
+        if (
+            store_generation.value == self._published_generation
+            and call_counter.flush_count == self._published_flushes
+        ):
+            return None
+        if not startup_migrations.is_done("schema"):
+            return None  # Column types may still be the legacy ones
+        return self.publish()
+
+    def start(self, interval: float):
+        """
+        Publishes once, then at most every `interval` seconds while writes or
+        call count flushes keep changing the store (0 disables snapshots).
+        """
+        if interval <= 0:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.publish_if_changed()
+                except Exception as e:
+                    logger.error(f"ReadSnapshot: Publish failed: {e}")
+                time.sleep(interval)
+
+        threading.Thread(target=run, daemon=True, name="read-snapshot").start()
+
+    def get_stats(self) -> Dict:
+        manifest = read_manifest() or {}
+        return {
+            "version": manifest.get("version"),
+            "functions": manifest.get("functions"),
+            "vectors": manifest.get("vectors"),
+            "publishes": self.publish_count,
+            "vectors_reused": self.vectors_reused,
+            "last_publish_s": self.last_publish_s,
+        }
+
+
+class _SnapshotLexicalIndex(LexicalIndex):
+    """
+    BM25 over one snapshot's rows; never reads the DB. Keeps a content hash
+    per document (`ids` sorted, `hashes` aligned) so the index of the next
+    version only re-indexes the documents that changed.
+    """
+
+    def __init__(self, ids: np.ndarray, hashes: np.ndarray, rows=()):
+        super().__init__()
+        self._ids = ids
+        self._hashes = hashes
+        for fid, name, description, tags, code in rows:
+            self._add(fid, name, description, tags or [], code)
+
+    @property
+    def is_loaded(self) -> bool:
+        return True
+
+    def evolve(
+        self, ids: np.ndarray, hashes: np.ndarray, fetch: Callable[[List[int]], list]
+    ) -> "_SnapshotLexicalIndex":
+        """
+        The index for a newer version, sharing this one's unchanged postings
+        (copied on first write). `fetch(ids)` returns the changed documents'
+        rows. This index stays as it was for readers still on its version.
+        """
+        old_ids, old_hashes = self._ids, self._hashes
+        if len(old_ids):
+            pos = np.minimum(np.searchsorted(old_ids, ids), len(old_ids) - 1)
+            same = (old_ids[pos] == ids) & (old_hashes[pos] == hashes)
+        else:
+            same = np.zeros(len(ids), dtype=bool)
+        changed = ids[~same].tolist()
+        removed = old_ids[~np.isin(old_ids, ids)].tolist()
+
+        index = _SnapshotLexicalIndex(ids, hashes)
+        index._postings = dict(self._postings)
+        index._doc_terms = dict(self._doc_terms)
+        index._doc_len = dict(self._doc_len)
+        index._total_len = self._total_len
+        owned = set()
+
+        def own(terms):
+            for term in terms:
+                if term not in owned and term in index._postings:
+                    index._postings[term] = dict(index._postings[term])
+                owned.add(term)
+
+        for fid in removed:
+            own(index._doc_terms.get(fid, ()))
+            index._remove(fid)
+        for fid, name, description, tags, code in fetch(changed) if changed else ():
+            terms = self._document_terms(name, description, tags or [], code)
+            own(set(index._doc_terms.get(fid, ())) | terms.keys())
+            index._add_terms(fid, terms)
+        return index
+
+
+class Snapshot:
+    """
+    One published version, opened read-only. Metadata queries run against
+    the Parquet file through an in-memory DuckDB view, vectors are a
+    memory-mapped `.npy` slab. Nothing is mutated after open, so a reader
+    keeps using the version it started with while a newer one is swapped in.
+    `previous` is the version this one replaces; its lexical index is
+    carried forward instead of being rebuilt.
+    """
+
+    def __init__(
+        self, root: Path, manifest: Dict, previous: Optional["Snapshot"] = None
+    ):
+        self.version = manifest["version"]
+        self.session = manifest.get("session")
+        self.generation = manifest.get("generation", -1)
+        self.taken_at = manifest.get("taken_at", 0.0)
+        path = root / manifest["dir"]
+        self._conn = duckdb.connect()
+        self._conn.execute(
+            "CREATE VIEW functions AS SELECT * FROM "
+            f"read_parquet('{_sql_path(path / 'functions.parquet')}')"
+        )
+        self.ids = self.vectors = self._quality = None
+        if manifest.get("vectors"):
+            self.ids = np.load(path / "ids.npy", mmap_mode="r")
+            self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+            try:
+                self._quality = np.load(path / "quality.npy", mmap_mode="r")
+            except OSError:
+                pass  # Published before quality.npy existed; looked up on first search
+        self._lexical: Optional[LexicalIndex] = None
+        # Only the index is kept, not the older version's files or connection
+        self._base_lexical = (
+            previous._lexical or previous._base_lexical if previous else None
+        )
+        self._lock = threading.Lock()
+
+    def covers(self, write: Optional[Dict]) -> bool:
+        """
+        Whether this version includes a write. `write` is what the Master
+        returned for it ({"session", "generation"}), or {"done_at": t} with
+        the time the write call returned when no generation is known.
+        """
+        if not write:
+            return True
+        if "generation" in write:
+            return (
+                write.get("session") == self.session
+                and self.generation >= write["generation"]
+            )
+        return self.taken_at >= write["done_at"]
+
+    def query(self, sql: str, params=()) -> list:
+        cursor = self._conn.cursor()
+        try:
+            return cursor.execute(sql, params).fetchall()
+        finally:
+            cursor.close()
+
+    @property
+    def lexical(self) -> LexicalIndex:
+        with self._lock:
+            if self._lexical is None:
+                cursor = self._conn.cursor()
+                try:
+                    res = cursor.execute(
+                        "SELECT id, hash(name, description, tags, code) AS h "
+                        "FROM functions ORDER BY id"
+                    ).fetchnumpy()
+                finally:
+                    cursor.close()
+                ids = np.asarray(res["id"], dtype=np.int64)
+                hashes = np.asarray(res["h"], dtype=np.uint64)
+                if self._base_lexical is not None:
+                    self._lexical = self._base_lexical.evolve(
+                        ids, hashes, self._documents
+                    )
+                else:
+                    self._lexical = _SnapshotLexicalIndex(
+                        ids, hashes, self._documents(None)
+                    )
+                self._base_lexical = None
+            return self._lexical
+
+    def _documents(self, ids: Optional[List[int]]) -> list:
+        sql = "SELECT id, name, description, tags, code FROM functions"
+        if ids is None:
+            return self.query(sql)
+        return self.query(sql + " WHERE id IN (SELECT unnest(?::BIGINT[]))", [ids])
+
+    def _quality_bias(self, rows: np.ndarray) -> np.ndarray:
+        if self._quality is None:
+            with self._lock:
+                if self._quality is None:
+                    quality = dict(
+                        self.query("SELECT id, quality_score FROM functions")
+                    )
+                    self._quality = np.array(
+                        [
+                            quality.get(fid, DEFAULT_QUALITY)
+                            for fid in self.ids.tolist()
+                        ],
+                        dtype=np.float32,
+                    )
+        return self._quality[rows] / 100.0 * QUALITY_WEIGHT
+
+    def _row_of(self, fid: int) -> Optional[int]:
+        row = int(np.searchsorted(self.ids, fid))
+        return row if row < len(self.ids) and self.ids[row] == fid else None
+
+    def _allowed_ids(self, tags=None, status_in=None, min_quality=None):
+        clauses, params = [], []
+        if tags:
+            clauses.append("list_has_all(tags, ?)")
+            params.append(list(tags))
+        if status_in:
+            clauses.append(f"status IN ({', '.join('?' for _ in status_in)})")
+            params.extend(status_in)
+        if min_quality is not None:
+            clauses.append("quality_score >= ?")
+            params.append(min_quality)
+        if not clauses:
+            return None
+        sql = "SELECT id FROM functions WHERE " + " AND ".join(clauses)
+        return {r[0] for r in self.query(sql, params)}
+
+    def _vector_ranking(self, q: np.ndarray, limit: int, allowed) -> List[tuple]:
+        rows = np.arange(len(self.ids))
+        if allowed is not None:
+            rows = rows[np.isin(self.ids, list(allowed))]
+        if rows.size == 0:
+            return []
+        similarity = self.vectors[rows] @ q
+        scores = similarity * SIMILARITY_WEIGHT + self._quality_bias(rows)
+        top = np.argsort(-scores, kind="stable")[:limit]
+        return [(int(self.ids[rows[i]]), float(similarity[i])) for i in top]
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        mode: str = "hybrid",
+        query_embedding=None,
+        tags=None,
+        status_in=None,
+        min_quality=None,
+    ) -> List[Dict]:
+        """
+        Same ranking and result shape as `do_search_impl`. Semantic modes need
+        `query_embedding`; without it (or without vectors) results are lexical.
+        """
+        allowed = self._allowed_ids(tags, status_in, min_quality)
+        if query_embedding is None or self.vectors is None:
+            mode = "lexical"
+        pool = limit if mode == "lexical" else max(limit * 3, 30)
+        lexical_hits = []
+        if mode != "vector":
+            lexical_hits = self.lexical.search(query, None)
+            if allowed is not None:
+                lexical_hits = [h for h in lexical_hits if h[0] in allowed]
+            lexical_hits = lexical_hits[:pool]
+
+        similarity, extras = {}, {}
+        if mode == "lexical":
+            order = [fid for fid, _ in lexical_hits]
+            extras = {
+                fid: {"lexical_score": round(s, 4), "score": round(s, 4)}
+                for fid, s in lexical_hits
+            }
+        else:
+            q = normalize(query_embedding)
+            vector_hits = self._vector_ranking(
+                q, limit if mode == "vector" else pool, allowed
+            )
+            similarity = dict(vector_hits)
+            if mode == "vector":
+                order = [fid for fid, _ in vector_hits]
+            else:
+                fused = reciprocal_rank_fusion(
+                    [[fid for fid, _ in vector_hits], [fid for fid, _ in lexical_hits]]
+                )[:limit]
+                order = [fid for fid, _ in fused]
+                for fid in order:
+                    row = None if fid in similarity else self._row_of(fid)
+                    if row is not None:
+                        # Lexical-only matches still get their semantic similarity
+                        similarity[fid] = float(self.vectors[row] @ q)
+                lexical_scores = dict(lexical_hits)
+                extras = {
+                    fid: {
+                        "lexical_score": round(lexical_scores[fid], 4)
+                        if fid in lexical_scores
+                        else None,
+                        "rrf_score": round(rrf, 6),
+                    }
+                    for fid, rrf in fused
+                }
+        return self._hydrate(order, similarity, extras)
+
+    def _hydrate(self, order: List[int], similarity: Dict, extras: Dict) -> List[Dict]:
+        if not order:
+            return []
+        rows = self.query(
+            f"""
+            SELECT id, name, description, tags, status, quality_score
+            FROM functions WHERE id IN ({", ".join("?" for _ in order)})
+            """,
+            order,
+        )
+        by_id = {r[0]: r for r in rows}
+        results = []
+        for fid in order:
+            r = by_id.get(fid)
+            if not r:
+                continue
+            sim = similarity.get(fid)
+            result = {
+                "id": r[0],
+                "name": r[1],
+                "description": r[2],
+                "tags": r[3] or [],
+                "status": r[4],
+                "similarity": round(sim, 4) if sim is not None else None,
+                "quality_score": r[5],
+                "score": round((sim or 0.0) * 0.7 + (r[5] / 100.0) * 0.3, 4),
+            }
+            result.update(extras.get(fid, {}))
+            results.append(result)
+        return results
+
+    def list_functions(
+        self, query: Optional[str] = None, tag: Optional[str] = None, limit: int = 100
+    ) -> List[Dict]:
+        """Same rows and order as `do_list_impl`."""
+        columns = "SELECT id, name, status, description, call_count, last_called_at, tags FROM functions"
+        rows, order, where, params = [], [], "", []
+        if tag:
+            where = " WHERE list_contains(tags, ?)"
+            params.append(tag)
+        elif query:
+            # BM25-ranked matches first, then the other substring matches
+            ranked = sorted(
+                self.lexical.search(query, None), key=lambda h: (-h[1], h[0])
+            )
+            order = [fid for fid, _ in ranked[:limit]]
+            if order:
+                rows = self.query(
+                    f"{columns} WHERE id IN ({', '.join('?' for _ in order)})", order
+                )
+                rank = {fid: i for i, fid in enumerate(order)}
+                rows.sort(key=lambda r: rank[r[0]])
+            where = " WHERE (name ILIKE ? OR description ILIKE ?)"
+            params.extend([f"%{query}%", f"%{query}%"])
+            if ranked:
+                where += " AND id NOT IN (SELECT unnest(?::INTEGER[]))"
+                params.append([fid for fid, _ in ranked])
+        if len(order) < limit:
+            rows += self.query(
+                f"{columns}{where} ORDER BY updated_at DESC, id DESC LIMIT ?",
+                params + [limit - len(order)],
+            )
+        return [
+            {
+                "id": r[0],
+                "name": r[1],
+                "status": r[2],
+                "description": r[3],
+                "call_count": r[4],
+                "last_called_at": r[5],
+                "tags": r[6] or [],
+            }
+            for r in rows
+        ]
+
+    def get_details(self, name: str) -> Dict:
+        """Same fields as `do_get_details_impl`."""
+        rows = self.query(
+            "SELECT id, name, status, description, tags, call_count, last_called_at, code, metadata FROM functions WHERE name = ?",
+            [name],
+        )
+        if not rows:
+            return {"error": f"Function '{name}' not found"}
+        row = rows[0]
+        return {
+            "id": row[0],
+            "name": row[1],
+            "status": row[2],
+            "description": row[3],
+            "tags": row[4] or [],
+            "call_count": row[5],
+            "last_called_at": row[6],
+            "code": row[7],
+            "metadata": json.loads(row[8]) if row[8] else {},
+        }
+
+    def tag_counts(self, limit: int = 50) -> Dict[str, int]:
+        rows = self.query(
+            """
+            SELECT tag, count(*) AS n FROM (SELECT unnest(tags) AS tag FROM functions)
+            GROUP BY tag ORDER BY n DESC, tag LIMIT ?
+            """,
+            [limit],
+        )
+        return dict(rows)
+
+
+class SnapshotReader:
+    """
+    Proxy / dashboard side: opens the newest published version and swaps to
+    a newer one when `CURRENT` changes. Checking costs one stat() per read.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self._root = root
+        self._lock = threading.Lock()
+        self._current: Optional[Snapshot] = None
+        self._stamp = None
+        self.swap_count = 0
+
+    @property
+    def root(self) -> Path:
+        return self._root or snapshot_root()
+
+    def current(self) -> Optional[Snapshot]:
+        """The newest snapshot, or None if nothing was published yet."""
+        current = self.root / "CURRENT"
+        try:
+            st = current.stat()
+            stamp = (str(current), st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+        if stamp == self._stamp:
+            return self._current
+        with self._lock:
+            if stamp != self._stamp:
+                manifest = read_manifest(self.root)
+                if manifest is None:
+                    return self._current
+                if (
+                    self._current is None
+                    or manifest["version"] != self._current.version
+                ):
+                    try:
+                        self._current = Snapshot(
+                            self.root, manifest, previous=self._current
+                        )
+                    except Exception as e:
+                        # Pruned or half-written underneath us; keep the old one
+                        logger.warning(f"ReadSnapshot: Cannot open version: {e}")
+                        return self._current
+                    self.swap_count += 1
+                    logger.info(
+                        f"ReadSnapshot: Swapped to version {self._current.version}."
+                    )
+                self._stamp = stamp
+            return self._current
+
+    def serve(
+        self,
+        tool_name: str,
+        arguments: Dict,
+        last_write: Optional[Dict] = None,
+        embed: Optional[Callable[[str], Optional[List[float]]]] = None,
+    ):
+        """
+        Answers a read tool from the snapshot, or returns None when it has to
+        go to the Master: no snapshot, one that does not cover `last_write`
+        (see `Snapshot.covers`), or a tool/filter the snapshot can't answer.
+        Semantic searches get their query vector from `embed`.
+        """
+        snapshot = self.current()
+        if snapshot is None or not snapshot.covers(last_write):
+            return None
+        args = dict(arguments)
+        if tool_name == "list_functions":
+            return snapshot.list_functions(**args)
+        if tool_name == "get_function_details":
+            return snapshot.get_details(**args)
+        if tool_name == "get_tag_counts":
+            return snapshot.tag_counts(**args)
+        if tool_name == "search_functions":
+            if args.pop("dependencies_available", None):
+                return None  # Needs this process' import environment checked
+            mode = args.get("mode", "hybrid")
+            if mode != "lexical":
+                if snapshot.vectors is None or embed is None:
+                    return None
+                query_embedding = embed(args["query"])
+                if query_embedding is None:
+                    return None
+                args["query_embedding"] = query_embedding
+            return snapshot.search(**args)
+        return None
+
+
+# Singleton Instances
+snapshot_publisher = SnapshotPublisher()
+read_snapshot = SnapshotReader()
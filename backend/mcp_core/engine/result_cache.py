@@ -0,0 +1,120 @@
+import copy
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from mcp_core.core import config
+
+logger = logging.getLogger(__name__)
+
+
+class StoreGeneration:
+    """
+    Store-wide change counter. Every writer that can change search results
+    (save, background maintenance, delete, sync pull, a dependency re-check
+    that flipped what is importable) bumps it after commit and after updating
+    the in-memory indexes, so anything keyed by the generation can never be
+    served stale.
+
+    Values restart at 0 with the process; `session` tells processes that
+    compare generations which Master they came from.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+        self.session = uuid.uuid4().hex
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def bump(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+class SearchResultCache:
+    """
+    Bounded LRU of search results keyed by
+    (db_path, generation, normalized query, limit, mode, filters).
+    Entries of older generations are never hit again and age out of the LRU.
+    """
+
+    def __init__(self, generation: StoreGeneration, max_size: int = 256):
+        self._generation = generation
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.max_size = max_size
+        self.hit_count = 0
+        self.miss_count = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        # Whitespace only: case can change the embedding, so it stays part of the key
+        return " ".join((query or "").split())
+
+    def make_key(
+        self,
+        query: str,
+        limit: int,
+        mode: str,
+        filters: Optional[Dict] = None,
+        generation: Optional[int] = None,
+    ) -> Hashable:
+        """
+        Builds the cache key. Capture it *before* running the search so a write
+        that lands mid-query leaves the result under the old generation.
+        """
+        return (
+            str(config.DB_PATH),
+            self._generation.value if generation is None else generation,
+            self.normalize_query(query),
+            limit,
+            mode,
+            json.dumps(filters, sort_keys=True) if filters else None,
+        )
+
+    def get(self, key: Hashable):
+        """Returns a copy of the cached results, or None on a miss."""
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self.miss_count += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hit_count += 1
+        return copy.deepcopy(results)
+
+    def put(self, key: Hashable, results):
+        if self.max_size <= 0 or key[1] != self._generation.value:
+            return  # Disabled, or the store changed while the query ran
+        with self._lock:
+            self._entries[key] = copy.deepcopy(results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        total = self.hit_count + self.miss_count
+        return {
+            "generation": self._generation.value,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_count": self.hit_count,
+            "miss_count": self.miss_count,
+            "hit_rate": f"{(self.hit_count / total * 100) if total else 0:.2f}%",
+        }
+
+
+# Singleton Instances (Master process)
+store_generation = StoreGeneration()
+result_cache = SearchResultCache(store_generation, config.SEARCH_RESULT_CACHE_SIZE)
@@ -6,7 +6,15 @@ from pathlib import Path
 from typing import Dict, List, Optional
 
 from mcp_core.core import config
-from mcp_core.core.database import DBWriteLock, get_db_connection
+from mcp_core.core.database import (
+    db_connection,
+    hot_metadata_values,
+    set_function_tags,
+)
+from mcp_core.core.write_pipeline import write_pipeline
+from mcp_core.engine.lexical_index import lexical_index
+from mcp_core.engine.result_cache import store_generation
+from mcp_core.engine.vector_index import vector_index
 
 logger = logging.getLogger(__name__)
 
@@ -75,46 +83,63 @@ class GitHubSyncEngine:
             logger.warning("Sync: Pull failed (likely empty repository or conflict).")
             # Don't return, we try to parse what we have
 
-        count = 0
         if not self.functions_dir.exists():
             return 0
 
-        with DBWriteLock():
-            conn = get_db_connection()
+        # Parsed up front: the merge itself runs as one write on the DB writer
+        pulled = []
+        for json_file in self.functions_dir.glob("*.json"):
             try:
-                for json_file in self.functions_dir.glob("*.json"):
-                    try:
-                        with open(json_file, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-
-                        name = data.get("name")
-                        if not name:
-                            continue
-
-                        # If code or description changed, update
-                        res = conn.execute(
-                            "SELECT code, description FROM functions WHERE name = ?",
-                            (name,),
-                        ).fetchone()
-                        if (
-                            not res
-                            or res[0] != data.get("code")
-                            or res[1] != data.get("description")
-                        ):
-                            logger.info(f"Sync: Updating '{name}' (detected changes)")
-                            self._upsert_function(conn, data)
-                            count += 1
-                    except Exception as fe:
-                        logger.error(f"Sync: Failed to parse {json_file.name}: {fe}")
-                conn.commit()
-            finally:
-                conn.close()
+                with open(json_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as fe:
+                logger.error(f"Sync: Failed to parse {json_file.name}: {fe}")
+                continue
+            if data.get("name") and data.get("code"):
+                pulled.append(data)
+
+        def merge(conn) -> List:
+            updated = []  # (function_id, data) to re-index after commit
+            for data in pulled:
+                # If code or description changed, update
+                res = conn.execute(
+                    "SELECT code, description FROM functions WHERE name = ?",
+                    (data["name"],),
+                ).fetchone()
+                if (
+                    not res
+                    or res[0] != data.get("code")
+                    or res[1] != data.get("description")
+                ):
+                    logger.info(f"Sync: Updating '{data['name']}' (detected changes)")
+                    updated.append((self._upsert_function(conn, data), data))
+            return updated
+
+        updated = write_pipeline.execute(merge)
+        count = len(updated)
+
+        for fid, data in updated:
+            lexical_index.upsert(
+                fid,
+                data["name"],
+                data.get("description", ""),
+                data.get("tags", []),
+                data["code"],
+            )
+            vector_index.update_attributes(
+                fid,
+                quality_score=data.get("quality_score", 0),
+                tags=data.get("tags", []),
+                dependencies=data.get("dependencies", []),
+            )
+        if updated:
+            store_generation.bump()
 
         logger.info(f"Sync: Pull complete. Updated {count} functions.")
         return count
 
-    def _upsert_function(self, conn, data: Dict):
-        """Helper to upsert function data into DuckDB."""
+    def _upsert_function(self, conn, data: Dict) -> int:
+        """Helper to upsert function data into DuckDB. Returns the function id."""
         # This is a simplified version of logic.py's save.
         # In a real system, we'd share the same save logic.
         from datetime import datetime
@@ -126,7 +151,7 @@ class GitHubSyncEngine:
             "SELECT id FROM functions WHERE name = ?", (data["name"],)
         ).fetchone()
 
-        tags_json = json.dumps(data.get("tags", []))
+        tags = list(data.get("tags", []))
         metadata = {
             "dependencies": data.get("dependencies", []),
             "quality_score": data.get("quality_score", 0),
@@ -140,34 +165,41 @@ class GitHubSyncEngine:
                 """
                 UPDATE functions SET 
                     code = ?, description = ?, 
-                    tags = ?, metadata = ?, updated_at = ?
+                    tags = ?, metadata = ?, updated_at = ?,
+                    quality_score = ?, reliability_tier = ?, detected_imports_count = ?, last_verified_at = ?, dependencies = ?
                 WHERE id = ?
             """,
                 (
                     data["code"],
                     data.get("description", ""),
-                    tags_json,
+                    tags,
                     meta_json,
                     now,
+                    *hot_metadata_values(metadata),
                     fid,
                 ),
             )
         else:
-            conn.execute(
+            fid = conn.execute(
                 """
-                INSERT INTO functions (name, code, description, tags, metadata, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO functions (name, code, description, tags, metadata, created_at, updated_at,
+                    quality_score, reliability_tier, detected_imports_count, last_verified_at, dependencies)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING id
             """,
                 (
                     data["name"],
                     data["code"],
                     data.get("description", ""),
-                    tags_json,
+                    tags,
                     meta_json,
                     now,
                     now,
+                    *hot_metadata_values(metadata),
                 ),
-            )
+            ).fetchone()[0]
+        set_function_tags(conn, fid, tags)
+        return fid
 
     def push(self, name: str) -> bool:
         """Export a local function to the Hub cache and push."""
@@ -175,7 +207,7 @@ class GitHubSyncEngine:
             return False
 
         logger.info(f"Sync: Pushing '{name}' to Hub...")
-        conn = get_db_connection(read_only=False)
+        conn = db_connection(read_only=False)
         try:
             if not self._export_to_cache(conn, name):
                 logger.error(f"Sync: Function '{name}' not found locally.")
@@ -211,7 +243,7 @@ class GitHubSyncEngine:
             return False
 
         logger.info("Sync: Publishing all local functions to Hub...")
-        conn = get_db_connection(read_only=False)
+        conn = db_connection(read_only=False)
         try:
             rows = conn.execute(
                 "SELECT name FROM functions WHERE status != 'deleted'"
@@ -245,7 +277,7 @@ class GitHubSyncEngine:
             "name": row[0],
             "code": row[1],
             "description": row[2],
-            "tags": json.loads(row[3]) if row[3] else [],
+            "tags": row[3] or [],
             "test_cases": json.loads(row[5]) if row[5] else [],
             "dependencies": meta.get("dependencies", []),
             "quality_score": meta.get("quality_score", 0),
@@ -2,7 +2,7 @@ import json
 import logging
 from typing import Dict, List, Optional
 
-from mcp_core.core.database import get_db_connection
+from mcp_core.core.database import db_connection
 
 logger = logging.getLogger(__name__)
 
@@ -12,14 +12,13 @@ class TriageEngine:
 
     def get_broken_functions(self, limit: int = 5) -> List[Dict]:
         """Returns a list of functions that have low quality scores or failed status."""
-        conn = get_db_connection(read_only=False)
+        conn = db_connection(read_only=False)
         try:
             # We look for functions that:
             # 1. Have a status of 'failed'
             # 2. Or have a quality_score < 70
             # 3. And are not 'deleted'
-            # Extract quality_score from metadata JSON column
-            query = "SELECT name, status, CAST(json_extract(metadata, '$.quality_score') AS INTEGER) as qs, description FROM functions WHERE qs < 70 AND status != 'deleted' ORDER BY qs ASC LIMIT ?"
+            query = "SELECT name, status, quality_score, description FROM functions WHERE quality_score < 70 AND status != 'deleted' ORDER BY quality_score ASC LIMIT ?"
             rows = conn.execute(query, (limit,)).fetchall()
 
             results = []
@@ -38,10 +37,9 @@ class TriageEngine:
 
     def get_diagnostic_report(self, name: str) -> Optional[Dict]:
         """Fetches detailed error logs and metadata for a specific function with actionable advice."""
-        conn = get_db_connection(read_only=False)
+        conn = db_connection(read_only=False)
         try:
-            # Extract quality_score from metadata JSON column
-            query = "SELECT code, status, CAST(json_extract(metadata, '$.quality_score') AS INTEGER) as qs, metadata FROM functions WHERE name = ?"
+            query = "SELECT code, status, quality_score, metadata FROM functions WHERE name = ?"
             row = conn.execute(query, (name,)).fetchone()
 
             if not row:
@@ -0,0 +1,646 @@
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from mcp_core.core import config
+from mcp_core.core.database import get_db_connection
+from mcp_core.engine.embedding import embedding_service, normalize
+from mcp_core.engine.quantization import (
+    SpillMatrix,
+    fit_int8,
+    int8_dot,
+    quantize_int8,
+)
+from mcp_core.engine.result_cache import store_generation
+from mcp_core.runtime.environment import env_manager
+
+logger = logging.getLogger(__name__)
+
+# Ranking blend shared with the original SQL ranking:
+# score = similarity * 0.7 + (quality_score / 100) * 0.3
+SIMILARITY_WEIGHT = 0.7
+QUALITY_WEIGHT = 0.3
+DEFAULT_QUALITY = 50
+# Status of rows upserted without one (matches no `status_in` filter)
+UNKNOWN_STATUS = "unknown"
+# int8 mode: smallest first-pass candidate set that is re-ranked exactly
+RERANK_MIN_CANDIDATES = 40
+# int8 mode: the quantizer is refit (every code re-encoded) once upserts clipped
+# this share of the rows, or added this share on top of the fitted ones
+REFIT_CLIP_RATE = 0.01
+REFIT_GROWTH = 0.25
+REFIT_MIN_ADDED = 256
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best scores, best first (stable on ties)."""
+    m = scores.shape[0]
+    k = min(k, m)
+    if k < m:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(m)
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _json_list(value) -> List[str]:
+    if not value:
+        return []
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return [str(v) for v in parsed] if isinstance(parsed, list) else []
+
+
+class VectorIndex:
+    """
+    Resident vector index for semantic search in the Master process.
+    Vectors are normalized once on insert and kept in a contiguous float32
+    matrix, so a query is a single matmul followed by an argpartition top-k.
+    The index is built once from the `embeddings` table and then updated in
+    place by the writers (save maintenance / delete).
+
+    With `quantization="int8"` only per-dimension int8 codes stay resident
+    (4x smaller). They drive a first-pass scan and the top candidates are
+    re-ranked with the exact float vectors, kept in a memory-mapped spill
+    file next to the DB so only the touched rows occupy memory.
+
+    Each row also carries its status, tags and whether its dependencies are
+    importable, as per-row arrays and per-tag masks. Search filters are
+    turned into a row mask before scoring, so only matching rows are scanned.
+    """
+
+    def __init__(self, initial_capacity: int = 1024, quantization: str = None):
+        self._lock = threading.RLock()
+        self._initial_capacity = initial_capacity
+        self.quantization = quantization or config.VECTOR_QUANTIZATION
+        self._quantized = self.quantization == "int8"
+        self._source: Optional[Tuple[str, str]] = None  # (db_path, model_name)
+        self._observers = []  # secondary indexes kept in sync (e.g. ANN)
+        self._exact: Optional[SpillMatrix] = None  # int8 mode: exact vectors
+        self._deps_cache: Dict[Tuple[str, ...], bool] = {}
+        self._deps_checked_at = time.monotonic()
+        self.refit_count = 0
+        self._reset(0)
+
+    def _reset(self, dim: int):
+        self._dim = dim
+        self._size = 0
+        self._vectors = np.zeros((self._initial_capacity, dim), dtype=self._dtype)
+        self._scale, self._offset = fit_int8(np.zeros((0, dim), dtype=np.float32))
+        self._fitted_rows = 0
+        self._added_since_fit = 0
+        self._clipped_since_fit = 0
+        if self._exact is not None:
+            self._exact.close()
+            self._exact = None
+        if self._quantized and dim:
+            self._exact = SpillMatrix(
+                dim, self._initial_capacity, str(Path(config.DB_PATH).parent)
+            )
+        self._quality_bias = np.zeros(self._initial_capacity, dtype=np.float32)
+        self._quality = np.zeros(self._initial_capacity, dtype=np.int32)
+        self._ids = np.zeros(self._initial_capacity, dtype=np.int64)
+        self._row_of = {}  # {function_id: row}
+        # Filter attributes
+        self._status = np.zeros(self._initial_capacity, dtype=np.int8)
+        self._status_codes: Dict[str, int] = {}
+        self._deps_ok = np.ones(self._initial_capacity, dtype=bool)
+        self._tag_masks: Dict[str, np.ndarray] = {}  # {tag: bool per row}
+        self._tag_counts: Dict[str, int] = {}
+        self._tags_of: Dict[int, Tuple[str, ...]] = {}  # {function_id: tags}
+        self._deps_of: Dict[int, Tuple[str, ...]] = {}  # {function_id: deps}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def _dtype(self):
+        return np.int8 if self._quantized else np.float32
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the stored vectors (codes) in bytes."""
+        return self._size * self._dim * np.dtype(self._dtype).itemsize
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self._quantized:
+            return quantize_int8(vectors, self._scale, self._offset)
+        return vectors
+
+    def subscribe(self, observer):
+        """
+        Registers a secondary index. It receives `vector_upserted(fid, vector)`
+        and `vector_removed(fid)` for every in-place change.
+        """
+        self._observers.append(observer)
+
+    @property
+    def source(self) -> Optional[Tuple[str, str]]:
+        return self._source
+
+    @staticmethod
+    def _current_source() -> Tuple[str, str]:
+        return (str(config.DB_PATH), embedding_service.model_name)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._source is not None and self._source == self._current_source()
+
+    def invalidate(self):
+        """Drops the resident data; the next search rebuilds it from the DB."""
+        with self._lock:
+            self._source = None
+            self._reset(0)
+
+    def ensure_loaded(self):
+        """Builds the index if it has not been built for the current DB/model."""
+        if self.is_loaded:
+            return
+        with self._lock:
+            if self.is_loaded:
+                return
+            self.load()
+
+    def load(self):
+        """Full build from the `embeddings` table (used once per DB/model)."""
+        source = self._current_source()
+        dim = embedding_service.get_model_info()["dimension"]
+        conn = get_db_connection()
+        try:
+            res = conn.execute(
+                """
+                SELECT f.id, e.vector,
+                       COALESCE(f.quality_score, ?) as qs,
+                       f.status, COALESCE(f.tags, []) as tags,
+                       COALESCE(f.dependencies, []) as deps,
+                       json_extract(f.metadata, '$.detected_imports') as imports
+                FROM functions f
+                JOIN embeddings e ON f.id = e.function_id
+                WHERE f.status != 'deleted' AND e.model_name = ? AND len(e.vector) = ?
+                QUALIFY row_number() OVER (PARTITION BY f.id ORDER BY e.id DESC) = 1
+            """,
+                (DEFAULT_QUALITY, source[1], dim),
+            ).fetchnumpy()
+        finally:
+            conn.close()
+
+        ids = np.asarray(res["id"], dtype=np.int64)
+        n = len(ids)
+        if n:
+            # Fixed-width FLOAT[dim] rows arrive as equal-length arrays
+            vectors = np.stack(res["vector"]).astype(np.float32, copy=False)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors = vectors / norms
+            quality = np.asarray(res["qs"], dtype=np.int32)
+
+        with self._lock:
+            self._reset(dim)
+            self._grow(n)
+            if n:
+                if self._quantized:
+                    self._scale, self._offset = fit_int8(vectors)
+                    self._fitted_rows = n
+                    self._exact.data[:n] = vectors
+                self._vectors[:n] = self._encode(vectors)
+                self._quality[:n] = quality
+                self._quality_bias[:n] = (quality / 100.0) * QUALITY_WEIGHT
+                self._ids[:n] = ids
+                self._row_of = {fid: row for row, fid in enumerate(ids.tolist())}
+                self._size = n
+                for row, fid in enumerate(ids.tolist()):
+                    self._set_attributes(
+                        row,
+                        fid,
+                        status=res["status"][row],
+                        tags=list(res["tags"][row]),
+                        dependencies=list(res["deps"][row])
+                        + _json_list(res["imports"][row]),
+                    )
+            self._source = source
+        logger.info(
+            f"VectorIndex: Built with {self._size} vectors (dim={dim}, "
+            f"{self.quantization}, {self.nbytes / 1e6:.1f} MB)."
+        )
+
+    def _grow(self, needed: int):
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, self._initial_capacity)
+        vectors = np.zeros((new_capacity, self._dim), dtype=self._dtype)
+        vectors[: self._size] = self._vectors[: self._size]
+        self._vectors = vectors
+        if self._exact is not None:
+            self._exact.resize(new_capacity)
+        for attr, dtype in (
+            ("_quality_bias", np.float32),
+            ("_quality", np.int32),
+            ("_ids", np.int64),
+            ("_status", np.int8),
+            ("_deps_ok", bool),
+        ):
+            arr = np.zeros(new_capacity, dtype=dtype)
+            arr[: self._size] = getattr(self, attr)[: self._size]
+            setattr(self, attr, arr)
+        for tag, mask in self._tag_masks.items():
+            grown = np.zeros(new_capacity, dtype=bool)
+            grown[: self._size] = mask[: self._size]
+            self._tag_masks[tag] = grown
+
+    def _deps_available(self, key: Tuple[str, ...]) -> bool:
+        if key not in self._deps_cache:
+            self._deps_cache[key] = env_manager.are_deps_available(list(key))
+        return self._deps_cache[key]
+
+    def refresh_dependencies(self):
+        """
+        Re-checks which rows have importable dependencies. Filtered searches
+        start it in the background once `DEPS_CHECK_TTL` passed; call it after
+        changing the environment. The imports run outside the index lock.
+        """
+        with self._lock:
+            self._deps_checked_at = time.monotonic()
+            keys = set(self._deps_of.values())
+        available = {key: env_manager.are_deps_available(list(key)) for key in keys}
+        changed = False
+        with self._lock:
+            self._deps_cache = available
+            for function_id, key in self._deps_of.items():
+                if key not in available:
+                    continue  # Upserted meanwhile, so checked just now
+                row = self._row_of[function_id]
+                if self._deps_ok[row] != available[key]:
+                    self._deps_ok[row] = available[key]
+                    changed = True
+        if changed:
+            # Cached `dependencies_available` results no longer hold
+            store_generation.bump()
+
+    def _refresh_dependencies_in_background(self):
+        def run():
+            try:
+                self.refresh_dependencies()
+            except Exception as e:
+                logger.error(f"VectorIndex: Dependency re-check failed: {e}")
+
+        threading.Thread(target=run, daemon=True, name="deps-recheck").start()
+
+    def _set_tag_bits(self, row: int, tags: Iterable[str], value: bool):
+        for tag in tags:
+            if value:
+                if tag not in self._tag_masks:
+                    self._tag_masks[tag] = np.zeros(self._ids.shape[0], dtype=bool)
+                    self._tag_counts[tag] = 0
+                self._tag_masks[tag][row] = True
+                self._tag_counts[tag] += 1
+            else:
+                self._tag_masks[tag][row] = False
+                self._tag_counts[tag] -= 1
+                if self._tag_counts[tag] == 0:
+                    del self._tag_masks[tag], self._tag_counts[tag]
+
+    def _set_attributes(
+        self, row, function_id, status=None, tags=None, dependencies=None
+    ):
+        """Updates the filter attributes of one row; None keeps the current value."""
+        if status is not None:
+            code = self._status_codes.setdefault(status, len(self._status_codes))
+            self._status[row] = code
+        if tags is not None:
+            tags = tuple(dict.fromkeys(tags))
+            self._set_tag_bits(row, self._tags_of.get(function_id, ()), False)
+            self._set_tag_bits(row, tags, True)
+            self._tags_of[function_id] = tags
+        if dependencies is not None:
+            key = tuple(sorted(set(dependencies)))
+            if key:
+                self._deps_of[function_id] = key
+            else:
+                self._deps_of.pop(function_id, None)
+            self._deps_ok[row] = self._deps_available(key)
+
+    def _put(self, function_id: int, vector: np.ndarray, quality_score, **attributes):
+        qs = DEFAULT_QUALITY if quality_score is None else int(quality_score)
+        row = self._row_of.get(function_id)
+        if row is None:
+            self._grow(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._row_of[function_id] = row
+            self._ids[row] = function_id
+            self._status[row] = self._status_codes.setdefault(
+                UNKNOWN_STATUS, len(self._status_codes)
+            )
+            self._deps_ok[row] = True
+        self._vectors[row] = self._encode(vector)
+        if self._exact is not None:
+            self._exact.data[row] = vector
+            self._added_since_fit += 1
+            half_step = self._scale / 2
+            if np.any(vector < self._offset - half_step) or np.any(
+                vector > self._offset + 255 * self._scale + half_step
+            ):
+                self._clipped_since_fit += 1
+        self._quality[row] = qs
+        self._quality_bias[row] = (qs / 100.0) * QUALITY_WEIGHT
+        self._set_attributes(row, function_id, **attributes)
+
+    def upsert(
+        self,
+        function_id: int,
+        vector,
+        quality_score=None,
+        status: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        dependencies: Optional[List[str]] = None,
+    ):
+        """
+        Inserts or replaces the vector of one function in place, together
+        with its filter attributes (None keeps the current value).
+        """
+        with self._lock:
+            if not self.is_loaded:
+                # Not built yet: the first search will read the committed row.
+                return
+            v = normalize(vector)
+            if v.shape[0] != self._dim:
+                logger.warning(
+                    f"VectorIndex: Dimension mismatch for id={function_id} "
+                    f"({v.shape[0]} != {self._dim}). Skipping."
+                )
+                return
+            self._put(
+                function_id,
+                v,
+                quality_score,
+                status=status,
+                tags=tags,
+                dependencies=dependencies,
+            )
+            for observer in self._observers:
+                observer.vector_upserted(function_id, v)
+            if self._exact is not None and (
+                self._clipped_since_fit > REFIT_CLIP_RATE * self._size
+                or self._added_since_fit
+                >= max(REFIT_MIN_ADDED, REFIT_GROWTH * self._fitted_rows)
+            ):
+                self._refit()
+
+    def _refit(self):
+        """Fits the int8 scale/offset to the stored vectors again. Caller holds lock."""
+        n = self._size
+        vectors = np.asarray(self._exact.data[:n])
+        self._scale, self._offset = fit_int8(vectors)
+        self._vectors[:n] = self._encode(vectors)
+        logger.info(
+            f"VectorIndex: Refit int8 quantizer on {n} vectors "
+            f"({self._clipped_since_fit} of {self._added_since_fit} added were clipped)."
+        )
+        self._fitted_rows = n
+        self._added_since_fit = 0
+        self._clipped_since_fit = 0
+        self.refit_count += 1
+
+    def update_attributes(
+        self,
+        function_id: int,
+        quality_score=None,
+        status: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        dependencies: Optional[List[str]] = None,
+    ):
+        """Updates status/quality/tags/dependencies of an indexed function."""
+        if status == "deleted":
+            self.remove(function_id)
+            return
+        with self._lock:
+            row = self._row_of.get(function_id)
+            if row is None or not self.is_loaded:
+                return
+            if quality_score is not None:
+                self._quality[row] = int(quality_score)
+                self._quality_bias[row] = (int(quality_score) / 100.0) * QUALITY_WEIGHT
+            self._set_attributes(
+                row, function_id, status=status, tags=tags, dependencies=dependencies
+            )
+
+    def remove(self, function_id: int):
+        """Removes one function by moving the last row into its slot."""
+        with self._lock:
+            row = self._row_of.pop(function_id, None)
+            if row is None:
+                return
+            self._set_tag_bits(row, self._tags_of.pop(function_id, ()), False)
+            self._deps_of.pop(function_id, None)
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                moved_tags = self._tags_of.get(moved_id, ())
+                self._set_tag_bits(last, moved_tags, False)
+                self._set_tag_bits(row, moved_tags, True)
+                self._status[row] = self._status[last]
+                self._deps_ok[row] = self._deps_ok[last]
+                self._vectors[row] = self._vectors[last]
+                if self._exact is not None:
+                    self._exact.data[row] = self._exact.data[last]
+                self._quality[row] = self._quality[last]
+                self._quality_bias[row] = self._quality_bias[last]
+                self._ids[row] = moved_id
+                self._row_of[moved_id] = row
+            self._size = last
+            for observer in self._observers:
+                observer.vector_removed(function_id)
+
+    def export(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns copies of (function_ids, normalized vectors) for offline work."""
+        self.ensure_loaded()
+        with self._lock:
+            n = self._size
+            vectors = self._vectors if self._exact is None else self._exact.data
+            return self._ids[:n].copy(), np.array(vectors[:n], dtype=np.float32)
+
+    def _similarity(self, queries: np.ndarray, rows=None) -> np.ndarray:
+        """Stored rows (all if None) dotted with the queries. Caller holds lock."""
+        matrix = self._vectors[: self._size] if rows is None else self._vectors[rows]
+        if self._quantized:
+            return int8_dot(matrix, queries, self._scale, self._offset)
+        return matrix @ queries.T
+
+    def _first_pass_size(self, limit: int) -> int:
+        if not self._quantized:
+            return limit
+        return max(limit * config.QUANT_RERANK_FACTOR, RERANK_MIN_CANDIDATES)
+
+    def _rerank(self, q: np.ndarray, rows: np.ndarray, limit: int):
+        """
+        Re-scores int8 first-pass candidate rows with the exact float vectors.
+        Returns (rows, similarity) best first. Caller holds lock.
+        """
+        similarity = self._exact.data[rows] @ q
+        scores = similarity * SIMILARITY_WEIGHT + self._quality_bias[rows]
+        top = _top_k(scores, limit)
+        return rows[top], similarity[top]
+
+    def _filter_mask(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Row mask for the search filters (None = no filtering). Caller holds lock.
+        filters: tags (all must match), status_in, min_quality,
+        dependencies_available.
+        """
+        if not filters:
+            return None
+        n = self._size
+        mask = np.ones(n, dtype=bool)
+        for tag in filters.get("tags") or []:
+            tag_mask = self._tag_masks.get(tag)
+            if tag_mask is None:
+                return np.zeros(n, dtype=bool)
+            mask &= tag_mask[:n]
+        status_in = filters.get("status_in")
+        if status_in:
+            codes = [
+                self._status_codes[s] for s in status_in if s in self._status_codes
+            ]
+            mask &= np.isin(self._status[:n], codes)
+        min_quality = filters.get("min_quality")
+        if min_quality is not None:
+            mask &= self._quality[:n] >= min_quality
+        if filters.get("dependencies_available"):
+            if time.monotonic() - self._deps_checked_at > config.DEPS_CHECK_TTL:
+                # This search keeps the last answers; the next ones see the new
+                self._deps_checked_at = time.monotonic()
+                self._refresh_dependencies_in_background()
+            mask &= self._deps_ok[:n]
+        return mask
+
+    def filter_ids(
+        self, function_ids: Iterable[int], filters: Optional[Dict]
+    ) -> List[int]:
+        """Keeps the ids whose indexed attributes match the filters (order kept)."""
+        if not filters:
+            return list(function_ids)
+        self.ensure_loaded()
+        with self._lock:
+            mask = self._filter_mask(filters)
+            row_of = self._row_of
+            return [f for f in function_ids if f in row_of and mask[row_of[f]]]
+
+    def search(
+        self,
+        query_vector,
+        limit: int = 20,
+        candidate_ids: Optional[np.ndarray] = None,
+        filters: Optional[Dict] = None,
+    ) -> List[Tuple[int, float, int]]:
+        """
+        Returns [(function_id, similarity, quality_score)] ordered by the
+        blended score, best first. If `candidate_ids` is given (ANN pre-selection),
+        only those functions are scored. `filters` (see `_filter_mask`) restrict
+        the scan to matching rows before scoring.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            n = self._size
+            if n == 0 or limit <= 0:
+                return []
+            q = normalize(query_vector)
+            if q.shape[0] != self._dim:
+                logger.warning(
+                    f"VectorIndex: Query dimension {q.shape[0]} != index dimension {self._dim}."
+                )
+                return []
+
+            rows = None
+            if candidate_ids is not None:
+                row_of = self._row_of
+                rows = np.fromiter(
+                    (row_of[f] for f in candidate_ids if f in row_of), dtype=np.int64
+                )
+            mask = self._filter_mask(filters)
+            if mask is not None:
+                rows = np.flatnonzero(mask) if rows is None else rows[mask[rows]]
+            if rows is not None and rows.size == 0:
+                return []
+
+            bias = self._quality_bias[:n] if rows is None else self._quality_bias[rows]
+            similarity = self._similarity(q, rows)
+            scores = similarity * SIMILARITY_WEIGHT + bias
+
+            top = _top_k(scores, self._first_pass_size(limit))
+            hit_rows = top if rows is None else rows[top]
+            if self._quantized:
+                hit_rows, similarity = self._rerank(q, hit_rows, limit)
+            else:
+                similarity = similarity[top]
+            return self._hits(hit_rows, similarity)
+
+    def _hits(self, rows, similarity) -> List[Tuple[int, float, int]]:
+        return [
+            (int(self._ids[r]), float(sim), int(self._quality[r]))
+            for r, sim in zip(rows, similarity)
+        ]
+
+    def search_batch(
+        self, query_vectors, limit: int = 20, filters: Optional[Dict] = None
+    ) -> List[List[Tuple[int, float, int]]]:
+        """
+        Scores many queries in one (queries x store) matmul.
+        Returns one hit list per query, same shape as `search`.
+        """
+        self.ensure_loaded()
+        q = np.asarray(query_vectors, dtype=np.float32)
+        if q.ndim != 2 or q.shape[0] == 0:
+            return []
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        norms[~np.isfinite(norms) | (norms == 0)] = 1.0
+        q = q / norms
+
+        with self._lock:
+            n = self._size
+            if n == 0 or limit <= 0:
+                return [[] for _ in range(q.shape[0])]
+            if q.shape[1] != self._dim:
+                logger.warning(
+                    f"VectorIndex: Query dimension {q.shape[1]} != index dimension {self._dim}."
+                )
+                return [[] for _ in range(q.shape[0])]
+
+            mask = self._filter_mask(filters)
+            rows = None if mask is None else np.flatnonzero(mask)
+            if rows is not None and rows.size == 0:
+                return [[] for _ in range(q.shape[0])]
+            m = n if rows is None else rows.size
+
+            similarity = self._similarity(q, rows).T  # (queries, m)
+            bias = self._quality_bias[:n] if rows is None else self._quality_bias[rows]
+            scores = similarity * SIMILARITY_WEIGHT + bias
+
+            k = min(self._first_pass_size(limit), m)
+            if k < m:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.tile(np.arange(m), (q.shape[0], 1))
+            order = np.argsort(
+                -np.take_along_axis(scores, top, axis=1), axis=1, kind="stable"
+            )
+            top = np.take_along_axis(top, order, axis=1)
+
+            results = []
+            for i in range(q.shape[0]):
+                hit_rows = top[i] if rows is None else rows[top[i]]
+                if self._quantized:
+                    results.append(self._hits(*self._rerank(q[i], hit_rows, limit)))
+                else:
+                    results.append(self._hits(hit_rows, similarity[i, top[i]]))
+            return results
+
+
+# Singleton Instance (Master process)
+vector_index = VectorIndex()
@@ -15,14 +15,31 @@ root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
 if root not in sys.path:
     sys.path.insert(0, root)
 
-from mcp_core.core.config import HOST, PORT
+from mcp_core.core.config import (
+    CALL_COUNT_FLUSH_INTERVAL,
+    HOST,
+    PORT,
+    READ_SNAPSHOT_INTERVAL,
+)
+from mcp_core.core.database import connection_manager
+from mcp_core.core.write_pipeline import write_pipeline
+from mcp_core.engine.call_counter import call_counter
+from mcp_core.engine.embedding import embedding_service
 from mcp_core.engine.logic import (
     do_delete_impl,
     do_get_details_impl,
     do_list_impl,
+    do_list_page_impl,
+    do_reindex_impl,
     do_save_impl,
+    do_search_batch_impl,
     do_search_impl,
+    do_search_page_impl,
+    do_tag_counts_impl,
+    save_query_cache_snapshot,
+    start_query_cache_persistence,
 )
+from mcp_core.engine.read_snapshot import snapshot_publisher
 
 # Re-use coordinator port
 MASTER_PORT = PORT + 100
@@ -48,6 +65,9 @@ def idle_checker():
     while True:
         if time.time() - last_request_time > IDLE_TIMEOUT:
             logger.info(f"Idle for {IDLE_TIMEOUT}s. Shutting down Master process.")
+            # os._exit skips atexit handlers
+            save_query_cache_snapshot()
+            call_counter.flush()
             os._exit(0)
         time.sleep(60)
 
@@ -68,6 +88,12 @@ async def execute_tool(req: ToolRequest):
         elif req.tool == "search_functions":
             res = do_search_impl(**req.arguments)
             return {"result": res}
+        elif req.tool == "search_functions_batch":
+            res = do_search_batch_impl(**req.arguments)
+            return {"result": res}
+        elif req.tool == "search_functions_page":
+            res = do_search_page_impl(**req.arguments)
+            return {"result": res}
         elif req.tool == "get_function_details":
             res = do_get_details_impl(**req.arguments)
             return {"result": res}
@@ -77,6 +103,15 @@ async def execute_tool(req: ToolRequest):
         elif req.tool == "list_functions":
             res = do_list_impl(**req.arguments)
             return {"result": res}
+        elif req.tool == "list_functions_page":
+            res = do_list_page_impl(**req.arguments)
+            return {"result": res}
+        elif req.tool == "reindex_embeddings":
+            res = do_reindex_impl(**req.arguments)
+            return {"result": res}
+        elif req.tool == "get_tag_counts":
+            res = do_tag_counts_impl(**req.arguments)
+            return {"result": res}
         else:
             return {"error": f"Unknown tool: {req.tool}"}
     except Exception as e:
@@ -84,6 +119,17 @@ async def execute_tool(req: ToolRequest):
         return {"error": str(e)}
 
 
+@app.get("/health")
+def health_check():
+    return {"status": "healthy", "embedding_model": embedding_service.get_readiness()}
+
+
 if __name__ == "__main__":
     logger.info(f"Master starting on {HOST}:{MASTER_PORT}...")
+    embedding_service.start_warmup()
+    connection_manager.enable()
+    write_pipeline.enable()
+    call_counter.start(CALL_COUNT_FLUSH_INTERVAL)
+    snapshot_publisher.start(READ_SNAPSHOT_INTERVAL)
+    start_query_cache_persistence()
     uvicorn.run(app, host=HOST, port=MASTER_PORT, log_level="info")
@@ -60,10 +60,12 @@ class IPCManager:
             logger.error(f"IPCManager: Proxy call failed: {e}")
             return {"error": f"IPCManager: Communication error with Master: {e}"}
 
-    def start_master_loop(self, executor_func):
+    def start_master_loop(self, executor_func, response_meta=None):
         """
         Starts the Master listener loop in a background thread.
         executor_func: A function(tool_name, arguments) -> result
+        response_meta: Optional function() -> dict merged into every response,
+        evaluated after the tool ran.
         """
         if self.role != "MASTER" or not self.listener:
             logger.error("IPCManager: Cannot start Master loop without MASTER role.")
@@ -79,7 +81,7 @@ class IPCManager:
                     conn = self.listener.accept()
                     client_thread = threading.Thread(
                         target=self._handle_client,
-                        args=(conn, executor_func),
+                        args=(conn, executor_func, response_meta),
                         daemon=True,
                     )
                     client_thread.start()
@@ -91,7 +93,7 @@ class IPCManager:
         self.worker_thread = threading.Thread(target=run_loop, daemon=True)
         self.worker_thread.start()
 
-    def _handle_client(self, conn, executor_func):
+    def _handle_client(self, conn, executor_func, response_meta=None):
         """Handles a single Proxy client connection."""
         try:
             while True:
@@ -104,7 +106,10 @@ class IPCManager:
                     result = executor_func(tool, args)
 
                     # Return result
-                    conn.send({"result": result})
+                    response = {"result": result}
+                    if response_meta:
+                        response.update(response_meta())
+                    conn.send(response)
                 except (EOFError, ConnectionResetError):
                     break
                 except Exception as e:
@@ -28,10 +28,14 @@ class EnvManager:
     def __init__(self, root_dir: Path):
         self.root_dir = root_dir
 
-    def _are_deps_available(self, dependencies: List[str]) -> bool:
+    def are_deps_available(self, dependencies: List[str]) -> bool:
         """Check if all dependencies are available in the current environment."""
+        import importlib
         import importlib.util
 
+        # Packages installed since the last check are found too
+        importlib.invalidate_caches()
+
         for d in dependencies:
             name = (
                 d.split("==")[0]
@@ -52,7 +56,7 @@ class EnvManager:
         if not dependencies:
             return sys.executable, ""
 
-        if self._are_deps_available(dependencies):
+        if self.are_deps_available(dependencies):
             logger.debug(f"EnvManager: Dependencies {dependencies} met by inheritance.")
             return sys.executable, ""
 
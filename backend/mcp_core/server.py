@@ -1,21 +1,44 @@
-from typing import Dict, List
+import logging
+import time
+from typing import Dict, List, Optional
 
 from mcp.server.fastmcp import FastMCP
-from mcp_core.core.config import TRANSPORT
-from mcp_core.core.database import _check_model_version, init_db
+from mcp_core.core.config import (
+    CALL_COUNT_FLUSH_INTERVAL,
+    READ_SNAPSHOT_INTERVAL,
+    TRANSPORT,
+)
+from mcp_core.core.database import connection_manager, init_schema
+from mcp_core.core.migrations import startup_migrations
+from mcp_core.core.write_pipeline import write_pipeline
+from mcp_core.engine.call_counter import call_counter
+from mcp_core.engine.embedding import embedding_service
 from mcp_core.engine.logic import (
     do_delete_impl,
+    do_embed_query_impl,
     do_get_details_impl,
     do_get_impl,
     do_inject_impl,
     do_list_impl,
+    do_list_page_impl,
+    do_reindex_impl,
     do_save_impl,
+    do_search_batch_impl,
     do_search_impl,
+    do_search_page_impl,
+    do_search_recall_impl,
     do_smart_get_impl,
+    do_status_impl,
+    do_tag_counts_impl,
     do_triage_list_impl,
+    start_query_cache_persistence,
 )
+from mcp_core.engine.read_snapshot import read_snapshot, snapshot_publisher
+from mcp_core.engine.result_cache import store_generation
 from mcp_core.infra.ipc_manager import ipc_manager
 
+logger = logging.getLogger(__name__)
+
 # Initialize FastMCP
 mcp = FastMCP("function-store", dependencies=["duckdb", "fastembed"])
 
@@ -23,16 +46,23 @@ mcp = FastMCP("function-store", dependencies=["duckdb", "fastembed"])
 def _master_executor(tool_name: str, arguments: dict):
     """Execution logic for the Master process."""
     try:
+        startup_migrations.require(tool_name)
         if tool_name == "save_function":
             return do_save_impl(**arguments)
         elif tool_name == "search_functions":
             return do_search_impl(**arguments)
+        elif tool_name == "search_functions_batch":
+            return do_search_batch_impl(**arguments)
+        elif tool_name == "search_functions_page":
+            return do_search_page_impl(**arguments)
         elif tool_name == "get_function_details":
             return do_get_details_impl(**arguments)
         elif tool_name == "delete_function":
             return do_delete_impl(**arguments)
         elif tool_name == "list_functions":
             return do_list_impl(**arguments)
+        elif tool_name == "list_functions_page":
+            return do_list_page_impl(**arguments)
         elif tool_name == "get_function":
             return do_get_impl(**arguments)
         elif tool_name == "inject_local_package":
@@ -41,21 +71,67 @@ def _master_executor(tool_name: str, arguments: dict):
             return do_smart_get_impl(**arguments)
         elif tool_name == "get_triage_list":
             return do_triage_list_impl(**arguments)
+        elif tool_name == "check_search_recall":
+            return do_search_recall_impl(**arguments)
+        elif tool_name == "get_server_status":
+            return do_status_impl(**arguments)
+        elif tool_name == "reindex_embeddings":
+            return do_reindex_impl(**arguments)
+        elif tool_name == "get_tag_counts":
+            return do_tag_counts_impl(**arguments)
+        elif tool_name == "embed_query":
+            return do_embed_query_impl(**arguments)
         else:
             return f"Error: Unknown tool {tool_name}"
     except Exception as e:
         return f"Error: {str(e)}"
 
 
+# Proxy only: the store generation the Master returned for this process'
+# last write. Snapshots that don't cover it are not used, so a proxy always
+# reads its own writes.
+_last_write: Optional[Dict] = None
+_WRITE_TOOLS = {"save_function", "delete_function", "reindex_embeddings"}
+
+
+def _embed_via_master(query: str) -> Optional[List[float]]:
+    resp = ipc_manager.proxy_call("embed_query", {"query": query})
+    vector = resp.get("result") if isinstance(resp, dict) else None
+    return vector if isinstance(vector, list) else None
+
+
+def _response_meta() -> Dict:
+    # Read after the tool ran: covers every write it committed
+    return {"session": store_generation.session, "generation": store_generation.value}
+
+
 def _execute_proxied(tool_name: str, **kwargs):
     """Logic to decide if to execute locally or proxy via IPC."""
+    global _last_write
     if ipc_manager.role == "MASTER":
         return _master_executor(tool_name, kwargs)
-    else:
-        resp = ipc_manager.proxy_call(tool_name, kwargs)
-        if isinstance(resp, dict) and "error" in resp:
-            return resp["error"]
-        return resp.get("result")
+    if tool_name not in _WRITE_TOOLS:
+        try:
+            result = read_snapshot.serve(
+                tool_name, kwargs, last_write=_last_write, embed=_embed_via_master
+            )
+            if result is not None:
+                return result
+        except Exception as e:
+            logger.warning(f"Proxy: Snapshot read failed, asking the Master: {e}")
+    resp = ipc_manager.proxy_call(tool_name, kwargs)
+    if tool_name in _WRITE_TOOLS:
+        if isinstance(resp, dict) and "generation" in resp:
+            _last_write = {
+                "session": resp.get("session"),
+                "generation": resp["generation"],
+            }
+        else:
+            # The write may still have committed
+            _last_write = {"done_at": time.time()}
+    if isinstance(resp, dict) and "error" in resp:
+        return resp["error"]
+    return resp.get("result")
 
 
 # ----------------------------------------------------------------------
@@ -64,13 +140,108 @@ def _execute_proxied(tool_name: str, **kwargs):
 
 
 @mcp.tool()
-def search_functions(query: str, limit: int = 5) -> List[Dict]:
+def search_functions(
+    query: str,
+    limit: int = 5,
+    mode: str = "hybrid",
+    tags: Optional[List[str]] = None,
+    status_in: Optional[List[str]] = None,
+    min_quality: Optional[int] = None,
+    dependencies_available: Optional[bool] = None,
+) -> List[Dict]:
     """
     [EXPLORATION TOOL] Catalog search for reusable functions.
     Use this to 'browse' or 'explore' what logic exists before deciding to use it.
     For automated integration, use 'smart_search_and_get' instead.
+    mode: "hybrid" (default, semantic + keyword), "vector" or "lexical"
+    (exact identifiers like 'parse_iso_date', no embedding model needed).
+    Filters: tags (all required), status_in (e.g. ["verified"]), min_quality
+    (0-100), dependencies_available (only functions runnable without installs).
     """
-    return _execute_proxied("search_functions", query=query, limit=limit)
+    return _execute_proxied(
+        "search_functions",
+        query=query,
+        limit=limit,
+        mode=mode,
+        tags=tags,
+        status_in=status_in,
+        min_quality=min_quality,
+        dependencies_available=dependencies_available,
+    )
+
+
+@mcp.tool()
+def search_functions_batch(
+    queries: List[str],
+    limit: int = 5,
+    mode: str = "hybrid",
+    tags: Optional[List[str]] = None,
+    status_in: Optional[List[str]] = None,
+    min_quality: Optional[int] = None,
+    dependencies_available: Optional[bool] = None,
+) -> List[Dict]:
+    """
+    [EXPLORATION TOOL] Runs several related catalog searches in one call.
+    Prefer this over repeated 'search_functions' calls: all queries share one
+    embedding pass and one scoring pass. Returns [{"query", "results"}] in order.
+    Accepts the same filters as 'search_functions' (applied to every query).
+    """
+    return _execute_proxied(
+        "search_functions_batch",
+        queries=queries,
+        limit=limit,
+        mode=mode,
+        tags=tags,
+        status_in=status_in,
+        min_quality=min_quality,
+        dependencies_available=dependencies_available,
+    )
+
+
+@mcp.tool()
+def search_functions_page(
+    query: str,
+    limit: int = 20,
+    mode: str = "hybrid",
+    cursor: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    status_in: Optional[List[str]] = None,
+    min_quality: Optional[int] = None,
+    dependencies_available: Optional[bool] = None,
+) -> Dict:
+    """
+    [EXPLORATION TOOL] Paged version of 'search_functions'.
+    Returns {"items", "next_cursor"}; pass next_cursor back (with the same
+    query and filters) for the next page. next_cursor is null on the last page.
+    """
+    return _execute_proxied(
+        "search_functions_page",
+        query=query,
+        limit=limit,
+        mode=mode,
+        cursor=cursor,
+        tags=tags,
+        status_in=status_in,
+        min_quality=min_quality,
+        dependencies_available=dependencies_available,
+    )
+
+
+@mcp.tool()
+def list_functions_page(
+    query: Optional[str] = None,
+    tag: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Dict:
+    """
+    [EXPLORATION TOOL] Walks the whole catalogue page by page (newest first,
+    or by keyword relevance when `query` is given). Returns {"items",
+    "next_cursor"}; pass next_cursor back until it is null.
+    """
+    return _execute_proxied(
+        "list_functions_page", query=query, tag=tag, limit=limit, cursor=cursor
+    )
 
 
 @mcp.tool()
@@ -150,6 +321,15 @@ def smart_search_and_get(query: str, target_dir: str = "./") -> Dict:
     return _execute_proxied("smart_search_and_get", query=query, target_dir=target_dir)
 
 
+@mcp.tool()
+def get_tag_counts(limit: int = 50) -> Dict[str, int]:
+    """
+    Most used tags and how many functions carry each, most frequent first.
+    Pass a tag to 'list_functions_page' to browse its functions.
+    """
+    return _execute_proxied("get_tag_counts", limit=limit)
+
+
 @mcp.tool()
 def get_triage_list(limit: int = 5) -> List[Dict]:
     """
@@ -158,13 +338,55 @@ def get_triage_list(limit: int = 5) -> List[Dict]:
     return _execute_proxied("get_triage_list", limit=limit)
 
 
+@mcp.tool()
+def check_search_recall(k: int = 10, samples: int = 50) -> Dict:
+    """
+    [MAINTENANCE TOOL] Compares approximate (IVF) search against the exact scan.
+    Reports recall@k and average latency of both paths on the current store.
+    """
+    return _execute_proxied("check_search_recall", k=k, samples=samples)
+
+
+@mcp.tool()
+def get_server_status() -> Dict:
+    """
+    [MAINTENANCE TOOL] Embedding model readiness (loading/ready/failed, with
+    load time), startup migration progress with per-tool readiness, and cache
+    statistics. While the model loads or vectors migrate, searches return
+    keyword (lexical) results.
+    """
+    return _execute_proxied("get_server_status")
+
+
+@mcp.tool()
+def reindex_embeddings(workers: int = 0, batch_size: int = 64) -> Dict:
+    """
+    [MAINTENANCE TOOL] Re-embeds every stored function, e.g. after a model change
+    or a large hub pull. Texts are sharded across `workers` processes (0 = auto).
+    Runs in the background and returns at once; poll 'get_server_status'
+    ("reindex": state, done/total, then the number indexed and texts per second).
+    """
+    return _execute_proxied(
+        "reindex_embeddings", workers=workers, batch_size=batch_size
+    )
+
+
 def main():
     """Entry point for the mcp-core server."""
     role, _ = ipc_manager.determine_role()
     if role == "MASTER":
-        init_db()
-        _check_model_version()
-        ipc_manager.start_master_loop(_master_executor)
+        # Load the model while the DB initializes instead of on the first search
+        embedding_service.start_warmup()
+        # Tables exist from here on; migrations and re-embedding continue in
+        # the background while reads are already served
+        init_schema()
+        connection_manager.enable()
+        write_pipeline.enable()
+        startup_migrations.start()
+        call_counter.start(CALL_COUNT_FLUSH_INTERVAL)
+        snapshot_publisher.start(READ_SNAPSHOT_INTERVAL)
+        start_query_cache_persistence()
+        ipc_manager.start_master_loop(_master_executor, _response_meta)
 
     mcp.run(transport=TRANSPORT)
 
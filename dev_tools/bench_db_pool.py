@@ -0,0 +1,80 @@
+"""
+Benchmark: `get_function` (do_get_impl) latency with a fresh DuckDB connection
+per call vs the Master's pooled per-thread cursor.
+Builds a small store in a temporary DuckDB file.
+
+Usage: python dev_tools/bench_db_pool.py --n 2000 --calls 500
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.getcwd(), "backend"))
+
+from mcp_core.core import config
+from mcp_core.core.database import connection_manager, get_db_connection, init_db
+from mcp_core.engine.logic import do_get_impl
+
+
+def build_store(n: int):
+    init_db()
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            """
+            INSERT INTO functions (id, name, code, status, metadata)
+            SELECT i, 'f' || i, 'def f(): return ' || i, 'verified', '{}'
+            FROM range(1, ? + 1) t(i)
+        """,
+            (n,),
+        )
+    finally:
+        conn.close()
+
+
+def measure(n: int, calls: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    names = [f"f{i}" for i in rng.integers(1, n + 1, calls)]
+    do_get_impl(names[0])  # warm caches outside the timing
+    timings = []
+    for name in names:
+        start = time.perf_counter()
+        do_get_impl(name)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.asarray(timings)
+
+
+def report(label: str, ms: np.ndarray):
+    print(
+        f"{label:<22} p50 {np.percentile(ms, 50):7.3f} ms   "
+        f"p95 {np.percentile(ms, 95):7.3f} ms   mean {ms.mean():7.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_PATH = os.path.join(tmp, "bench.duckdb")
+        build_store(args.n)
+
+        print(f"get_function over {args.n} functions, {args.calls} calls")
+        report("connect per call", measure(args.n, args.calls))
+        connection_manager.enable()
+        try:
+            report("pooled cursor", measure(args.n, args.calls))
+        finally:
+            connection_manager.disable()
+
+
+if __name__ == "__main__":
+    main()
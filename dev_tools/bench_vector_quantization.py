@@ -0,0 +1,134 @@
+"""
+Benchmark: float32 resident vectors vs int8 codes + exact float re-rank.
+Builds a synthetic store in a temporary DuckDB file and reports recall@k,
+resident memory and per-query latency for each tier.
+
+Usage: python dev_tools/bench_vector_quantization.py --n 20000 --k 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.getcwd(), "backend"))
+
+from mcp_core.core import config
+from mcp_core.core.database import get_db_connection, init_db
+from mcp_core.engine.embedding import embedding_service
+from mcp_core.engine.quantization import int8_dot
+from mcp_core.engine.vector_index import VectorIndex
+
+
+def build_store(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Clustered synthetic embeddings (real ones are far from isotropic)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(
+        size=(n, dim)
+    ).astype(np.float32)
+
+    init_db()
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            """
+            INSERT INTO functions (id, name, code, status, metadata)
+            SELECT i, 'f' || i, '', 'verified', '{"quality_score": 50}'
+            FROM range(1, ? + 1) t(i)
+        """,
+            (n,),
+        )
+        for start in range(0, n, 2000):
+            chunk = vectors[start : start + 2000]
+            conn.execute(
+                f"""
+                INSERT INTO embeddings (function_id, vector, model_name, dimension)
+                SELECT unnest(?), unnest(?::VARCHAR::FLOAT[{dim}][]), ?, {dim}
+            """,
+                (
+                    list(range(start + 1, start + len(chunk) + 1)),
+                    # A JSON literal binds far faster than a nested Python list
+                    json.dumps(chunk.tolist()),
+                    embedding_service.model_name,
+                ),
+            )
+    finally:
+        conn.close()
+    return vectors
+
+
+def timed(fn, queries):
+    started = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - started) / len(queries) * 1000
+
+
+def recall(results, truth) -> float:
+    hit = sum(
+        len({h[0] for h in r} & {h[0] for h in t}) for r, t in zip(results, truth)
+    )
+    return hit / sum(len(t) for t in truth)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dim = embedding_service.get_model_info()["dimension"]
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_PATH = os.path.join(tmp, "bench.duckdb")
+        print(f"Building synthetic store: n={args.n}, dim={dim}")
+        vectors = build_store(args.n, dim, args.clusters, args.seed)
+
+        rng = np.random.default_rng(args.seed + 1)
+        picks = rng.choice(args.n, args.queries, replace=False)
+        queries = vectors[picks] + 0.3 * rng.normal(size=(args.queries, dim))
+
+        exact = VectorIndex(quantization="none")
+        quantized = VectorIndex(quantization="int8")
+        exact.load()
+        quantized.load()
+
+        truth, exact_ms = timed(lambda q: exact.search(q, args.k), queries)
+
+        def first_pass_only(q):
+            q = q / np.linalg.norm(q)
+            n = len(quantized)
+            sim = int8_dot(
+                quantized._vectors[:n], q, quantized._scale, quantized._offset
+            )
+            scores = sim * 0.7 + quantized._quality_bias[:n]
+            top = np.argsort(-scores)[: args.k]
+            return [(int(quantized._ids[i]),) for i in top]
+
+        approx, approx_ms = timed(first_pass_only, queries)
+        reranked, rerank_ms = timed(lambda q: quantized.search(q, args.k), queries)
+
+    k = args.k
+    print(f"\n{'tier':<24}{'recall@' + str(k):>10}{'memory MB':>12}{'ms/query':>10}")
+    print(
+        f"{'float32 exact':<24}{1.0:>10.4f}{exact.nbytes / 1e6:>12.1f}{exact_ms:>10.2f}"
+    )
+    print(
+        f"{'int8 first pass':<24}{recall(approx, truth):>10.4f}"
+        f"{quantized.nbytes / 1e6:>12.1f}{approx_ms:>10.2f}"
+    )
+    print(
+        f"{'int8 + float re-rank':<24}{recall(reranked, truth):>10.4f}"
+        f"{quantized.nbytes / 1e6:>12.1f}{rerank_ms:>10.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: `save_function` (do_save_impl) throughput from concurrent agents,
+each save committing its own transaction vs the Master's group-commit writer.
+Background maintenance is not run; only the save path is measured.
+
+Usage: python dev_tools/bench_write_pipeline.py --threads 16 --saves 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.getcwd(), "backend"))
+
+from mcp_core.core import config
+from mcp_core.core.database import connection_manager, init_db
+from mcp_core.core.write_pipeline import write_pipeline
+from mcp_core.engine import logic
+
+
+def storm(threads: int, saves: int, prefix: str) -> float:
+    def agent(t: int):
+        for i in range(saves):
+            name = f"{prefix}_{t}_{i}"
+            logic.do_save_impl(name, f"def {name}():\n    return {i}", "bench")
+
+    workers = [threading.Thread(target=agent, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return threads * saves / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--saves", type=int, default=50)
+    args = parser.parse_args()
+    logic.task_worker.add_task = lambda *a, **k: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_PATH = os.path.join(tmp, "bench.duckdb")
+        init_db()
+        connection_manager.enable()
+        print(f"{args.threads} agents x {args.saves} saves")
+        print(
+            f"{'commit per save':<18} {storm(args.threads, args.saves, 'a'):8.1f} saves/s"
+        )
+        write_pipeline.enable()
+        try:
+            rate = storm(args.threads, args.saves, "b")
+            stats = write_pipeline.get_stats()
+            print(
+                f"{'group commit':<18} {rate:8.1f} saves/s   "
+                f"(avg batch {stats['avg_batch']}, largest {stats['largest_batch']})"
+            )
+        finally:
+            write_pipeline.disable()
+            connection_manager.disable()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 import gc
 import os
+import threading
 
 import numpy as np
 import pytest
 from mcp_core.core import config as mcp_config
 from mcp_core.core.database import init_db
+from mcp_core.engine import logic
 from mcp_core.engine.embedding import embedding_service
+from mcp_core.engine.embedding_cache import embedding_cache
+
+# Captured at import, before setup_db_isolation makes Thread.start synchronous
+_real_thread_start = threading.Thread.start
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -29,12 +35,26 @@ def setup_db_isolation(monkeypatch, tmp_path):
     monkeypatch.setattr(mcp_config, "API_KEYS_DB_PATH", test_keys_path)
     # Disable features that are non-deterministic or slow in tests
     monkeypatch.setattr(mcp_config, "SYNC_ENABLED", False)
+    # Keep embedding and query caches out of the real data/models directory
+    cache_dir = tmp_path / "models"
+    cache_dir.mkdir()
+    monkeypatch.setattr(mcp_config, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(logic, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(embedding_cache, "_directory", None)
+    monkeypatch.setattr(embedding_cache, "_slabs", {})
+    monkeypatch.setattr(embedding_cache, "hit_count", 0)
+    monkeypatch.setattr(embedding_cache, "miss_count", 0)
     # 2. Mock Embedding Service to avoid slow model loading/downloading
     monkeypatch.setattr(
         embedding_service,
         "get_embedding",
         lambda text, **kwargs: np.zeros(768, dtype=np.float32),
     )
+    monkeypatch.setattr(
+        embedding_service,
+        "get_embeddings",
+        lambda texts, **kwargs: np.zeros((len(texts), 768), dtype=np.float32),
+    )
     monkeypatch.setattr(
         embedding_service,
         "get_model_info",
@@ -53,8 +73,6 @@ def setup_db_isolation(monkeypatch, tmp_path):
     )
 
     # 4. Force synchronous execution of background tasks in tests
-    import threading
-
     def mock_start(self):
         self._target(*self._args, **self._kwargs)
 
@@ -75,3 +93,9 @@ def setup_db_isolation(monkeypatch, tmp_path):
             os.unlink(wal)
     except OSError:
         pass
+
+
+@pytest.fixture
+def real_threads(setup_db_isolation, monkeypatch):
+    """Opt-in: restores real Thread.start for tests that need concurrency."""
+    monkeypatch.setattr(threading.Thread, "start", _real_thread_start)
@@ -0,0 +1,233 @@
+"""
+Local stand-in for the Gemini embedding REST API, for offline runs and tests.
+
+Serves `models/<model>:embedContent` and `:batchEmbedContents` with
+deterministic vectors (seeded by the text), and can inject 429/5xx errors.
+
+    python dev_tools/tests/fake_gemini_server.py --port 8765 --fail-rate 0.1
+    FS_MODEL_TYPE=gemini FS_GEMINI_API_KEY=fake \\
+        FS_GEMINI_BASE_URL=http://127.0.0.1:8765 python backend/mcp_core/server.py
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import numpy as np
+
+_ROUTE = re.compile(r"^/v1\w*/models/([^:]+):(embedContent|batchEmbedContents)$")
+
+
+def vector_for(text: str, dim: int = 1536) -> list:
+    """The vector the fake server returns for `text`."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32).tolist()
+
+
+class FakeGeminiServer:
+    """
+    Threaded HTTP server. `fail_next(n, status)` makes the next n requests fail;
+    `fail_rate` fails a random share; `max_per_second` answers 429 above that
+    rate. `requests` records (status, batch size) per request and
+    `max_in_flight` the highest concurrency seen.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        dim: int = 1536,
+        fail_rate: float = 0.0,
+        max_per_second: float = 0.0,
+        latency: float = 0.0,
+        max_batch: int = 100,
+    ):
+        self.dim = dim
+        self.fail_rate = fail_rate
+        self.max_per_second = max_per_second
+        self.latency = latency
+        self.max_batch = max_batch
+        self.requests = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._failures = []
+        self._recent = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def fail_next(self, count: int, status: int = 429):
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _injected_status(self) -> int:
+        with self._lock:
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            self._recent.append(now)
+            if self._failures:
+                return self._failures.pop(0)
+            if self.max_per_second and len(self._recent) > self.max_per_second:
+                return 429
+        if self.fail_rate and random.random() < self.fail_rate:
+            return 503
+        return 200
+
+    def _answer(self, method: str, body: dict):
+        if method == "embedContent":
+            texts = [body["content"]["parts"][0]["text"]]
+        else:
+            texts = [r["content"]["parts"][0]["text"] for r in body.get("requests", [])]
+            if len(texts) > self.max_batch:
+                return 400, {
+                    "error": {"code": 400, "message": "Too many requests in batch."}
+                }
+
+        status = self._injected_status()
+        with self._lock:
+            self.requests.append((status, len(texts)))
+        if status != 200:
+            return status, {"error": {"code": status, "message": "Injected failure."}}
+
+        vectors = [{"values": vector_for(t, self.dim)} for t in texts]
+        if method == "embedContent":
+            return 200, {"embedding": vectors[0]}
+        return 200, {"embeddings": vectors}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                route = _ROUTE.match(self.path.split("?")[0])
+                if not route:
+                    return self._reply(
+                        404, {"error": {"code": 404, "message": "Not found"}}
+                    )
+                if not (self.headers.get("x-goog-api-key") or "key=" in self.path):
+                    return self._reply(
+                        403, {"error": {"code": 403, "message": "No API key"}}
+                    )
+
+                with server._lock:
+                    server._in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server._in_flight)
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    if server.latency:
+                        time.sleep(server.latency)
+                    self._reply(*server._answer(route.group(2), body))
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+            def _reply(self, status: int, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class RestEmbedClient:
+    """
+    Minimal `genai.Client` stand-in (only `models.embed_content`) that talks to
+    the REST API over urllib, for environments without the google-genai SDK.
+    """
+
+    def __init__(self, base_url: str, api_key: str = "fake"):
+        self._base_url = base_url.rstrip("/")
+        self._api_key = api_key
+        self.models = self
+
+    def embed_content(self, model: str, contents, config=None):
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        task_type = (config or {}).get("task_type")
+        body = {
+            "requests": [
+                {
+                    "model": model,
+                    "content": {"parts": [{"text": t}]},
+                    "taskType": task_type,
+                }
+                for t in texts
+            ]
+        }
+        request = urllib.request.Request(
+            f"{self._base_url}/v1beta/{model}:batchEmbedContents",
+            data=json.dumps(body).encode("utf-8"),
+            headers={
+                "Content-Type": "application/json",
+                "x-goog-api-key": self._api_key,
+            },
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise FakeAPIError(e.code, e.read().decode("utf-8", "replace")) from e
+
+        return SimpleNamespace(
+            embeddings=[
+                SimpleNamespace(values=e["values"]) for e in payload["embeddings"]
+            ]
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fake Gemini embedding API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--max-per-second", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(
+        args.port, args.dim, args.fail_rate, args.max_per_second, args.latency
+    )
+    print(f"Fake Gemini API on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,60 @@
+import numpy as np
+from mcp_core.engine import logic
+from mcp_core.engine.embedding import embedding_service
+
+KEYWORDS = ["csv", "json", "date"]
+
+
+def _fake_embedding(text, **kwargs):
+    v = np.zeros(768, dtype=np.float32)
+    for i, kw in enumerate(KEYWORDS):
+        if kw in text.lower():
+            v[i] = 1.0
+    return v
+
+
+def _save(name, desc):
+    code = f"def {name}():\n    return 1"
+    assert "SUCCESS" in logic.do_save_impl(name, code, desc, skip_test=True)
+    logic.run_background_maintenance(name, code, desc, [], [], [], True)
+
+
+def test_batch_search_one_embedding_call(monkeypatch):
+    calls = []
+
+    def fake_batch(texts, **kwargs):
+        calls.append(list(texts))
+        return np.stack([_fake_embedding(t) for t in texts])
+
+    monkeypatch.setattr(embedding_service, "get_embedding", _fake_embedding)
+    monkeypatch.setattr(embedding_service, "get_embeddings", fake_batch)
+
+    _save("parse_csv_rows", "Parse CSV rows")
+    _save("load_json_file", "Load a JSON file")
+
+    out = logic.do_search_batch_impl(["csv reader", "json loader"], limit=1)
+
+    assert len(calls) == 1 and len(calls[0]) == 2
+    assert [o["query"] for o in out] == ["csv reader", "json loader"]
+    assert out[0]["results"][0]["name"] == "parse_csv_rows"
+    assert out[1]["results"][0]["name"] == "load_json_file"
+
+
+def test_batch_matches_single_search(monkeypatch):
+    monkeypatch.setattr(embedding_service, "get_embedding", _fake_embedding)
+    monkeypatch.setattr(
+        embedding_service,
+        "get_embeddings",
+        lambda texts, **kw: np.stack([_fake_embedding(t) for t in texts]),
+    )
+    _save("parse_date_str", "Parse a date string")
+    _save("dump_json_str", "Dump JSON to a string")
+
+    single = logic.do_search_impl("date parsing", limit=2)
+    batch = logic.do_search_batch_impl(["date parsing"], limit=2)[0]["results"]
+    assert [r["name"] for r in single] == [r["name"] for r in batch]
+    assert [r["score"] for r in single] == [r["score"] for r in batch]
+
+
+def test_batch_search_empty():
+    assert logic.do_search_batch_impl([]) == []
@@ -0,0 +1,113 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+from mcp_core.core.database import get_db_connection
+from mcp_core.engine import bulk_indexer, logic
+from mcp_core.engine.bulk_indexer import BulkIndexer, plan_workers
+from mcp_core.engine.embedding import EmbeddingUnavailable, FastEmbeddingService
+
+
+def test_plan_workers_never_oversubscribes():
+    cpus = os.cpu_count() or 1
+    for requested in (0, 1, 3, cpus * 4):
+        workers, threads = plan_workers(requested)
+        assert 1 <= workers <= cpus
+        assert workers * threads <= max(cpus, 1)
+
+
+def test_in_process_reindex_rewrites_every_vector(monkeypatch):
+    # No background maintenance racing the reindex with its own vectors
+    monkeypatch.setattr(logic.task_worker, "add_task", lambda *a, **k: None)
+    for i in range(5):
+        code = f"def fn_{i}(x):\n    return x + {i}"
+        assert "SUCCESS" in logic.do_save_impl(f"fn_{i}", code, "Add", skip_test=True)
+
+    def fake_embeddings(texts, is_query=False, batch_size=None):
+        return np.ones((len(texts), 768), dtype=np.float32)
+
+    monkeypatch.setattr(
+        bulk_indexer.embedding_service, "get_embeddings", fake_embeddings
+    )
+    progress = []
+    stats = BulkIndexer(workers=1, batch_size=2, progress=progress.append).run()
+
+    assert stats["indexed"] == 5 and stats["workers"] == 1
+    assert [p["indexed"] for p in progress] == [2, 4, 5]
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT function_id), MIN(vector[1]) FROM embeddings"
+        ).fetchone()
+    finally:
+        conn.close()
+    # One normalized row per function, no duplicates left behind
+    assert rows[0] == rows[1] == 5
+    assert abs(rows[2] - 1 / np.sqrt(768)) < 1e-6
+
+
+def test_failed_inference_writes_no_zero_vectors(monkeypatch):
+    monkeypatch.setattr(logic.task_worker, "add_task", lambda *a, **k: None)
+    for i in range(3):
+        code = f"def fn_{i}(x):\n    return x + {i}"
+        assert "SUCCESS" in logic.do_save_impl(f"fn_{i}", code, "Add", skip_test=True)
+
+    class BrokenModel:
+        def embed(self, texts, batch_size=None):
+            raise RuntimeError("ONNX session died")
+
+    service = FastEmbeddingService()
+    monkeypatch.setattr(FastEmbeddingService, "_client_instance", BrokenModel())
+    monkeypatch.setattr(service, "_initialized", True)
+    with pytest.raises(EmbeddingUnavailable, match="ONNX session died"):
+        service._embed("x", True)
+
+    monkeypatch.setattr(
+        bulk_indexer.embedding_service,
+        "get_embeddings",
+        lambda texts, is_query=False, batch_size=None: service._embed_batch(
+            texts, is_query, batch_size
+        ),
+    )
+    conn = get_db_connection()
+    try:
+        before = conn.execute("SELECT * FROM embeddings ORDER BY id").fetchall()
+        with pytest.raises(EmbeddingUnavailable):
+            BulkIndexer(workers=1, batch_size=2).run()
+        assert conn.execute("SELECT * FROM embeddings ORDER BY id").fetchall() == before
+    finally:
+        conn.close()
+
+
+def test_reindex_tool_runs_in_the_background(real_threads, monkeypatch):
+    monkeypatch.setattr(logic.task_worker, "add_task", lambda *a, **k: None)
+    for i in range(3):
+        code = f"def fn_{i}(x):\n    return x + {i}"
+        assert "SUCCESS" in logic.do_save_impl(f"fn_{i}", code, "Add", skip_test=True)
+
+    release = threading.Event()
+
+    def slow_embeddings(texts, is_query=False, batch_size=None):
+        release.wait(5)
+        return np.ones((len(texts), 768), dtype=np.float32)
+
+    monkeypatch.setattr(
+        bulk_indexer.embedding_service, "get_embeddings", slow_embeddings
+    )
+    job = bulk_indexer.ReindexJob()
+    monkeypatch.setattr(logic, "reindex_job", job)
+
+    started = logic.do_reindex_impl(workers=1, batch_size=2)
+    assert started["state"] == "running" and started["total"] == 3
+    assert logic.do_reindex_impl(workers=1)["started"] is False  # one at a time
+    assert logic.do_status_impl()["reindex"]["state"] == "running"
+
+    release.set()
+    for _ in range(500):
+        if job.get_status()["state"] != "running":
+            break
+        threading.Event().wait(0.01)
+    status = logic.do_status_impl()["reindex"]
+    assert status["state"] == "done" and status["done"] == 3
+    assert status["result"]["indexed"] == 3
@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+from mcp_core.core.database import get_db_connection
+from mcp_core.engine import call_counter, logic
+from mcp_core.engine.call_counter import CallCounter
+from mcp_core.engine.result_cache import store_generation
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    monkeypatch.setattr(logic.task_worker, "add_task", lambda *a, **k: None)
+    counter = CallCounter()
+    monkeypatch.setattr(logic, "call_counter", counter)
+    for name in ("add", "sub"):
+        code = f"def {name}(a, b):\n    return a"
+        assert "SUCCESS" in logic.do_save_impl(name, code, "d", skip_test=True)
+    return counter
+
+
+def _stored():
+    conn = get_db_connection()
+    try:
+        return dict(conn.execute("SELECT name, call_count FROM functions").fetchall())
+    finally:
+        conn.close()
+
+
+def test_calls_are_visible_before_they_are_flushed(counter):
+    for _ in range(3):
+        logic.do_get_impl("add")
+    logic.do_get_impl("sub")
+
+    assert _stored() == {"add": 0, "sub": 0}
+    assert logic.do_get_details_impl("add")["call_count"] == 3
+    listed = {r["name"]: r["call_count"] for r in logic.do_list_impl()}
+    assert listed == {"add": 3, "sub": 1}
+    assert logic.get_stats_impl()["total_calls"] == 4
+
+    assert counter.flush() == 4
+    assert _stored() == {"add": 3, "sub": 1}
+    assert logic.do_get_details_impl("add")["call_count"] == 3
+    assert logic.do_get_details_impl("add")["last_called_at"] is not None
+    assert counter.get_stats() == {
+        "pending_calls": 0,
+        "flushed_calls": 4,
+        "flushes": 1,
+    }
+
+
+def test_failed_flush_keeps_the_counts(counter, monkeypatch):
+    execute = call_counter.write_pipeline.execute
+    failing = [True]
+
+    def flaky(op, *args, timeout=None):
+        if failing[0]:
+            raise RuntimeError("database is locked")
+        return execute(op, *args, timeout=timeout)
+
+    monkeypatch.setattr(call_counter.write_pipeline, "execute", flaky)
+    logic.do_get_impl("add")
+    assert counter.flush() == 0
+    logic.do_get_impl("add")
+    assert counter.pending()["add"][0] == 2
+
+    failing[0] = False
+    assert counter.flush() == 2
+    assert _stored()["add"] == 2
+
+
+def test_deleted_function_drops_its_pending_calls(counter):
+    logic.do_get_impl("add")
+    assert logic.do_delete_impl("add").startswith("SUCCESS")
+    assert counter.pending() == {}
+
+
+def test_reads_during_a_slow_flush_count_each_call_once(
+    counter, real_threads, monkeypatch
+):
+    execute = call_counter.write_pipeline.execute
+    committed, release = threading.Event(), threading.Event()
+    seen = []
+
+    def read():
+        seen.append(
+            {
+                "details": logic.do_get_details_impl("add")["call_count"],
+                "listed": {r["name"]: r["call_count"] for r in logic.do_list_impl()},
+                "total": logic.get_stats_impl()["total_calls"],
+            }
+        )
+
+    def slow(op, *args, timeout=None):
+        read()  # Handed off to the flush, not yet written
+        result = execute(op, *args, timeout=timeout)
+        committed.set()
+        release.wait(5)  # Stored, but not yet cleared from the flush
+        return result
+
+    monkeypatch.setattr(call_counter.write_pipeline, "execute", slow)
+    logic.do_get_impl("add")
+    logic.do_get_impl("add")
+    generation = store_generation.value
+    flusher = threading.Thread(target=counter.flush)
+    flusher.start()
+    assert committed.wait(5)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    reader.join(5)
+    assert not reader.is_alive()  # Doesn't wait for the flush to finish
+    release.set()
+    flusher.join(5)
+    read()
+
+    assert seen == [{"details": 2, "listed": {"add": 2, "sub": 0}, "total": 2}] * 3
+    assert _stored()["add"] == 2
+    # Nothing searchable changed: cached search results stay valid
+    assert store_generation.value == generation
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+from mcp_core.core import config
+from mcp_core.core.database import connection_manager, db_connection, init_db
+from mcp_core.engine import logic
+
+
+@pytest.fixture
+def pooled():
+    connection_manager.enable()
+    yield connection_manager
+    connection_manager.disable()
+
+
+def test_thread_reuses_its_cursor_and_nested_leases_get_their_own(pooled):
+    first = db_connection()
+    cursor = first._cursor
+    first.close()
+
+    outer = db_connection()
+    assert outer._cursor is cursor
+    inner = db_connection()  # e.g. a helper called while `outer` is open
+    assert inner._cursor is not cursor
+    inner.close()
+    outer.close()
+    assert pooled.get_stats()["nested_leases"] == 1
+
+
+def test_open_transaction_is_rolled_back_on_close(pooled):
+    conn = db_connection()
+    conn.begin()
+    conn.execute("INSERT INTO config (key, value) VALUES ('leaked', 'x')")
+    conn.close()
+
+    conn = db_connection()
+    try:
+        assert conn.execute(
+            "SELECT count(*) FROM config WHERE key = 'leaked'"
+        ).fetchone() == (0,)
+    finally:
+        conn.close()
+
+
+def test_threads_get_separate_cursors(pooled, real_threads):
+    cursors = []
+
+    def worker():
+        conn = db_connection()
+        try:
+            conn.execute("SELECT count(*) FROM functions").fetchone()
+            cursors.append(conn._cursor)  # keeps it alive, so ids stay unique
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(c) for c in cursors}) == 4
+
+
+def test_reconnects_on_db_switch_and_failed_health_check(pooled, monkeypatch, tmp_path):
+    code = "def add(a, b):\n    return a + b"
+    assert "SUCCESS" in logic.do_save_impl("add", code, "Add", skip_test=True)
+    assert logic.do_get_impl("add") == code
+
+    # A dead root connection is detected once the cursor has been idle
+    pooled._root.close()
+    monkeypatch.setattr(pooled._local, "last_used", 0.0)
+    assert logic.do_get_details_impl("add")["call_count"] == 1
+
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "other.duckdb"))
+    init_db()
+    assert "not found" in logic.do_get_impl("add")
+    assert pooled.get_stats()["reconnects"] == 2
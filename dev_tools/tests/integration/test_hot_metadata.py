@@ -0,0 +1,67 @@
+import json
+
+from mcp_core.core.database import get_db_connection, init_db
+from mcp_core.engine import logic
+from mcp_core.engine.triage import triage_engine
+
+
+def _hot_columns(name):
+    conn = get_db_connection()
+    try:
+        return conn.execute(
+            """
+            SELECT quality_score, reliability_tier, detected_imports_count, last_verified_at
+            FROM functions WHERE name = ?
+            """,
+            (name,),
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def test_legacy_metadata_is_backfilled_into_columns():
+    meta = {
+        "quality_score": 42,
+        "reliability_tier": "low",
+        "detected_imports": ["json", "re"],
+        "last_verified_at": "2024-01-01T00:00:00",
+    }
+    conn = get_db_connection()
+    try:
+        conn.execute("DROP TABLE functions")
+        conn.execute("""
+            CREATE TABLE functions (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_function_id'),
+                name VARCHAR, code VARCHAR, description VARCHAR, tags VARCHAR,
+                metadata VARCHAR, status VARCHAR DEFAULT 'active', test_cases VARCHAR,
+                call_count INTEGER DEFAULT 0, last_called_at VARCHAR,
+                created_at VARCHAR, updated_at VARCHAR
+            )
+        """)
+        conn.execute(
+            "INSERT INTO functions (name, code, metadata, status) VALUES ('legacy_fn', 'pass', ?, 'verified')",
+            (json.dumps(meta),),
+        )
+    finally:
+        conn.close()
+
+    init_db()
+
+    assert _hot_columns("legacy_fn") == (42, "low", 2, "2024-01-01T00:00:00")
+    assert [r["name"] for r in triage_engine.get_broken_functions()] == ["legacy_fn"]
+
+
+def test_maintenance_keeps_columns_in_sync():
+    code = "import json\n\n\ndef dump_it(x):\n    return json.dumps(x)"
+    assert "SUCCESS" in logic.do_save_impl("dump_it", code, "Dump", skip_test=True)
+    qs, tier, imports, verified_at = _hot_columns("dump_it")
+    assert (qs, tier, imports) == (100, "pending", 0) and verified_at is not None
+
+    logic.run_background_maintenance("dump_it", code, "Dump", [], [], [], False)
+
+    qs, tier, imports, verified_at = _hot_columns("dump_it")
+    details = logic.do_get_details_impl("dump_it")["metadata"]
+    assert qs == details["quality_score"]
+    assert tier == details["reliability_tier"]
+    assert imports == len(details["detected_imports"])
+    assert verified_at == details["last_verified_at"] is not None
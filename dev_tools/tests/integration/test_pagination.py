@@ -0,0 +1,93 @@
+import pytest
+from mcp_core.engine import logic
+
+
+def _save(name, desc):
+    code = f"def {name}():\n    return 1"
+    assert "SUCCESS" in logic.do_save_impl(name, code, desc, skip_test=True)
+    logic.run_background_maintenance(name, code, desc, [], [], [], True)
+
+
+def test_list_pages_walk_the_catalogue_once():
+    for i in range(7):
+        _save(f"page_item_{i}", f"Paged helper number {i}")
+
+    names, cursor, pages = [], None, 0
+    while True:
+        page = logic.do_list_page_impl(limit=3, cursor=cursor)
+        names += [r["name"] for r in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        # A write between pages neither repeats nor shifts the walk
+        if pages == 1:
+            _save("late_arrival", "Saved while paging")
+
+    assert pages == 3
+    assert sorted(names) == sorted(f"page_item_{i}" for i in range(7))
+    assert [r["name"] for r in logic.iter_list_impl(page_size=2)][0] == "late_arrival"
+
+    # A cursor issued for a different listing is rejected
+    other = logic.do_list_page_impl(limit=1)["next_cursor"]
+    with pytest.raises(ValueError):
+        logic.do_list_page_impl(tag="other", limit=3, cursor=other)
+
+
+def test_query_pages_walk_ranked_then_substring_matches():
+    for i in range(3):
+        _save(f"report_{i}", "Report builder")
+    for i in range(4):
+        _save(f"subreport_{i}", "Nested section")
+
+    full = [r["name"] for r in logic.do_list_impl(query="report")]
+    assert full[:3] == ["report_0", "report_1", "report_2"]
+    assert sorted(full[3:]) == [f"subreport_{i}" for i in range(4)]
+    for page_size in (2, 3):
+        paged = [r["name"] for r in logic.iter_list_impl("report", page_size=page_size)]
+        assert paged == full
+
+
+def test_search_pages_follow_the_ranking():
+    for i in range(5):
+        _save(f"csv_tool_{i}", f"CSV helper {i}")
+
+    full = logic.do_search_impl("csv helper", limit=5, mode="lexical")
+    first = logic.do_search_page_impl("csv helper", limit=2, mode="lexical")
+    second = logic.do_search_page_impl(
+        "csv helper", limit=2, mode="lexical", cursor=first["next_cursor"]
+    )
+
+    paged = [r["id"] for r in first["items"] + second["items"]]
+    assert paged == [r["id"] for r in full][:4]
+    assert len(list(logic.iter_search_impl("csv helper", 10, "lexical", 2))) == 5
+
+
+def test_hybrid_pages_walk_every_result_once(monkeypatch):
+    monkeypatch.setattr(logic.task_worker, "add_task", lambda *a, **k: None)
+    for i in range(23):
+        _save(f"json_tool_{i}", f"JSON helper {i} for parsing records")
+
+    full = logic.do_search_impl("json helper", limit=100, mode="hybrid")
+    names, cursor = [], None
+    misses = logic.result_cache.miss_count
+    while True:
+        page = logic.do_search_page_impl("json helper", 4, "hybrid", cursor)
+        names += [r["name"] for r in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(names) == len(set(names)) == len(full)
+    assert names == [r["name"] for r in full]
+    # Ranked once; later pages hit the cached ranking
+    assert logic.result_cache.miss_count == misses + 1
+
+    # A write between pages resumes the new ranking after the last result
+    first = logic.do_search_page_impl("json helper", 4, "hybrid")
+    _save("json_tool_late", "JSON helper saved while paging")
+    rest = list(logic.iter_search_impl("json helper", 100, "hybrid", 4))
+    second = logic.do_search_page_impl("json helper", 4, "hybrid", first["next_cursor"])
+    seen = [r["name"] for r in first["items"] + second["items"]]
+    assert len(seen) == len(set(seen)) == 8
+    assert len(rest) == len(full) + 1
@@ -0,0 +1,52 @@
+import numpy as np
+from mcp_core.core.database import get_db_connection
+from mcp_core.engine import logic
+from mcp_core.engine.embedding import EmbeddingUnavailable, embedding_service
+from mcp_core.engine.vector_index import vector_index
+
+
+def _embedding_row(name):
+    conn = get_db_connection()
+    try:
+        return conn.execute(
+            """
+            SELECT e.vector, e.dimension FROM embeddings e
+            JOIN functions f ON f.id = e.function_id WHERE f.name = ?
+            """,
+            (name,),
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def test_failed_embedding_is_pending_until_retried(monkeypatch):
+    def unavailable(text, **kwargs):
+        raise EmbeddingUnavailable("429 quota exhausted")
+
+    monkeypatch.setattr(logic.task_worker, "add_task", lambda *a, **k: None)
+    monkeypatch.setattr(embedding_service, "get_embedding", unavailable)
+    monkeypatch.setattr(embedding_service, "get_embeddings", unavailable)
+
+    code = "def slugify(text):\n    return text.lower().replace(' ', '-')"
+    assert "SUCCESS" in logic.do_save_impl("slugify", code, "Make a URL slug")
+    logic.run_background_maintenance(
+        "slugify", code, "Make a URL slug", [], [], [], True
+    )
+
+    # Stored as pending, not as a zero vector; still found by keyword
+    assert _embedding_row("slugify") == (None, None)
+    assert logic.do_search_impl("slugify", mode="hybrid")[0]["name"] == "slugify"
+    assert logic.retry_pending_embeddings() == 1
+    vector_index.ensure_loaded()
+    assert len(vector_index) == 0
+
+    # The backend recovers: the next retry fills in the vector
+    monkeypatch.setattr(
+        embedding_service,
+        "get_embeddings",
+        lambda texts, **kwargs: np.ones((len(texts), 768), dtype=np.float32),
+    )
+    assert logic.retry_pending_embeddings() == 0
+    vector, dim = _embedding_row("slugify")
+    assert dim == 768 and vector[0] > 0
+    assert len(vector_index) == 1
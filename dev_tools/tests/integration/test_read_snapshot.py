@@ -0,0 +1,212 @@
+import numpy as np
+import pytest
+from mcp_core.engine import logic
+from mcp_core.engine import read_snapshot as snapshots
+from mcp_core.engine.embedding import embedding_service
+from mcp_core.engine.read_snapshot import SnapshotPublisher, SnapshotReader
+from mcp_core.engine.result_cache import store_generation
+
+KEYWORDS = ["csv", "json", "date", "parse"]
+
+
+def _fake_embedding(text, **kwargs):
+    v = np.zeros(768, dtype=np.float32)
+    for i, kw in enumerate(KEYWORDS):
+        if kw in text.lower():
+            v[i] = 1.0
+    v[10] = len(text) / 1000  # no ties
+    return v
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(logic.task_worker, "add_task", lambda *a, **k: None)
+    monkeypatch.setattr(embedding_service, "get_embedding", _fake_embedding)
+    monkeypatch.setattr(
+        embedding_service,
+        "get_embeddings",
+        lambda texts, **kwargs: np.stack([_fake_embedding(t) for t in texts]),
+    )
+    for name, desc, tags in [
+        ("parse_csv_rows", "Parse CSV rows", ["csv", "io"]),
+        ("load_json_file", "Load a JSON file", ["json", "io"]),
+        ("parse_date", "Parse a date string", ["date"]),
+    ]:
+        save(name, desc, tags)
+    return SnapshotPublisher(), SnapshotReader()
+
+
+def save(name, desc, tags):
+    code = f"def {name}(value):\n    return value"
+    assert "SUCCESS" in logic.do_save_impl(name, code, desc, tags, skip_test=True)
+    logic.run_background_maintenance(name, code, desc, tags, [], [], True)
+
+
+def test_snapshot_answers_like_the_master(store):
+    publisher, reader = store
+    assert publisher.publish() == 1
+    snapshot = reader.current()
+    assert snapshot.version == 1 and snapshot.vectors.shape[0] == 3
+
+    assert snapshot.list_functions() == logic.do_list_impl()
+    assert snapshot.list_functions(tag="io") == logic.do_list_impl(tag="io")
+    assert snapshot.list_functions(query="parse") == logic.do_list_impl(query="parse")
+    assert snapshot.get_details("parse_date") == logic.do_get_details_impl("parse_date")
+    assert snapshot.tag_counts() == logic.do_tag_counts_impl()
+
+    for mode in ("lexical", "vector", "hybrid"):
+        for query in ("parse csv", "json file"):
+            expected = logic.do_search_impl(query, limit=3, mode=mode)
+            embedding = logic.do_embed_query_impl(query)
+            assert snapshot.search(query, 3, mode, embedding) == expected
+    assert snapshot.search("parse", 5, "lexical", tags=["csv"]) == (
+        logic.do_search_impl("parse", limit=5, mode="lexical", tags=["csv"])
+    )
+
+
+def test_readers_swap_to_new_versions(store, monkeypatch):
+    publisher, reader = store
+    monkeypatch.setattr(snapshots, "SNAPSHOT_KEEP", 2)
+    publisher.publish()
+    old = reader.current()
+    assert publisher.publish_if_changed() is None  # nothing written since
+
+    save("parse_json", "Parse JSON text", ["json"])
+    assert publisher.publish_if_changed() == 2
+    new = reader.current()
+    assert new.version == 2 and reader.swap_count == 2
+    assert new.get_details("parse_json")["name"] == "parse_json"
+    # A reader still holding the old version keeps its view
+    assert "error" in old.get_details("parse_json")
+
+    publisher.publish()
+    versions = sorted(p.name for p in snapshots.snapshot_root().glob("v*"))
+    assert versions == ["v00000002", "v00000003"]
+
+
+def test_serve_falls_back_to_the_master(store):
+    publisher, reader = store
+    assert reader.serve("list_functions", {}) is None  # nothing published yet
+    publisher.publish()
+    taken_at = reader.current().taken_at
+
+    assert len(reader.serve("list_functions", {"query": None, "tag": "io"})) == 2
+    late = {"done_at": taken_at + 1}
+    assert reader.serve("list_functions", {}, last_write=late) is None
+    assert reader.serve("get_function", {"asset_name": "parse_date"}) is None
+
+    search = {"query": "parse csv", "limit": 2}
+    assert reader.serve("search_functions", search) is None  # no way to embed
+    results = reader.serve("search_functions", search, embed=logic.do_embed_query_impl)
+    assert results == logic.do_search_impl("parse csv", limit=2)
+    lexical = dict(search, mode="lexical", dependencies_available=True)
+    assert reader.serve("search_functions", lexical) is None
+
+
+def test_reads_wait_for_the_committed_generation(store):
+    publisher, reader = store
+    publisher.publish()
+    save("parse_json", "Parse JSON text", ["json"])
+    # What the Master returns to the proxy once the save committed
+    write = {"session": store_generation.session, "generation": store_generation.value}
+    assert reader.serve("list_functions", {}, last_write=write) is None
+    other_master = dict(write, session="restarted")
+
+    publisher.publish()
+    assert len(reader.serve("list_functions", {}, last_write=write)) == 4
+    assert reader.serve("list_functions", {}, last_write=other_master) is None
+
+
+def test_snapshot_includes_unflushed_calls(store):
+    publisher, reader = store
+    for _ in range(2):
+        logic.do_get_impl("parse_date")
+    publisher.publish()
+
+    details = reader.current().get_details("parse_date")
+    assert details["call_count"] == 2 and details["last_called_at"]
+    assert reader.current().list_functions() == logic.do_list_impl()
+
+    # The flush changes nothing visible, but does trigger a republish
+    assert snapshots.call_counter.flush() == 2
+    assert publisher.publish_if_changed() == 2
+    assert reader.current().get_details("parse_date")["call_count"] == 2
+
+
+def test_hybrid_score_stays_the_blended_relevance(store):
+    publisher, reader = store
+    publisher.publish()
+    embedding = logic.do_embed_query_impl("parse csv")
+    for results in (
+        logic.do_search_impl("parse csv", limit=3),
+        reader.current().search("parse csv", 3, "hybrid", embedding),
+    ):
+        for r in results:
+            blended = r["similarity"] * 0.7 + r["quality_score"] / 100 * 0.3
+            assert r["score"] == round(blended, 4)
+        fused = [r["rrf_score"] for r in results]
+        assert fused == sorted(fused, reverse=True) and 0 < fused[0] < 1
+
+
+def test_save_during_publish_keeps_rows_and_vectors_together(store, monkeypatch):
+    publisher, reader = store
+    copy_functions = SnapshotPublisher._copy_functions
+
+    def copy_then_save(conn, tmp, pending):
+        copy_functions(conn, tmp, pending)
+        save("parse_json", "Parse JSON text", ["json"])  # Lands before the vectors
+
+    monkeypatch.setattr(
+        SnapshotPublisher, "_copy_functions", staticmethod(copy_then_save)
+    )
+    publisher.publish()
+    snapshot = reader.current()
+    rows = {r[0] for r in snapshot.query("SELECT id FROM functions")}
+    assert set(snapshot.ids.tolist()) == rows and len(rows) == 3
+
+
+def test_vectors_are_reused_when_no_embedding_changed(store):
+    publisher, reader = store
+    publisher.publish()
+    first = snapshots.snapshot_root() / "v00000001" / "vectors.npy"
+
+    logic.do_get_impl("parse_date")
+    snapshots.call_counter.flush()
+    assert publisher.publish_if_changed() == 2
+    second = snapshots.snapshot_root() / "v00000002" / "vectors.npy"
+    assert first.stat().st_ino == second.stat().st_ino
+    assert publisher.vectors_reused == 1
+
+    save("parse_json", "Parse JSON text", ["json"])
+    publisher.publish()
+    assert reader.current().vectors.shape[0] == 4
+    assert publisher.vectors_reused == 1
+
+
+def test_lexical_index_is_carried_to_the_next_version(store, monkeypatch):
+    publisher, reader = store
+    publisher.publish()
+    old = reader.current()
+    assert [fid for fid, _ in old.lexical.search("json", None)] == [2]
+
+    save("parse_json", "Parse JSON text", ["json"])
+    logic.do_delete_impl("parse_date")
+    publisher.publish()
+    new = reader.current()
+
+    indexed = []
+    document_terms = snapshots.LexicalIndex._document_terms
+    monkeypatch.setattr(
+        snapshots.LexicalIndex,
+        "_document_terms",
+        staticmethod(lambda name, *a: indexed.append(name) or document_terms(name, *a)),
+    )
+    assert sorted(fid for fid, _ in new.lexical.search("json", None)) == [2, 4]
+    assert new.lexical.search("date", None) == []
+    assert indexed == ["parse_json"]  # only the changed row was re-indexed
+    # The older version's index is left as it was
+    assert [fid for fid, _ in old.lexical.search("json", None)] == [2]
+    assert [fid for fid, _ in old.lexical.search("date", None)] == [3]
+    assert new.search("parse json", 2, "lexical") == logic.do_search_impl(
+        "parse json", limit=2, mode="lexical"
+    )
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+from mcp_core.core.migrations import JOBS, StartupMigrations, ToolNotReady
+from mcp_core.engine import logic
+
+
+def _wait_for(migrations, job, state):
+    for _ in range(500):
+        if migrations.get_readiness()["jobs"][job]["state"] == state:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"{job} never reached {state}")
+
+
+def test_reads_are_served_while_vectors_migrate(real_threads, monkeypatch):
+    release = threading.Event()
+
+    def slow_vectors(progress):
+        progress(1, 4)
+        release.wait(5)
+
+    steps = {name: (lambda progress: None) for name in JOBS}
+    steps["vectors"] = slow_vectors
+    migrations = StartupMigrations(steps)
+    monkeypatch.setattr(logic, "startup_migrations", migrations)
+
+    code = "def slugify(text):\n    return text.lower()"
+    assert "SUCCESS" in logic.do_save_impl("slugify", code, "Make a slug")
+    migrations.start()
+    _wait_for(migrations, "vectors", "running")
+
+    migrations.require("list_functions", timeout=0)
+    migrations.require("get_function", timeout=0)
+    with pytest.raises(ToolNotReady, match="'vectors' is running, 1/4"):
+        migrations.require("save_function", timeout=0.05)
+    readiness = migrations.get_readiness()
+    assert readiness["tools"]["search_functions"] == "ready"
+    assert readiness["tools"]["delete_function"] == "needs 'vectors' (running)"
+
+    # Hybrid search answers from the keyword index meanwhile
+    assert logic._semantic_unavailable() == "Vector migrations still running"
+    assert logic.do_search_impl("slugify", mode="hybrid")[0]["name"] == "slugify"
+
+    release.set()
+    migrations.require("reindex_embeddings", timeout=5)
+    migrations._thread.join(5)
+    assert logic._semantic_unavailable() is None
+
+
+def test_failed_job_blocks_the_tools_that_need_it(real_threads):
+    def broken(progress):
+        raise RuntimeError("disk full")
+
+    steps = {name: (lambda progress: None) for name in JOBS}
+    steps["model_version"] = broken
+    migrations = StartupMigrations(steps)
+    migrations.start()
+    migrations._thread.join(5)
+    assert (
+        migrations.get_readiness()["jobs"]["embedding_recovery"]["state"] == "blocked"
+    )
+
+    migrations.require("search_functions", timeout=0)
+    with pytest.raises(ToolNotReady, match="'model_version' failed \\(disk full\\)"):
+        migrations.require("save_function", timeout=1)
+    jobs = migrations.get_readiness()["jobs"]
+    assert jobs["embedding_recovery"] == {
+        "state": "blocked",
+        "blocked_by": "model_version",
+    }
+
+
+def test_default_jobs_run_against_the_store(real_threads):
+    migrations = StartupMigrations()
+    migrations.start()
+    migrations.require("reindex_embeddings", timeout=30)
+    migrations._thread.join(10)
+    jobs = migrations.get_readiness()["jobs"]
+    assert all(job["state"] == "done" for job in jobs.values())
+    assert jobs["embedding_recovery"]["result"] == 0
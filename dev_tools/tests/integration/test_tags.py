@@ -0,0 +1,84 @@
+import pytest
+from mcp_core.core.database import _column_type, get_db_connection, init_db
+from mcp_core.engine import logic
+
+
+@pytest.fixture(autouse=True)
+def no_background_tasks(monkeypatch):
+    # Queued maintenance would race the schema rewrites below
+    monkeypatch.setattr(logic.task_worker, "add_task", lambda *a, **k: None)
+
+
+def _save(name, tags):
+    code = f"def {name}():\n    return 1"
+    assert "SUCCESS" in logic.do_save_impl(name, code, "d", tags=tags, skip_test=True)
+
+
+def _function_tags():
+    conn = get_db_connection()
+    try:
+        return conn.execute(
+            "SELECT f.name, t.tag FROM function_tags t JOIN functions f ON f.id = t.function_id ORDER BY 1, 2"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def test_tag_counts_follow_saves_updates_and_deletes():
+    _save("fetch_url", ["http", "io"])
+    _save("parse_url", ["http"])
+    assert logic.do_tag_counts_impl() == {"http": 2, "io": 1}
+
+    _save("fetch_url", ["http", "retry"])
+    assert logic.do_tag_counts_impl() == {"http": 2, "retry": 1}
+    assert logic.do_delete_impl("parse_url").startswith("SUCCESS")
+    assert logic.do_tag_counts_impl() == {"http": 1, "retry": 1}
+    assert _function_tags() == [("fetch_url", "http"), ("fetch_url", "retry")]
+
+
+def test_tag_filter_matches_whole_tags_only():
+    _save("fetch_url", ["http"])
+    _save("serve", ["http-server"])
+    names = [r["name"] for r in logic.do_list_impl(tag="http")]
+    assert names == ["fetch_url"]
+    assert logic.do_get_details_impl("serve")["tags"] == ["http-server"]
+
+
+def test_legacy_json_columns_are_migrated():
+    conn = get_db_connection()
+    try:
+        conn.execute("DROP TABLE functions")
+        conn.execute("DROP TABLE function_tags")
+        conn.execute("DROP TABLE tag_counts")
+        conn.execute("""
+            CREATE TABLE functions (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_function_id'),
+                name VARCHAR, code VARCHAR, description VARCHAR, tags VARCHAR,
+                metadata VARCHAR, status VARCHAR DEFAULT 'active', test_cases VARCHAR
+            )
+        """)
+        conn.execute("CREATE UNIQUE INDEX idx_functions_name ON functions (name)")
+        conn.execute("""
+            INSERT INTO functions (name, code, tags, metadata, test_cases) VALUES
+            ('a', 'pass', '["x", "y"]', '{"dependencies": ["requests"]}', '[{"input": 1}]'),
+            ('b', 'pass', 'not json', NULL, NULL)
+        """)
+    finally:
+        conn.close()
+
+    init_db()
+
+    conn = get_db_connection()
+    try:
+        assert _column_type(conn, "functions", "tags") == "VARCHAR[]"
+        assert _column_type(conn, "functions", "test_cases") == "JSON"
+        rows = conn.execute(
+            "SELECT name, tags, dependencies, test_cases FROM functions ORDER BY name"
+        ).fetchall()
+    finally:
+        conn.close()
+    assert rows == [
+        ("a", ["x", "y"], ["requests"], '[{"input": 1}]'),
+        ("b", [], [], "[]"),
+    ]
+    assert logic.do_tag_counts_impl() == {"x": 1, "y": 1}
@@ -0,0 +1,174 @@
+import numpy as np
+from mcp_core.core.database import (
+    _vector_column_type,
+    get_db_connection,
+    init_db,
+)
+
+
+def _make_legacy_store(rows):
+    """Recreates the pre-migration schema: variable-length FLOAT[] vectors."""
+    conn = get_db_connection()
+    try:
+        conn.execute("DROP TABLE embeddings")
+        conn.execute("""
+            CREATE TABLE embeddings (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_emb_id'),
+                function_id INTEGER,
+                vector FLOAT[],
+                model_name VARCHAR,
+                dimension INTEGER,
+                encoded_at VARCHAR
+            )
+        """)
+        for fid, vector in rows:
+            conn.execute(
+                "INSERT INTO embeddings (function_id, vector, model_name, dimension) VALUES (?, ?, 'm', ?)",
+                (fid, vector, len(vector)),
+            )
+    finally:
+        conn.close()
+
+
+def test_fresh_store_uses_fixed_width_vectors():
+    conn = get_db_connection()
+    try:
+        assert _vector_column_type(conn) == "FLOAT[768]"
+    finally:
+        conn.close()
+
+
+def test_legacy_vectors_are_migrated_and_normalized():
+    good = [3.0, 4.0] + [0.0] * 766
+    _make_legacy_store([(1, good), (2, [1.0, 2.0, 3.0]), (3, [0.0] * 768)])
+
+    init_db()
+
+    conn = get_db_connection()
+    try:
+        assert _vector_column_type(conn) == "FLOAT[768]"
+        rows = dict(
+            conn.execute(
+                "SELECT function_id, vector FROM embeddings ORDER BY function_id"
+            ).fetchall()
+        )
+        dims = dict(
+            conn.execute("SELECT function_id, dimension FROM embeddings").fetchall()
+        )
+    finally:
+        conn.close()
+
+    assert np.allclose(rows[1][:2], [0.6, 0.8])
+    # Wrong-dimension rows are kept but flagged for re-embedding
+    assert rows[2] is None and dims[2] is None
+    assert not any(rows[3])
+
+
+def test_interrupted_migration_resumes():
+    vectors = [[float(i + 1)] + [0.0] * 767 for i in range(5)]
+    _make_legacy_store([(i + 1, v) for i, v in enumerate(vectors)])
+
+    conn = get_db_connection()
+    try:
+        # Simulate a crash after the first batch was copied
+        conn.execute(
+            "INSERT INTO config (key, value) VALUES ('vector_migration_dim', '768')"
+        )
+        conn.execute("""
+            CREATE TABLE embeddings_migration AS
+            SELECT id, function_id, vector::FLOAT[768] AS vector, model_name,
+                   dimension, encoded_at
+            FROM embeddings WHERE function_id <= 2
+        """)
+    finally:
+        conn.close()
+
+    init_db()
+
+    conn = get_db_connection()
+    try:
+        count = conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+        staged = conn.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = 'embeddings_migration'"
+        ).fetchone()[0]
+        marker = conn.execute(
+            "SELECT count(*) FROM config WHERE key = 'vector_migration_dim'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+    assert count == 5
+    assert staged == 0 and marker == 0
+
+
+def test_embedding_recovery_is_batched_and_resumes(monkeypatch):
+    from mcp_core.core import database
+    from mcp_core.core.write_pipeline import write_pipeline
+    from mcp_core.engine.embedding import embedding_service
+
+    calls = []
+
+    def fake_batch(texts, **kwargs):
+        calls.append(len(texts))
+        return np.full((len(texts), 768), 2.0, dtype=np.float32)
+
+    monkeypatch.setattr(embedding_service, "get_embeddings", fake_batch)
+    monkeypatch.setattr(database, "EMBEDDING_RECOVERY_BATCH", 2)
+    ops = []
+    execute = write_pipeline.execute
+    monkeypatch.setattr(
+        write_pipeline,
+        "execute",
+        lambda op, *args, **kwargs: (
+            ops.append(op.__name__) or execute(op, *args, **kwargs)
+        ),
+    )
+
+    conn = get_db_connection()
+    try:
+        for fid in range(1, 6):
+            conn.execute(
+                "INSERT INTO functions (id, name, code, description, tags) VALUES (?, ?, 'pass', '', '[]')",
+                (fid, f"fn_{fid}"),
+            )
+            conn.execute(
+                "INSERT INTO embeddings (function_id, vector, model_name, dimension) VALUES (?, ?, 'old-model', 768)",
+                (fid, [1.0] * 768),
+            )
+        # An earlier run was interrupted after committing ids 1-2
+        conn.execute(
+            "INSERT INTO config (key, value) VALUES ('embedding_recovery_checkpoint', ?)",
+            (f"{embedding_service.model_name}:768:2",),
+        )
+    finally:
+        conn.close()
+
+    def stale_ids():
+        c = get_db_connection()
+        try:
+            return [
+                r[0]
+                for r in c.execute(
+                    "SELECT function_id FROM embeddings WHERE model_name = 'old-model' ORDER BY 1"
+                ).fetchall()
+            ]
+        finally:
+            c.close()
+
+    init_db()
+    assert calls == [2, 1]  # ids 3-4, then 5
+    # Batches go through the writer like any other write
+    assert ops == ["_apply_recovery_batch"] * 2 + ["_set_config_value"]
+    assert stale_ids() == [1, 2]
+
+    init_db()  # Checkpoint was cleared on completion; the rest is retried
+    assert stale_ids() == []
+
+    conn = get_db_connection()
+    try:
+        vector = conn.execute("SELECT vector FROM embeddings LIMIT 1").fetchone()[0]
+        checkpoint = database._get_config_value(conn, "embedding_recovery_checkpoint")
+    finally:
+        conn.close()
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    assert checkpoint is None
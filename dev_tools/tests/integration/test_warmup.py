@@ -0,0 +1,61 @@
+import numpy as np
+from mcp_core.engine import logic
+from mcp_core.engine.embedding import embedding_service
+
+
+def test_search_during_warmup_falls_back_to_lexical(monkeypatch):
+    code = "def parse_iso_date(s):\n    return s"
+    assert "SUCCESS" in logic.do_save_impl("parse_iso_date", code, "", skip_test=True)
+    logic.run_background_maintenance("parse_iso_date", code, "", [], [], [], True)
+
+    def no_model(*args, **kwargs):
+        raise AssertionError("search waited for the embedding model")
+
+    loaded_embedding = embedding_service.get_embedding
+    monkeypatch.setattr(embedding_service, "_readiness", {"state": "loading"})
+    monkeypatch.setattr(embedding_service, "get_embedding", no_model)
+
+    results = logic.do_search_impl("parse_iso_date", limit=3)
+    assert results[0]["name"] == "parse_iso_date"
+    assert results[0]["similarity"] is None  # keyword-only result
+    batch = logic.do_search_batch_impl(["parse_iso_date"], limit=3)
+    assert batch[0]["results"][0]["name"] == "parse_iso_date"
+
+    # Once ready, the same query is a real hybrid search (nothing stale cached)
+    monkeypatch.setattr(embedding_service, "_readiness", {"state": "ready"})
+    monkeypatch.setattr(embedding_service, "get_embedding", loaded_embedding)
+    assert logic.do_search_impl("parse_iso_date", limit=3)[0]["similarity"] is not None
+
+
+def test_warmup_reports_state_and_timing(monkeypatch):
+    monkeypatch.setattr(embedding_service, "_readiness", {"state": "idle"})
+    monkeypatch.setattr(embedding_service, "_ensure_initialized", lambda: None)
+    monkeypatch.setattr(embedding_service, "is_loaded", lambda: False)
+
+    embedding_service.start_warmup()  # threads run inline under the test harness
+
+    readiness = logic.do_status_impl()["embedding_model"]
+    assert readiness["state"] == "failed"
+    assert readiness["load_seconds"] >= 0 and readiness["error"]
+
+
+def test_query_cache_is_prewarmed_after_a_model_switch(monkeypatch, tmp_path):
+    path = tmp_path / "query_embeddings.npz"
+    old = logic.PopularQueryCache()
+    for query in ("read csv", "read csv", "parse json"):
+        if old.get_embedding_cache(query) is None:
+            old.cache_embedding_if_popular(query, [0.5] * 768)
+    old.save_snapshot(path, "previous-model")
+
+    embedded = []
+
+    def fake_batch(texts, **kwargs):
+        embedded.extend(texts)
+        return np.ones((len(texts), 768), dtype=np.float32)
+
+    monkeypatch.setattr(logic, "popular_cache", logic.PopularQueryCache())
+    monkeypatch.setattr(embedding_service, "get_embeddings", fake_batch)
+
+    assert logic.warm_query_cache(path, prewarm=1) == 1
+    assert embedded == ["read csv"]  # only the most popular, in one batch
+    assert logic.popular_cache.get_embedding_cache("Read CSV")[0] == 1.0
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+from mcp_core.core.database import get_db_connection
+from mcp_core.core.write_pipeline import WritePipeline
+from mcp_core.engine import logic
+
+
+@pytest.fixture
+def pipeline(real_threads, monkeypatch):
+    monkeypatch.setattr(logic.task_worker, "add_task", lambda *a, **k: None)
+    pipeline = WritePipeline()
+    monkeypatch.setattr(logic, "write_pipeline", pipeline)
+    pipeline.enable()
+    yield pipeline
+    pipeline.disable()
+
+
+def _hold_writer(pipeline):
+    """Parks the writer thread in an op until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def park(conn):
+        started.set()
+        release.wait(5)
+
+    pipeline.submit(park)
+    started.wait(5)
+    return release
+
+
+def _wait_for_queue(pipeline, n):
+    while pipeline.get_stats()["queued"] < n:
+        time.sleep(0.01)
+
+
+def _names():
+    conn = get_db_connection()
+    try:
+        return {r[0] for r in conn.execute("SELECT name FROM functions").fetchall()}
+    finally:
+        conn.close()
+
+
+def test_concurrent_saves_commit_as_one_batch(pipeline):
+    release = _hold_writer(pipeline)
+    results = []
+
+    def save(i):
+        code = f"def f{i}():\n    return {i}"
+        results.append(logic.do_save_impl(f"f{i}", code, "n", skip_test=True))
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    _wait_for_queue(pipeline, 16)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert all("SUCCESS" in r for r in results)
+    assert _names() == {f"f{i}" for i in range(16)}
+    stats = pipeline.get_stats()
+    assert stats["largest_batch"] == 16 and stats["batches"] == 2
+
+
+def test_failing_op_only_fails_its_caller(pipeline):
+    def insert(conn, key):
+        conn.execute("INSERT INTO config (key, value) VALUES (?, 'x')", (key,))
+        return key
+
+    def broken(conn):
+        conn.execute("INSERT INTO no_such_table VALUES (1)")
+
+    release = _hold_writer(pipeline)
+    futures = [
+        pipeline.submit(insert, "a"),
+        pipeline.submit(broken),
+        pipeline.submit(insert, "b"),
+    ]
+    _wait_for_queue(pipeline, 3)
+    release.set()
+
+    assert futures[0].result(5) == "a" and futures[2].result(5) == "b"
+    with pytest.raises(Exception, match="no_such_table"):
+        futures[1].result(5)
+    stats = pipeline.get_stats()
+    assert stats["replayed_batches"] == 1 and stats["failed_ops"] == 1
+
+
+def test_op_writing_through_the_pipeline_joins_its_batch(pipeline):
+    def outer(conn):
+        return pipeline.execute(lambda c: c is conn)
+
+    assert pipeline.execute(outer, timeout=5) is True
@@ -0,0 +1,82 @@
+import numpy as np
+from mcp_core.engine import ann_index
+from mcp_core.engine.ann_index import IVFIndex
+from mcp_core.engine.vector_index import VectorIndex
+
+
+def _clustered_index(n=2000, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    index = VectorIndex(initial_capacity=16)
+    index.load()  # bind to the (empty) test DB
+    index._reset(dim)
+    for fid in range(1, n + 1):
+        v = centers[fid % clusters] + 0.1 * rng.normal(size=dim)
+        index.upsert(fid, v, quality_score=50)
+    return index, centers
+
+
+def test_ivf_recall_against_exact():
+    vectors, _ = _clustered_index()
+    ann = IVFIndex(vectors, nprobe=8)
+    ann.rebuild()
+    assert ann.is_ready
+
+    report = ann.measure_recall(k=10, samples=30)
+    assert report["recall@10"] >= 0.9
+    assert report["vectors"] == 2000
+
+
+def test_ivf_incremental_insert_and_delete():
+    vectors, centers = _clustered_index(n=500)
+    ann = IVFIndex(vectors, nprobe=4)
+    ann.rebuild()
+
+    vectors.upsert(9999, centers[3] * 10, quality_score=100)
+    assert 9999 in [h[0] for h in ann.search(centers[3], limit=5)]
+
+    vectors.remove(9999)
+    assert 9999 not in [h[0] for h in ann.search(centers[3], limit=50)]
+
+
+def test_ivf_persistence_roundtrip():
+    vectors, centers = _clustered_index(n=300)
+    ann = IVFIndex(vectors, nprobe=4)
+    ann.rebuild()
+    assert IVFIndex.index_path().exists()
+
+    # Changes below the persist threshold are not on disk yet
+    vectors.remove(1)
+    vectors.upsert(5000, centers[0], quality_score=50)
+    moved = 3  # stored near centers[3]
+    vectors.upsert(moved, centers[0], quality_score=50)  # re-embedded
+
+    restored = IVFIndex(vectors, nprobe=4)
+    restored._building = True
+    assert restored._load_persisted()
+    assert restored.is_ready
+    ids = {h[0] for h in restored.search(centers[0], limit=400)}
+    assert 5000 in ids and 1 not in ids
+    assert restored._assign[moved] == restored._assign[5000]
+
+
+def test_persisted_index_loads_off_the_query_path(monkeypatch):
+    vectors, _ = _clustered_index(n=100)
+    IVFIndex(vectors, nprobe=4).rebuild()
+
+    queued = []
+    monkeypatch.setattr(ann_index.task_worker, "add_task", queued.append)
+    restored = IVFIndex(vectors, nprobe=4)
+    assert restored.should_use("ann") is False  # exact scan meanwhile
+    assert not restored.is_ready and queued == [restored.load_or_rebuild]
+
+    queued[0]()
+    assert restored.is_ready and restored.should_use("ann") is True
+
+
+def test_exact_mode_never_uses_ann():
+    vectors, _ = _clustered_index(n=50)
+    ann = IVFIndex(vectors)
+    ann.rebuild()
+    assert ann.should_use("exact") is False
+    assert ann.should_use("ann") is True
@@ -0,0 +1,161 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from mcp_core.core import database
+from mcp_core.core.database import DBReadLock, DBWriteLock, _ProcessDBLock
+
+_HOLD_LOCK = """
+import fcntl, sys
+f = open(sys.argv[1], "a")
+fcntl.flock(f.fileno(), fcntl.LOCK_SH if sys.argv[2] == "shared" else fcntl.LOCK_EX)
+print("locked", flush=True)
+sys.stdin.read()
+"""
+
+_TRY_EXCLUSIVE = """
+import fcntl, sys
+f = open(sys.argv[1], "a")
+try:
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+except OSError:
+    sys.exit(1)
+"""
+
+# Holds a read lock, then (once told to go) writes while still reading
+_READ_THEN_WRITE = """
+import sys, pathlib
+from mcp_core.core import database
+database.LOCK_PATH = pathlib.Path(sys.argv[1])
+with database.DBReadLock(timeout=5):
+    print("reading", flush=True)
+    sys.stdin.readline()
+    try:
+        with database.DBWriteLock(timeout=5):
+            print("wrote", flush=True)
+    except TimeoutError:
+        print("timed out", flush=True)
+"""
+
+
+@pytest.fixture
+def lock_state(real_threads, monkeypatch, tmp_path):
+    monkeypatch.setattr(database, "LOCK_PATH", tmp_path / "db.lock")
+    state = _ProcessDBLock()
+    monkeypatch.setattr(database, "_process_lock", state)
+    return state
+
+
+def _hold_in_thread(lock, started, release):
+    def run():
+        with lock:
+            started.set()
+            release.wait(5)
+
+    t = threading.Thread(target=run, name="maintenance")
+    t.start()
+    started.wait(5)
+    return t
+
+
+def test_readers_never_queue_behind_a_writer(lock_state):
+    started, release = threading.Event(), threading.Event()
+    writer = _hold_in_thread(DBWriteLock(), started, release)
+
+    t0 = time.monotonic()
+    with DBReadLock(timeout=1.0):
+        pass
+    assert time.monotonic() - t0 < 0.5
+
+    # A second writer waits and reports who holds the lock
+    with pytest.raises(TimeoutError, match="thread 'maintenance'"):
+        with DBWriteLock(timeout=0.2):
+            pass
+    release.set()
+    writer.join()
+    with DBWriteLock(timeout=1.0):
+        pass
+    stats = lock_state.get_stats()
+    assert stats["write"]["timeouts"] == 1 and stats["writer"] is None
+
+
+def test_writers_are_served_in_arrival_order(lock_state):
+    started, release = threading.Event(), threading.Event()
+    first = _hold_in_thread(DBWriteLock(), started, release)
+    order = []
+
+    def writer(i):
+        with DBWriteLock(timeout=5):
+            order.append(i)
+
+    waiters = []
+    for i in range(4):
+        t = threading.Thread(target=writer, args=(i,))
+        t.start()
+        waiters.append(t)
+        while lock_state.get_stats()["queued_writers"] < i + 1:
+            time.sleep(0.01)
+    release.set()
+    for t in [first] + waiters:
+        t.join()
+    assert order == [0, 1, 2, 3]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="flock is POSIX only")
+def test_file_lock_excludes_other_processes(lock_state):
+    def hold(mode):
+        proc = subprocess.Popen(
+            [sys.executable, "-c", _HOLD_LOCK, str(database.LOCK_PATH), mode],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        assert proc.stdout.readline().strip() == "locked"
+        return proc
+
+    def file_is_locked():
+        args = [sys.executable, "-c", _TRY_EXCLUSIVE, str(database.LOCK_PATH)]
+        return subprocess.run(args).returncode == 1
+
+    other = hold("shared")
+    with DBReadLock(timeout=0.5):  # shared with the other reader
+        with pytest.raises(TimeoutError, match="another process"):
+            with DBWriteLock(timeout=0.3):
+                pass
+        # The failed upgrade must not leave the reader's SH recorded but dropped
+        other.communicate("")
+        assert lock_state.get_stats()["file_mode"] == "shared"
+        assert file_is_locked()
+
+    other = hold("exclusive")
+    with pytest.raises(TimeoutError, match="another process"):
+        with DBReadLock(timeout=0.3):
+            pass
+    other.communicate("")
+    with DBWriteLock(timeout=1.0):
+        assert lock_state.get_stats()["file_mode"] == "exclusive"
+    assert lock_state.get_stats()["file_mode"] is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="flock is POSIX only")
+def test_writers_in_two_reading_processes_do_not_deadlock(lock_state):
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", _READ_THEN_WRITE, str(database.LOCK_PATH)],
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(2)
+    ]
+    for proc in procs:
+        assert proc.stdout.readline().strip() == "reading"
+    for proc in procs:  # both hold SH; now each one's writer wants EX
+        proc.stdin.write("go\n")
+        proc.stdin.flush()
+    outputs = [proc.communicate(timeout=15)[0].strip() for proc in procs]
+    assert outputs == ["wrote", "wrote"]
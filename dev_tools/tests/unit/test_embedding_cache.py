@@ -0,0 +1,87 @@
+import numpy as np
+from mcp_core.engine import embedding as embedding_module
+from mcp_core.engine.embedding_cache import EmbeddingDiskCache
+
+
+def _vec(x, dim=4):
+    v = np.zeros(dim, dtype=np.float32)
+    v[0] = x
+    return v
+
+
+def test_cache_persists_and_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingDiskCache(max_entries=2, directory=tmp_path)
+    cache.put("m", "a", _vec(1))
+    cache.put("m", "b", _vec(2))
+    assert cache.get("m", "a")[0] == 1  # "a" is now the most recent
+    cache.put("m", "c", _vec(3))  # evicts "b"
+
+    reopened = EmbeddingDiskCache(max_entries=2, directory=tmp_path)
+    assert reopened.get("m", "b") is None
+    assert reopened.get("m", "a")[0] == 1 and reopened.get("m", "c")[0] == 3
+    # Keyed by model and by query/document role
+    assert reopened.get("other-model", "a") is None
+    assert reopened.get("m", "a", is_query=True) is None
+
+
+def test_failed_zero_embeddings_are_not_cached(tmp_path):
+    cache = EmbeddingDiskCache(max_entries=4, directory=tmp_path)
+    cache.put_many("m", ["ok", "failed"], np.stack([_vec(1), _vec(0)]))
+    assert cache.get("m", "failed") is None and cache.get("m", "ok") is not None
+
+
+def test_processes_sharing_a_slab_never_read_each_others_slots(tmp_path):
+    # Two instances map the same files, like the Master and the API server
+    master = EmbeddingDiskCache(max_entries=2, directory=tmp_path)
+    api = EmbeddingDiskCache(max_entries=2, directory=tmp_path)
+    master.put("m", "a", _vec(1))
+    api.put("m", "b", _vec(2))
+    assert master.get("m", "b")[0] == 2  # Written by the other process
+
+    api.put("m", "c", _vec(3))  # Evicts "a", the least recently used
+    master.put("m", "d", _vec(4))  # Evicts "b", not the slot "c" took
+    assert master.get("m", "a") is None and api.get("m", "a") is None
+    for cache in (master, api):
+        assert cache.get("m", "c")[0] == 3 and cache.get("m", "d")[0] == 4
+
+
+def test_replacing_a_slab_never_rewrites_files_another_process_maps(tmp_path):
+    master = EmbeddingDiskCache(max_entries=2, directory=tmp_path)
+    master.put("m", "a", _vec(1))
+    (old,) = master._slabs.values()
+    old_vectors = old.vectors
+
+    # Started with another size: the slab is replaced, not truncated in place
+    resized = EmbeddingDiskCache(max_entries=4, directory=tmp_path)
+    resized.put("m", "b", _vec(2))
+    assert old_vectors[:, 0].tolist().count(1.0) == 1  # Still the old pages
+
+    assert master.get("m", "b") is None  # Followed CURRENT; its size differs
+    assert len(list((tmp_path / "embeddings" / "m").glob("g*"))) == 1
+
+
+def test_service_only_embeds_cache_misses(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        embedding_module,
+        "embedding_cache",
+        EmbeddingDiskCache(max_entries=8, directory=tmp_path),
+    )
+    embedded = []
+
+    class CountingService(embedding_module._CachedEmbeddingService):
+        model_name = "counting"
+
+        def _embed(self, text, is_query):
+            embedded.append(text)
+            return _vec(len(text))
+
+        def _embed_batch(self, texts, is_query, batch_size):
+            embedded.extend(texts)
+            return np.stack([_vec(len(t)) for t in texts])
+
+    service = CountingService()
+    service.get_embedding("abc")
+    out = service.get_embeddings(["abc", "de", "abc"])
+
+    assert embedded == ["abc", "de"]
+    assert out[:, 0].tolist() == [3, 2, 3]
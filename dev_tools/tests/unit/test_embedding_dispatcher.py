@@ -0,0 +1,51 @@
+import threading
+import time
+
+import numpy as np
+from mcp_core.engine.embedding_dispatcher import EmbeddingDispatcher
+
+
+class SlowService:
+    """Inference with a fixed per-call cost, like an ONNX session run."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_embedding(self, text, is_query=False):
+        return self.get_embeddings([text], is_query)[0]
+
+    def get_embeddings(self, texts, is_query=False, batch_size=None):
+        self.calls.append(list(texts))
+        time.sleep(0.05)
+        return np.stack([np.full(4, len(t), dtype=np.float32) for t in texts])
+
+
+def test_lone_request_is_not_delayed():
+    service = SlowService()
+    dispatcher = EmbeddingDispatcher(service, window_ms=500)
+
+    assert dispatcher.embed("abc")[0] == 3
+    assert service.calls == [["abc"]]
+    assert dispatcher.get_stats()["max_wait_ms"] < 100
+
+
+def test_concurrent_requests_share_batches(real_threads):
+    service = SlowService()
+    dispatcher = EmbeddingDispatcher(service, max_batch=16, window_ms=5)
+    results = {}
+
+    def client(i):
+        results[i] = dispatcher.embed("x" * i)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(1, 13)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Every caller got its own vector back
+    assert all(results[i][0] == i for i in range(1, 13))
+    stats = dispatcher.get_stats()
+    assert stats["requests"] == 12
+    assert len(service.calls) == stats["batches"] < 12
+    assert stats["max_batch_size"] > 1
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from fake_gemini_server import FakeGeminiServer, RestEmbedClient, vector_for
+from mcp_core.engine import embedding as embedding_module
+from mcp_core.engine import rate_limiter
+from mcp_core.engine.embedding import EmbeddingUnavailable, GeminiEmbeddingService
+from mcp_core.engine.rate_limiter import TokenBucket
+
+
+@pytest.fixture
+def gemini(real_threads, monkeypatch):
+    monkeypatch.setattr(embedding_module, "backoff_delay", lambda attempt: 0.0)
+    monkeypatch.setattr(embedding_module, "GEMINI_MAX_RETRIES", 3)
+    with FakeGeminiServer(latency=0.02) as server:
+        service = GeminiEmbeddingService()
+        service._client = RestEmbedClient(server.url)
+        yield service, server
+
+
+def test_token_bucket_spaces_requests(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(
+        rate_limiter.time, "sleep", lambda s: now.__setitem__(0, now[0] + s)
+    )
+    bucket = TokenBucket(rate=10, capacity=2, clock=lambda: now[0])
+
+    waits = [bucket.acquire() for _ in range(6)]
+
+    assert waits[:2] == [0.0, 0.0]  # the burst
+    assert now[0] == pytest.approx(0.4)  # then one token every 100 ms
+
+
+def test_batches_run_concurrently_and_retry_through_429(gemini):
+    service, server = gemini
+    server.fail_next(2, status=429)
+    texts = [f"text {i}" for i in range(250)]
+
+    vectors = service._embed_batch(texts, False, batch_size=100)
+
+    assert np.allclose(vectors[7], vector_for("text 7"))
+    assert np.allclose(vectors[249], vector_for("text 249"))
+    ok = sorted(size for status, size in server.requests if status == 200)
+    assert ok == [50, 100, 100]
+    assert [s for s, _ in server.requests].count(429) == 2
+    assert 1 < server.max_in_flight <= embedding_module.GEMINI_MAX_CONCURRENCY
+
+
+def test_failures_raise_instead_of_returning_zeros(gemini):
+    service, server = gemini
+    server.fail_next(4, status=503)
+    with pytest.raises(EmbeddingUnavailable):
+        service._embed("x", True)
+    assert len(server.requests) == 4  # first try + 3 retries
+
+    server.requests.clear()
+    server.fail_next(1, status=400)  # not retryable
+    with pytest.raises(EmbeddingUnavailable):
+        service._embed("x", True)
+    assert len(server.requests) == 1
@@ -0,0 +1,78 @@
+from mcp_core.engine.lexical_index import (
+    LexicalIndex,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+from mcp_core.engine.logic import do_delete_impl, do_list_impl, do_save_impl
+
+
+def _loaded_index():
+    index = LexicalIndex()
+    index.load()  # empty test DB -> empty index bound to it
+    return index
+
+
+def test_tokenize_keeps_identifiers_and_parts():
+    tokens = tokenize("parse_iso_date parseJSONResponse")
+    assert "parse_iso_date" in tokens
+    assert {"parse", "iso", "date"} <= set(tokens)
+    assert {"parsejsonresponse", "json", "response"} <= set(tokens)
+
+
+def test_tokenize_cjk_bigrams():
+    assert tokenize("日付解析") == ["日付", "付解", "解析"]
+
+
+def test_exact_identifier_ranks_first():
+    index = _loaded_index()
+    index.upsert(1, "parse_iso_date", "Parse an ISO 8601 date string", [], "")
+    index.upsert(2, "format_date", "Format a date for display", ["date"], "")
+    index.upsert(
+        3, "load_config", "Reads settings", [], "def load_config(path):\n    pass"
+    )
+
+    hits = index.search("parse_iso_date", limit=3)
+    assert hits[0][0] == 1
+    # Code identifiers are indexed too
+    assert index.search("path")[0][0] == 3
+
+
+def test_remove_and_reindex():
+    index = _loaded_index()
+    index.upsert(1, "alpha_func", "", [], "")
+    index.upsert(2, "beta_func", "", [], "")
+    index.remove(1)
+    assert 1 not in [h[0] for h in index.search("alpha_func")]
+
+    index.upsert(2, "gamma_func", "", [], "")
+    assert index.search("beta") == []
+    assert index.search("gamma_func")[0][0] == 2
+
+
+def test_rrf_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]])
+    assert [fid for fid, _ in fused][:2] == [1, 3]
+    assert {fid for fid, _ in fused} == {1, 2, 3, 4}
+
+
+def test_list_ranks_by_keyword_relevance():
+    do_save_impl(
+        "lexical_list_target", "def f():\n    return 1", "Zebra", skip_test=True
+    )
+    do_save_impl("zebra_helper", "def g():\n    return 2", "Other", skip_test=True)
+
+    names = [r["name"] for r in do_list_impl(query="zebra_helper")]
+    assert names[0] == "zebra_helper"
+
+    assert "SUCCESS" in do_delete_impl("zebra_helper")
+    assert "zebra_helper" not in [r["name"] for r in do_list_impl(query="zebra")]
+
+
+def test_list_keeps_substring_matches_below_keyword_hits():
+    do_save_impl(
+        "fetch_url", "def f():\n    return 1", "Download a page", skip_test=True
+    )
+    do_save_impl("etch_plate", "def g():\n    return 2", "Etch a plate", skip_test=True)
+
+    names = [r["name"] for r in do_list_impl(query="etch")]
+    assert names == ["etch_plate", "fetch_url"]
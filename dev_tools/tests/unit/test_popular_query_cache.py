@@ -0,0 +1,52 @@
+from mcp_core.engine.popular_query_cache import PopularQueryCache
+
+
+def _lookup(cache, query):
+    """Search-path usage: look up, then offer the computed embedding on a miss."""
+    if cache.get_embedding_cache(query) is None:
+        cache.cache_embedding_if_popular(query, [float(len(query))])
+        return False
+    return True
+
+
+def test_equivalent_queries_share_one_entry():
+    cache = PopularQueryCache(max_cache_size=10)
+    _lookup(cache, "Parse ISO  date")
+    assert cache.get_embedding_cache("  parse iso date") == [15.0]
+    assert cache.get_stats()["cache_size"] == 1
+
+
+def test_hot_queries_survive_a_scan_of_one_off_queries():
+    cache = PopularQueryCache(max_cache_size=100)
+    hot = [f"hot query {i}" for i in range(20)]
+    for _ in range(5):
+        for q in hot:
+            _lookup(cache, q)
+
+    for i in range(1000):
+        _lookup(cache, f"one-off {i}")
+
+    assert all(_lookup(cache, q) for q in hot)
+    stats = cache.get_stats()
+    assert stats["cache_size"] <= 100
+    assert stats["rejected"] > 0
+    assert stats["tiers"]["protected"]["hits"] > 0
+    assert set(stats["tiers"]) == {"window", "probation", "protected"}
+
+
+def test_snapshot_restores_hot_set_for_the_same_model_only(tmp_path):
+    path = tmp_path / "query_embeddings.npz"
+    cache = PopularQueryCache(max_cache_size=10)
+    for _ in range(3):
+        _lookup(cache, "Read CSV")
+    _lookup(cache, "rare query")
+    assert cache.save_snapshot(path, "model-a") == 2
+
+    restored = PopularQueryCache(max_cache_size=10)
+    assert restored.load_snapshot(path, "model-a") == []
+    assert restored.get_embedding_cache("read csv") == [8.0]
+
+    # A model switch keeps only the queries, most popular first, for re-embedding
+    switched = PopularQueryCache(max_cache_size=10)
+    assert switched.load_snapshot(path, "model-b") == ["Read CSV", "rare query"]
+    assert switched.get_embedding_cache("read csv") is None
@@ -0,0 +1,52 @@
+from mcp_core.engine import logic
+from mcp_core.engine.logic import do_delete_impl, do_save_impl, do_search_impl
+from mcp_core.engine.result_cache import SearchResultCache, StoreGeneration
+
+
+def test_lru_is_bounded_and_keyed_by_generation():
+    generation = StoreGeneration()
+    cache = SearchResultCache(generation, max_size=2)
+
+    k1 = cache.make_key("a  query", 5, "hybrid")
+    assert k1 == cache.make_key(" a query ", 5, "hybrid")
+    assert k1 != cache.make_key("a query", 5, "hybrid", {"tags": ["x"]})
+    cache.put(k1, [{"name": "a"}])
+    cache.put(cache.make_key("b", 5, "hybrid"), [])
+    cache.put(cache.make_key("c", 5, "hybrid"), [])
+    assert cache.get(k1) is None  # evicted (LRU)
+
+    k2 = cache.make_key("b", 5, "hybrid")
+    assert cache.get(k2) == []
+    generation.bump()
+    assert cache.get(cache.make_key("b", 5, "hybrid")) is None
+
+
+def test_results_computed_across_a_write_are_not_cached():
+    generation = StoreGeneration()
+    cache = SearchResultCache(generation)
+    key = cache.make_key("q", 5, "hybrid")
+    generation.bump()  # a writer commits while the query runs
+    cache.put(key, [{"name": "stale"}])
+    assert cache.get(key) is None
+
+
+def test_search_is_served_from_cache_until_a_write(monkeypatch):
+    code = "def f():\n    return 1"
+    do_save_impl("cached_fn", code, "Cache test", skip_test=True)
+    logic.run_background_maintenance("cached_fn", code, "Cache test", [], [], [], True)
+
+    first = do_search_impl("Cache test", limit=5)
+    assert [r["name"] for r in first] == ["cached_fn"]
+
+    calls = []
+    original = logic._do_search_query
+    monkeypatch.setattr(
+        logic, "_do_search_query", lambda *a: calls.append(a) or original(*a)
+    )
+    first[0]["name"] = "mutated by caller"
+    assert do_search_impl("Cache test", limit=5)[0]["name"] == "cached_fn"
+    assert calls == []
+
+    do_delete_impl("cached_fn")
+    assert do_search_impl("Cache test", limit=5, mode="lexical") == []
+    assert calls
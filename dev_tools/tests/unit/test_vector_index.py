@@ -0,0 +1,269 @@
+import threading
+import time
+
+import numpy as np
+from mcp_core.core.database import get_db_connection
+from mcp_core.engine import vector_index
+from mcp_core.engine.embedding import embedding_service, normalize
+from mcp_core.engine.logic import do_delete_impl, do_save_impl, do_search_impl
+from mcp_core.engine.quantization import (
+    dequantize_int8,
+    fit_int8,
+    int8_dot,
+    quantize_int8,
+)
+from mcp_core.engine.vector_index import VectorIndex
+
+
+def _loaded_index(dim=4):
+    index = VectorIndex(initial_capacity=2)
+    index.load()  # empty test DB -> empty index bound to it
+    index._reset(dim)
+    return index
+
+
+def test_normalize_zero_vector_stays_zero():
+    assert not normalize(np.zeros(4)).any()
+    assert np.isclose(np.linalg.norm(normalize([3.0, 4.0, 0.0, 0.0])), 1.0)
+
+
+def test_search_blends_similarity_and_quality():
+    index = _loaded_index()
+    index.upsert(1, [1, 0, 0, 0], quality_score=0)
+    index.upsert(2, [0.9, 0.1, 0, 0], quality_score=100)
+    index.upsert(3, [0, 1, 0, 0], quality_score=100)
+
+    hits = index.search([1, 0, 0, 0], limit=2)
+    # id=2 is slightly less similar but has a much better quality score
+    assert [h[0] for h in hits] == [2, 1]
+    assert np.isclose(hits[1][1], 1.0)
+
+
+def test_upsert_replaces_and_remove_compacts():
+    index = _loaded_index()
+    for fid in range(1, 6):  # forces capacity growth from 2
+        index.upsert(fid, np.eye(4)[fid % 4], quality_score=50)
+    assert len(index) == 5
+
+    index.upsert(3, [0, 0, 0, 1], quality_score=50)
+    assert len(index) == 5
+    assert index.search([0, 0, 0, 1], limit=1)[0][0] in (3,)
+
+    index.remove(1)
+    index.remove(42)  # unknown ids are ignored
+    assert len(index) == 4
+    assert 1 not in [h[0] for h in index.search([0, 1, 0, 0], limit=10)]
+    assert {h[0] for h in index.search([0, 1, 0, 0], limit=10)} == {2, 3, 4, 5}
+
+
+def test_index_follows_save_and_delete(monkeypatch):
+    from mcp_core.engine import logic
+
+    name = "vector_index_roundtrip"
+    res = do_save_impl(name, "def f():\n    return 1", "Index test", skip_test=True)
+    assert "SUCCESS" in res
+
+    # Run the background step inline so the in-place update is observed.
+    logic.run_background_maintenance(
+        name, "def f():\n    return 1", "Index test", [], [], [], True
+    )
+    assert any(r["name"] == name for r in do_search_impl("Index test"))
+
+    assert "SUCCESS" in do_delete_impl(name)
+    assert logic.vector_index.is_loaded
+    assert not any(r["name"] == name for r in logic._do_search_query("Index test"))
+
+
+def test_int8_dot_matches_dequantized_scan():
+    rng = np.random.default_rng(0)
+    vectors = np.stack([normalize(v) for v in rng.normal(size=(200, 16))])
+    scale, offset = fit_int8(vectors)
+    codes = quantize_int8(vectors, scale, offset)
+    q = normalize(rng.normal(size=16))
+
+    approx = int8_dot(codes, q, scale, offset)
+    assert np.allclose(approx, dequantize_int8(codes, scale, offset) @ q, atol=1e-4)
+    assert np.abs(approx - vectors @ q).max() < 0.05
+
+
+def _store_vectors(vectors):
+    conn = get_db_connection()
+    try:
+        for fid, v in enumerate(vectors, start=1):
+            conn.execute(
+                "INSERT INTO functions (id, name, code, status, metadata) VALUES (?, ?, '', 'verified', '{}')",
+                (fid, f"f{fid}"),
+            )
+            conn.execute(
+                "INSERT INTO embeddings (function_id, vector, model_name, dimension) VALUES (?, ?, ?, 768)",
+                (fid, v.tolist(), embedding_service.model_name),
+            )
+    finally:
+        conn.close()
+
+
+def test_int8_index_reranks_with_exact_vectors():
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(50, 768)).astype(np.float32)
+    _store_vectors(vectors)
+
+    exact = VectorIndex(quantization="none")
+    quantized = VectorIndex(quantization="int8")
+    exact.load()
+    quantized.load()
+    assert len(quantized) == 50 and quantized.nbytes * 4 == exact.nbytes
+
+    q = vectors[7] + 0.1 * rng.normal(size=768)
+    expected = exact.search(q, limit=5)
+    hits = quantized.search(q, limit=5)
+    assert [h[0] for h in hits] == [h[0] for h in expected]
+    # Re-ranked similarities are the exact float ones
+    assert np.allclose([h[1] for h in hits], [h[1] for h in expected], atol=1e-5)
+    assert quantized.search_batch([q], limit=5) == [hits]
+
+
+def test_int8_refits_once_upserts_leave_the_fitted_range():
+    rng = np.random.default_rng(2)
+    _store_vectors(np.abs(rng.normal(size=(50, 768))))  # Fitted on [0, max]
+    index = VectorIndex(quantization="int8")
+    index.load()
+    fitted_offset = index._offset.copy()
+
+    outside = -np.abs(rng.normal(size=(3, 768)))  # Every component below 0
+    for fid, v in enumerate(outside, start=51):
+        index.upsert(fid, v, 50)
+    assert index.refit_count >= 1
+    assert (index._offset < fitted_offset).all()
+
+    # The first-pass int8 scores of the new rows are close to the exact ones
+    q = normalize(outside[1])
+    approx = index._similarity(q[None, :])[:, 0]
+    assert abs(approx[index._row_of[52]] - 1.0) < 0.05
+    assert index.search(q, limit=1)[0][0] == 52
+
+    refits = index.refit_count
+    index.upsert(60, np.array(index._exact.data[0]), 50)  # In range: no refit
+    assert index.refit_count == refits
+
+
+def test_filters_are_applied_inside_the_scan():
+    index = _loaded_index()
+    index.upsert(1, [1, 0, 0, 0], 90, status="verified", tags=["http", "io"])
+    index.upsert(2, [1, 0.1, 0, 0], 40, status="verified", tags=["http"])
+    index.upsert(
+        3, [1, 0.2, 0, 0], 95, status="failed", tags=["http"], dependencies=["json"]
+    )
+    index.upsert(4, [1, 0, 0.1, 0], 80, tags=["io"], dependencies=["no_such_pkg_x"])
+
+    def ids(**filters):
+        return [h[0] for h in index.search([1, 0, 0, 0], limit=10, filters=filters)]
+
+    assert set(ids(tags=["http"])) == {1, 2, 3}
+    assert ids(tags=["http", "io"]) == [1]
+    assert ids(tags=["missing"]) == []
+    assert set(ids(status_in=["verified"])) == {1, 2}
+    assert set(ids(min_quality=85)) == {1, 3}
+    assert 4 not in ids(dependencies_available=True)
+    assert index.search_batch([[1, 0, 0, 0]], limit=10, filters={"tags": ["io"]})[0][0][
+        0
+    ] in (1, 4)
+
+    # Status/quality changes without a new vector
+    index.update_attributes(2, quality_score=99, status="failed")
+    assert set(ids(status_in=["failed"])) == {2, 3}
+    assert 2 in ids(min_quality=95)
+
+    # Swap-remove keeps the moved row's tag bits intact
+    index.remove(1)
+    assert set(ids(tags=["io"])) == {4}
+    assert index.filter_ids([4, 3, 2, 1], {"tags": ["http"]}) == [3, 2]
+
+
+def test_dependency_filter_rechecks_the_environment(monkeypatch):
+    installed = {"json"}
+    monkeypatch.setattr(
+        vector_index.env_manager,
+        "are_deps_available",
+        lambda deps: set(deps) <= installed,
+    )
+    index = _loaded_index()
+    index.upsert(1, [1, 0, 0, 0], 90, dependencies=["json"])
+    index.upsert(2, [1, 0.1, 0, 0], 80, dependencies=["late_pkg"])
+    index.upsert(3, [1, 0.2, 0, 0], 70, dependencies=["late_pkg", "json"])
+    index.remove(1)  # row 3 moves into its slot
+
+    def ids():
+        hits = index.search(
+            [1, 0, 0, 0], limit=10, filters={"dependencies_available": True}
+        )
+        return sorted(h[0] for h in hits)
+
+    assert ids() == []
+    installed.add("late_pkg")
+    assert ids() == []  # cached until the TTL passes
+    generation = vector_index.store_generation.value
+    monkeypatch.setattr(vector_index.config, "DEPS_CHECK_TTL", 0)
+    assert ids() == [2, 3]
+    # Flipped bits invalidate cached results; an unchanged re-check doesn't
+    assert vector_index.store_generation.value == generation + 1
+    assert ids() == [2, 3]
+    assert vector_index.store_generation.value == generation + 1
+
+
+def test_dependency_recheck_stays_off_the_search_path(real_threads, monkeypatch):
+    installed, started, release = set(), threading.Event(), threading.Event()
+    monkeypatch.setattr(
+        vector_index.env_manager,
+        "are_deps_available",
+        lambda deps: set(deps) <= installed,
+    )
+    index = _loaded_index()
+    index.upsert(1, [1, 0, 0, 0], 90, dependencies=["late_pkg"])
+
+    def slow_check(deps):
+        started.set()
+        release.wait(5)  # e.g. importing a heavy package
+        return set(deps) <= installed
+
+    monkeypatch.setattr(vector_index.env_manager, "are_deps_available", slow_check)
+    monkeypatch.setattr(vector_index.config, "DEPS_CHECK_TTL", 0)
+    installed.add("late_pkg")
+    filters = {"dependencies_available": True}
+    assert index.search([1, 0, 0, 0], limit=5, filters=filters) == []
+    assert started.wait(5)
+    # Searches don't queue behind the re-check
+    assert index.search([1, 0, 0, 0], limit=5, filters=filters) == []
+
+    release.set()
+    for _ in range(500):
+        if index.search([1, 0, 0, 0], limit=5, filters=filters):
+            break
+        time.sleep(0.01)
+    assert [h[0] for h in index.search([1, 0, 0, 0], 5, filters=filters)] == [1]
+
+
+def test_search_filters_follow_maintenance():
+    from mcp_core.engine import logic
+
+    code = "def f():\n    return 1"
+    do_save_impl("filtered_fn", code, "Filter test", tags=["alpha"], skip_test=True)
+    logic.run_background_maintenance(
+        "filtered_fn", code, "Filter test", ["alpha"], [], [], True
+    )
+
+    def names(**filters):
+        return [
+            r["name"]
+            for r in logic._do_search_query(
+                "Filter test", 5, "vector", logic._search_filters(**filters)
+            )
+        ]
+
+    assert names(tags=["alpha"]) == ["filtered_fn"]
+    assert names(tags=["beta"]) == []
+    assert names(status_in=["verified"]) == ["filtered_fn"]
+
+    # A re-save moves it back to "unverified" immediately
+    do_save_impl("filtered_fn", code, "Filter test", tags=["beta"], skip_test=True)
+    assert names(status_in=["verified"]) == []
+    assert names(tags=["beta"], status_in=["unverified"]) == ["filtered_fn"]
@@ -31,6 +31,9 @@ class SoloClient:
         self.pending_requests = {}
         self.read_thread = None
         self._is_ready = False
+        # {"done_at": t} for the last write, stamped once it returned; read
+        # snapshots taken before it are stale for this client
+        self.last_write = None
 
     def start(self):
         """Starts the MCP server as a subprocess."""
@@ -128,19 +131,29 @@ class SoloClient:
     ) -> List[Dict]:
         return self._call_tool("list_functions", {"query": query, "tag": tag}) or []
 
+    def get_tag_counts(self, limit: int = 50) -> Dict[str, int]:
+        return self._call_tool("get_tag_counts", {"limit": limit}) or {}
+
     def get_stats(self) -> Dict:
         return self._call_tool("get_dashboard_stats", {}) or {}
 
     def save_function(self, **kwargs) -> str:
-        return (
-            self._call_tool("save_function", kwargs) or "Error: No response from server"
-        )
+        try:
+            return (
+                self._call_tool("save_function", kwargs)
+                or "Error: No response from server"
+            )
+        finally:
+            self.last_write = {"done_at": time.time()}
 
     def delete_function(self, name: str) -> str:
-        return (
-            self._call_tool("delete_function", {"name": name})
-            or "Error: No response from server"
-        )
+        try:
+            return (
+                self._call_tool("delete_function", {"name": name})
+                or "Error: No response from server"
+            )
+        finally:
+            self.last_write = {"done_at": time.time()}
 
     def get_function_details(self, name: str) -> Optional[Dict]:
         res = self._call_tool("get_function_details", {"name": name})
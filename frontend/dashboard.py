@@ -1,15 +1,17 @@
 import asyncio
 import json
 import threading
+import time
 from pathlib import Path
 
 import flet as ft
 from google import genai
-from mcp_core.config import BASE_DIR, DATA_DIR, DB_PATH, SETTINGS_PATH
+from mcp_core.config import BASE_DIR, DATA_DIR, SETTINGS_PATH
 from mcp_core.core.mcp_manager import (
     get_registration_status,
     register_with_client,
 )
+from mcp_core.engine.read_snapshot import read_snapshot
 from mcp_core.engine.sync_engine import sync_engine
 
 from frontend.client import SoloClient
@@ -65,9 +67,7 @@ class SoloDashboardApp:
         # Start background check loop
         self.page.run_task(self.update_ui_loop)
 
-        # Initial Database/Settings Loading
-        self.cleanup_parquet_cache()
-
+        # Initial Settings Loading
         self.log(
             f"Dashboard modularized. Flet version: {ft.__version__}", ft.Colors.BLUE_400
         )
@@ -88,6 +88,7 @@ class SoloDashboardApp:
 
         try:
             count = sync_engine.pull()
+            self.client.last_write = {"done_at": time.time()}
             self.log(
                 f"Background Sync: Complete! Updated {count} functions.",
                 ft.Colors.GREEN_400,
@@ -240,14 +241,6 @@ class SoloDashboardApp:
         self.home_view.log_list.controls.clear()
         self.home_view.log_list.update()
 
-    def cleanup_parquet_cache(self):
-        parquet_path = DB_PATH.with_name("dashboard.parquet")
-        if parquet_path.exists():
-            try:
-                parquet_path.unlink()
-            except Exception:
-                pass
-
     # --- Server Management ---
     def toggle_server(self, e):
         if self.is_running:
@@ -340,20 +333,31 @@ class SoloDashboardApp:
     def load_functions(self, query=None):
         self.functions_view.func_list_view.controls.clear()
         try:
-            if not self.is_running:
+            source = self.read_source()
+            if source is not None:
+                list_functions, get_tag_counts = (
+                    source.list_functions,
+                    source.tag_counts,
+                )
+            elif self.is_running:
+                list_functions, get_tag_counts = (
+                    self.client.list_functions,
+                    self.client.get_tag_counts,
+                )
+            else:
                 return  # Can't fetch if server is down
 
             if query:
                 if query.startswith("tag:"):
                     tag = query.split(":", 1)[1]
-                    rows = self.client.list_functions(tag=tag)
+                    rows = list_functions(tag=tag)
                 else:
-                    rows = self.client.list_functions(query=query)
+                    rows = list_functions(query=query)
             else:
-                rows = self.client.list_functions()
+                rows = list_functions()
 
-            # Update Tag Cloud (restored)
-            self.update_tag_cloud(rows)
+            # Tag cloud covers the whole store, not just the listed rows
+            self.update_tag_cloud(get_tag_counts())
 
             for r in rows:
                 # Use the new FunctionCard component
@@ -389,13 +393,19 @@ class SoloDashboardApp:
                 self.update_search_history_ui()
         self.load_functions(query)
 
-    def update_tag_cloud(self, rows):
-        tag_counts = {}
-        for r in rows:
-            tags = r.get("tags", [])
-            for t in tags:
-                tag_counts[t] = tag_counts.get(t, 0) + 1
-
+    def read_source(self):
+        """
+        The Master's read snapshot, which answers without a server round trip.
+        None if it predates our last write and the server can answer instead.
+        """
+        snapshot = read_snapshot.current()
+        if snapshot is None:
+            return None
+        if not snapshot.covers(self.client.last_write) and self.is_running:
+            return None
+        return snapshot
+
+    def update_tag_cloud(self, tag_counts):
         # We need to update the HomeView's tag cloud
         # For simplicity, if we have the view, update it
         if hasattr(self, "home_view") and hasattr(self.home_view, "tag_cloud"):
@@ -437,11 +447,17 @@ class SoloDashboardApp:
                 name = public_data.get("name", "Unknown Public Function")
                 is_public = True
             else:
-                self.log(
-                    f"[DEBUG] Fetching local data for {target_name} via MCP Client",
-                    ft.Colors.GREY_400,
-                )
-                func_data = self.client.get_function_details(target_name)
+                source = self.read_source()
+                if source is not None:
+                    func_data = source.get_details(target_name)
+                    if "error" in func_data:
+                        func_data = None
+                else:
+                    self.log(
+                        f"[DEBUG] Fetching local data for {target_name} via MCP Client",
+                        ft.Colors.GREY_400,
+                    )
+                    func_data = self.client.get_function_details(target_name)
 
                 if not func_data:
                     self.log(
@@ -634,6 +650,7 @@ class SoloDashboardApp:
         self.log("Syncing...", ft.Colors.BLUE_400)
         try:
             count = sync_engine.pull()
+            self.client.last_write = {"done_at": time.time()}
             self.log(f"Sync complete! Updated {count} functions.", ft.Colors.GREEN_400)
         except Exception as ex:
             self.log(f"Sync Error: {ex}", ft.Colors.RED_400)